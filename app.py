@@ -12,11 +12,15 @@ from controllers.genero_controller import GeneroController
 from controllers.pelicula_admin_controller import PeliculaAdminController
 from controllers.funcion_admin_controller import FuncionAdminController
 from controllers.sala_controller import SalaController
+from controllers.reserva_controller import ReservaController
+from controllers.exportacion_controller import ExportacionController
 from models import login_manager, bcrypt
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_file
+from database import db
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_file, Response
 from datetime import datetime, date, timedelta
 from flask_login import login_user, logout_user, current_user, login_required
 from functools import wraps
+import os
 import traceback
 
 def admin_required(f):
@@ -35,6 +39,8 @@ app.secret_key = 'cineflow_secret_key_change_in_production_2025'
 login_manager.init_app(app)
 login_manager.login_view = 'inicio_sesion'
 bcrypt.init_app(app)
+# Una sesión de base de datos (y una conexión del pool) por petición
+db.init_app(app)
 
 # Fechas futuras para las próximas funciones
 ahora = datetime.now()
@@ -45,7 +51,7 @@ ahora = datetime.now()
 @app.route('/index')
 def index():
     
-    # Obtener datos para la página de inicio
+    # Obtener datos para la página de inicio (ambas vistas comparten el snapshot de cartelera)
     peliculas_populares = PeliculaController.top_3_pelis()
     ultimas_peliculas = PeliculaController.ultimas_3_pelis()
     
@@ -244,7 +250,7 @@ def inicio_sesion():
         contrasena = request.form.get('contrasena')
         
         # Intentar iniciar sesión usando el controlador
-        success, message, usuario = UsuarioController.iniciar_sesion(correo, contrasena)
+        success, message, usuario = UsuarioController.iniciar_sesion(correo, contrasena, request.remote_addr)
         
         if success:
             # Iniciar sesión con Flask-Login
@@ -398,11 +404,8 @@ def detalle_pelicula(pelicula_id):
     tiene_funciones = FuncionController.pelicula_tiene_funciones(pelicula_id)
     
     if not tiene_funciones:
-        # Verificar si está en la cartelera filtrada
-        resultado_cartelera = PeliculaController.filtrar_pelis_cartelera()
-        peliculas_en_cartelera_ids = [p['Id'] for p in resultado_cartelera['peliculas']]
-        
-        if pelicula_id not in peliculas_en_cartelera_ids:
+        # Verificar si está en la cartelera (snapshot compartido de la petición)
+        if not PeliculaController.obtener_snapshot_cartelera().contiene(pelicula_id):
             flash('Esta película no está actualmente en cartelera.', 'warning')
             return redirect(url_for('lista_cartelera'))
     
@@ -439,8 +442,8 @@ def seleccion_asientos(funcion_id):
         flash('La función no existe o no está disponible.', 'danger')
         return redirect(url_for('lista_cartelera'))
     
-    # Obtener asientos con disponibilidad
-    asientos = FuncionController.obtener_asientos_con_disponibilidad(funcion_id)
+    # Obtener asientos con disponibilidad (los retenidos por otros clientes no están disponibles)
+    asientos = FuncionController.obtener_asientos_con_disponibilidad(funcion_id, current_user.Id)
     
     return render_template(
         'funciones/seleccion_asientos.html',
@@ -491,6 +494,15 @@ def confirmar_pago(funcion_id):
             flash('No se han seleccionado asientos.', 'danger')
             return redirect(url_for('seleccion_asientos', funcion_id=funcion_id))
         
+        # Retener los asientos mientras el cliente completa el pago
+        reservado, mensaje_reserva, _ = ReservaController.reservar(
+            funcion_id, current_user.Id, [codigo for codigo, _ in asientos_params]
+        )
+        
+        if not reservado:
+            flash(mensaje_reserva, 'warning')
+            return redirect(url_for('seleccion_asientos', funcion_id=funcion_id))
+        
         # Guardar temporalmente en sesión para procesar POST
         session['compra_temporal'] = {
             'asientos': asientos_params,
@@ -540,7 +552,7 @@ def confirmar_pago(funcion_id):
         )
         
         if success:
-            # Limpiar sesión temporal
+            # Limpiar sesión temporal (las retenciones se consumieron en la misma transacción)
             session.pop('compra_temporal', None)
             
             # Preparar mensaje detallado
@@ -630,6 +642,22 @@ def dashboard_data():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+def filtros_exportacion():
+    """Construye el diccionario de filtros de las exportaciones a partir de la query string"""
+    def ids(nombre):
+        return [int(v) for v in request.args.getlist(nombre) if v and str(v).isdigit()]
+    
+    return {
+        'fecha_inicio': request.args.get('fecha_inicio'),
+        'fecha_fin': request.args.get('fecha_fin'),
+        'agrupacion': request.args.get('agrupacion', 'dia'),
+        'cine_ids': ids('cine_ids[]'),
+        'genero_ids': ids('genero_ids[]'),
+        'pelicula_ids': ids('pelicula_ids[]'),
+        'funcion_ids': ids('funcion_ids[]'),
+        'dias_semana': ids('dias_semana[]')
+    }
+
 @app.route('/admin/dashboard/export/excel')
 @login_required
 def dashboard_export_excel():
@@ -638,41 +666,22 @@ def dashboard_export_excel():
         return jsonify({'error': 'Acceso denegado'}), 403
 
     try:
-        # Obtener parámetros de filtro
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        agrupacion = request.args.get('agrupacion', 'dia')
+        filtros = filtros_exportacion()
         
-        # Listas de IDs
-        cine_ids = request.args.getlist('cine_ids[]')
-        genero_ids = request.args.getlist('genero_ids[]')
-        pelicula_ids = request.args.getlist('pelicula_ids[]')
-        funcion_ids = request.args.getlist('funcion_ids[]')
-        dias_semana = request.args.getlist('dias_semana[]')
-        
-        # Construir diccionario de filtros
-        filtros = {
-            'fecha_inicio': fecha_inicio,
-            'fecha_fin': fecha_fin,
-            'agrupacion': agrupacion,
-            'cine_ids': [int(id) for id in cine_ids if id and str(id).isdigit()],
-            'genero_ids': [int(id) for id in genero_ids if id and str(id).isdigit()],
-            'pelicula_ids': [int(id) for id in pelicula_ids if id and str(id).isdigit()],
-            'funcion_ids': [int(id) for id in funcion_ids if id and str(id).isdigit()],
-            'dias_semana': [int(dia) for dia in dias_semana if dia and str(dia).isdigit()]
-        }
-        
-        # Generar Excel
-        excel_data = DashboardController.generar_excel(filtros)
+        # Generar Excel en un archivo temporal (memoria acotada)
+        ruta_excel = DashboardController.generar_excel(filtros)
         
         # Nombre del archivo
         filename = f"cineflow_dashboard_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
-        return send_file(
-            excel_data,
+        # Enviar por bloques; el archivo temporal se elimina al terminar
+        return Response(
+            DashboardController.transmitir_archivo(ruta_excel),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'Content-Length': str(os.path.getsize(ruta_excel))
+            }
         )
         
     except Exception as e:
@@ -680,49 +689,78 @@ def dashboard_export_excel():
         flash(f'Error al exportar Excel: {str(e)}', 'danger')
         return redirect(url_for('admin_dashboard'))
 
-@app.route('/admin/dashboard/export/pdf')
+@app.route('/admin/dashboard/export/csv')
 @login_required
-def dashboard_export_pdf():
-    """Exporta dashboard completo a PDF"""
+def dashboard_export_csv():
+    """Exporta los datos detallados del dashboard a CSV (gzip opcional con ?gzip=1)"""
     if current_user.rol_nombre != "Administrador":
         return jsonify({'error': 'Acceso denegado'}), 403
 
     try:
-        # Obtener parámetros de filtro
-        fecha_inicio = request.args.get('fecha_inicio')
-        fecha_fin = request.args.get('fecha_fin')
-        agrupacion = request.args.get('agrupacion', 'dia')
+        filtros = filtros_exportacion()
+        comprimir = request.args.get('gzip') == '1'
         
-        # Listas de IDs
-        cine_ids = request.args.getlist('cine_ids[]')
-        genero_ids = request.args.getlist('genero_ids[]')
-        pelicula_ids = request.args.getlist('pelicula_ids[]')
-        funcion_ids = request.args.getlist('funcion_ids[]')
-        dias_semana = request.args.getlist('dias_semana[]')
+        filename = f"cineflow_dashboard_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        if comprimir:
+            filename += '.gz'
         
-        # Construir diccionario de filtros
-        filtros = {
-            'fecha_inicio': fecha_inicio,
-            'fecha_fin': fecha_fin,
-            'agrupacion': agrupacion,
-            'cine_ids': [int(id) for id in cine_ids if id and str(id).isdigit()],
-            'genero_ids': [int(id) for id in genero_ids if id and str(id).isdigit()],
-            'pelicula_ids': [int(id) for id in pelicula_ids if id and str(id).isdigit()],
-            'funcion_ids': [int(id) for id in funcion_ids if id and str(id).isdigit()],
-            'dias_semana': [int(dia) for dia in dias_semana if dia and str(dia).isdigit()]
-        }
+        # El CSV se genera mientras se envía, lote por lote
+        return Response(
+            DashboardController.generar_csv(filtros, comprimir=comprimir),
+            mimetype='application/gzip' if comprimir else 'text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
         
-        # Obtener datos del dashboard
-        datos_dashboard = DashboardController.obtener_datos_completos(filtros)
+    except Exception as e:
+        print(f"Error en exportación CSV: {e}")
+        flash(f'Error al exportar CSV: {str(e)}', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/dashboard/export/parquet')
+@login_required
+def dashboard_export_parquet():
+    """Exporta los datos detallados del dashboard a Parquet"""
+    if current_user.rol_nombre != "Administrador":
+        return jsonify({'error': 'Acceso denegado'}), 403
+
+    try:
+        filtros = filtros_exportacion()
+        ruta_parquet = DashboardController.generar_parquet(filtros)
+        
+        filename = f"cineflow_dashboard_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+        
+        return Response(
+            DashboardController.transmitir_archivo(ruta_parquet),
+            mimetype='application/vnd.apache.parquet',
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'Content-Length': str(os.path.getsize(ruta_parquet))
+            }
+        )
+        
+    except Exception as e:
+        print(f"Error en exportación Parquet: {e}")
+        flash(f'Error al exportar Parquet: {str(e)}', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+@app.route('/admin/dashboard/export/pdf')
+@login_required
+def dashboard_export_pdf():
+    """Exporta dashboard completo a PDF"""
+    if current_user.rol_nombre != "Administrador":
+        return jsonify({'error': 'Acceso denegado'}), 403
+
+    try:
+        filtros = filtros_exportacion()
         
-        # Generar PDF
-        pdf_data = DashboardController.generar_pdf(datos_dashboard, filtros)
+        # PDF desde la caché de reportes (se regenera solo si cambiaron los datos)
+        ruta_pdf, _ = DashboardController.obtener_pdf(filtros)
         
         # Nombre del archivo
         filename = f"cineflow_dashboard_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         
         return send_file(
-            pdf_data,
+            ruta_pdf,
             mimetype='application/pdf',
             as_attachment=True,
             download_name=filename
@@ -733,6 +771,71 @@ def dashboard_export_pdf():
         flash(f'Error al exportar PDF: {str(e)}', 'danger')
         return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/dashboard/export/<formato>/trabajo', methods=['POST'])
+@login_required
+def dashboard_export_trabajo(formato):
+    """Encola la generación de un reporte (excel o pdf) y devuelve el ID del trabajo"""
+    if current_user.rol_nombre != "Administrador":
+        return jsonify({'error': 'Acceso denegado'}), 403
+    
+    success, message, estado = ExportacionController.solicitar(formato, filtros_exportacion())
+    if not success:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({
+        'id': estado['id'],
+        'estado': estado['estado'],
+        'mensaje': message,
+        'url_estado': url_for('dashboard_export_estado', trabajo_id=estado['id']),
+        'url_descarga': url_for('dashboard_export_descargar', trabajo_id=estado['id'])
+    }), 202
+
+@app.route('/admin/dashboard/export/trabajos/<trabajo_id>')
+@login_required
+def dashboard_export_estado(trabajo_id):
+    """Estado de un trabajo de exportación"""
+    if current_user.rol_nombre != "Administrador":
+        return jsonify({'error': 'Acceso denegado'}), 403
+    
+    estado = ExportacionController.obtener_estado(trabajo_id)
+    if not estado:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify({
+        'id': estado['id'],
+        'estado': estado['estado'],
+        'mensaje': estado.get('mensaje')
+    })
+
+@app.route('/admin/dashboard/export/trabajos/<trabajo_id>/descargar')
+@login_required
+def dashboard_export_descargar(trabajo_id):
+    """Descarga el reporte generado por un trabajo completado"""
+    if current_user.rol_nombre != "Administrador":
+        return jsonify({'error': 'Acceso denegado'}), 403
+    
+    estado = ExportacionController.obtener_estado(trabajo_id)
+    ruta, mimetype = ExportacionController.ruta_archivo(estado)
+    if not ruta:
+        flash('El reporte no está disponible o ya expiró', 'warning')
+        return redirect(url_for('admin_dashboard'))
+    
+    return send_file(
+        ruta,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=estado['nombre_descarga']
+    )
+
+@app.route('/admin/sistema/pool')
+@login_required
+def sistema_pool():
+    """Estadísticas del pool de conexiones del proceso que atiende la petición"""
+    if current_user.rol_nombre != "Administrador":
+        return jsonify({'error': 'Acceso denegado'}), 403
+    
+    return jsonify(db.estadisticas_pool())
+
 # ==========================================
 # RUTAS ADMINISTRATIVAS (CRUD LISTAS)
 # ==========================================
@@ -990,6 +1093,7 @@ def funcion_lista():
     # Obtener parámetros de paginación
     pagina = request.args.get('pagina', 1, type=int)
     por_pagina = request.args.get('por_pagina', 25, type=int)
+    cursor = request.args.get('cursor')
     
     # Obtener filtros
     filtros = {}
@@ -1014,7 +1118,7 @@ def funcion_lista():
         filtros['fecha_hasta'] = fecha_hasta
     
     # Obtener funciones usando el controlador
-    resultado = FuncionAdminController.obtener_todas_paginadas(pagina, por_pagina, filtros)
+    resultado = FuncionAdminController.obtener_todas_paginadas(pagina, por_pagina, filtros, cursor)
     
     # Agregar estadísticas a las funciones
     funciones_con_estadisticas = FuncionAdminController.obtener_funciones_con_estadisticas(resultado['funciones'])
@@ -1042,10 +1146,12 @@ def funcion_lista():
         'per_page': resultado['por_pagina'],
         'total': resultado['total'],
         'pages': resultado['paginas'],
-        'has_prev': resultado['pagina'] > 1,
-        'has_next': resultado['pagina'] < resultado['paginas'],
-        'prev_num': resultado['pagina'] - 1 if resultado['pagina'] > 1 else None,
-        'next_num': resultado['pagina'] + 1 if resultado['pagina'] < resultado['paginas'] else None,
+        'has_prev': resultado['tiene_anterior'],
+        'has_next': resultado['tiene_siguiente'],
+        'prev_num': resultado['pagina'] - 1 if resultado['tiene_anterior'] else None,
+        'next_num': resultado['pagina'] + 1 if resultado['tiene_siguiente'] else None,
+        'prev_cursor': resultado['cursor_anterior'],
+        'next_cursor': resultado['cursor_siguiente'],
         'items': funciones,
         'iter_pages': lambda: range(1, resultado['paginas'] + 1)
     }
@@ -1151,6 +1257,60 @@ def funcion_crear():
         flash(f'Error al crear función: {str(e)}', 'danger')
         return redirect(url_for('funcion_nuevo'))
 
+@app.route('/admin/funciones/programar-lote', methods=['GET', 'POST'])
+@admin_required
+def funcion_programar_lote():
+    """Programa una película en varias salas, fechas y horarios a la vez"""
+    peliculas = PeliculaAdminController.obtener_todas_simple()
+    salas = SalaController.obtener_todas_con_capacidad()
+    
+    # Mismos horarios que el formulario de nueva función (9:00 a 23:00)
+    horas_disponibles = []
+    for hora in range(9, 24):
+        for minuto in [0, 30]:
+            if hora == 23 and minuto == 30:
+                continue
+            horas_disponibles.append(f"{hora:02d}:{minuto:02d}")
+    
+    fecha_minima = date.today().strftime('%Y-%m-%d')
+    fecha_maxima = (datetime.now() + timedelta(days=90)).strftime('%Y-%m-%d')
+    
+    # Valores por defecto: una semana a partir de hoy
+    formulario = {
+        'IdPelicula': request.args.get('pelicula_id', ''),
+        'salas': [],
+        'fecha_desde': fecha_minima,
+        'fecha_hasta': (date.today() + timedelta(days=6)).strftime('%Y-%m-%d'),
+        'horas': []
+    }
+    reporte = None
+    
+    if request.method == 'POST':
+        formulario = {
+            'IdPelicula': request.form.get('IdPelicula', ''),
+            'salas': request.form.getlist('salas'),
+            'fecha_desde': request.form.get('fecha_desde', ''),
+            'fecha_hasta': request.form.get('fecha_hasta', ''),
+            'horas': request.form.getlist('horas'),
+            'solo_validar': request.form.get('accion') == 'validar'
+        }
+        
+        success, message, reporte = FuncionAdminController.programar_lote(formulario)
+        if success:
+            flash(message, 'success' if reporte['conflictos'] == 0 else 'warning')
+        else:
+            flash(message, 'danger')
+    
+    return render_template('funcion/programar_lote.html',
+                         peliculas=peliculas,
+                         salas=salas,
+                         horas_disponibles=horas_disponibles,
+                         fecha_minima=fecha_minima,
+                         fecha_maxima=fecha_maxima,
+                         formulario=formulario,
+                         reporte=reporte)
+
+
 @app.route('/admin/funciones/<int:id>')
 @admin_required
 def funcion_detalle(id):
@@ -1348,6 +1508,7 @@ def pelicula_lista():
     # Obtener parámetros de paginación
     pagina = request.args.get('pagina', 1, type=int)
     por_pagina = request.args.get('por_pagina', 25, type=int)
+    cursor = request.args.get('cursor')
     
     # Obtener filtros
     filtros = {}
@@ -1362,7 +1523,7 @@ def pelicula_lista():
         filtros['activo'] = False
     
     # Obtener películas usando el controlador
-    resultado = PeliculaAdminController.obtener_todas_paginadas(pagina, por_pagina, filtros)
+    resultado = PeliculaAdminController.obtener_todas_paginadas(pagina, por_pagina, filtros, cursor)
     
     # Obtener opciones para filtros
     clasificaciones = ClasificacionController.obtener_todas()
@@ -0,0 +1,149 @@
+# cache.py
+# Caché en memoria (por proceso) con expiración por tiempo y límite LRU
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+
+class CacheTTL:
+    """
+    Caché clave -> valor con TTL y tamaño máximo (se descarta la entrada
+    usada hace más tiempo). Es segura entre hilos del mismo proceso.
+    """
+
+    def __init__(self, ttl_segundos: int, max_entradas: int):
+        """
+        Args:
+            ttl_segundos: Segundos que una entrada se considera vigente
+            max_entradas: Número máximo de entradas antes de desalojar por LRU
+        """
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        # Se incrementa en cada invalidación: un cálculo que empezó antes no se guarda
+        self._generacion = 0
+
+    def obtener(self, clave):
+        """
+        Obtiene un valor vigente de la caché
+
+        Returns:
+            tuple: (encontrado: bool, valor)
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return (False, None)
+
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return (False, None)
+
+            self._datos.move_to_end(clave)
+            return (True, valor)
+
+    def guardar(self, clave, valor, generacion=None):
+        """
+        Guarda un valor con el TTL configurado, desalojando por LRU si hace falta
+
+        Args:
+            clave: Clave hashable
+            valor: Valor a guardar
+            generacion: Si se indica, solo se guarda cuando no hubo invalidaciones
+                desde que se leyó con generacion_actual()
+        """
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return
+            self._datos[clave] = (time.monotonic() + self.ttl_segundos, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def generacion_actual(self) -> int:
+        """Número de invalidaciones hechas hasta ahora"""
+        with self._lock:
+            return self._generacion
+
+    def invalidar(self, clave=None):
+        """Elimina una entrada concreta o, sin clave, toda la caché"""
+        with self._lock:
+            self._generacion += 1
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
+
+    def obtener_o_calcular(self, clave, calcular):
+        """
+        Devuelve una copia del valor en caché o lo calcula y lo guarda.
+        Se devuelven copias porque los llamadores suelen modificar las
+        listas y diccionarios resultantes. Si se invalida la caché mientras
+        se calcula, el resultado se devuelve pero no se guarda, porque pudo
+        leer datos anteriores a la invalidación.
+
+        Args:
+            clave: Clave hashable
+            calcular: Función sin argumentos que produce el valor
+
+        Returns:
+            Copia profunda del valor
+        """
+        encontrado, valor = self.obtener(clave)
+        if not encontrado:
+            generacion = self.generacion_actual()
+            valor = calcular()
+            self.guardar(clave, valor, generacion)
+        return copy.deepcopy(valor)
+
+
+def normalizar_lista(valores) -> tuple:
+    """Convierte una lista de filtros en una tupla ordenada y sin duplicados"""
+    if not valores:
+        return ()
+    return tuple(sorted({str(v) for v in valores}))
+
+
+# Caché de listados públicos (cartelera y próximamente)
+cache_cartelera = CacheTTL(Config.CACHE_CARTELERA_TTL, Config.CACHE_CARTELERA_MAX_ENTRADAS)
+
+
+def invalidar_cartelera():
+    """Invalida los listados públicos tras un cambio en películas o funciones"""
+    cache_cartelera.invalidar()
+
+
+# Capacidad (asientos activos) por sala: solo cambia cuando se editan asientos
+cache_capacidad_salas = CacheTTL(Config.CACHE_CAPACIDAD_SALAS_TTL, 1024)
+
+# Índice estático de asientos por sala (mapa_asientos.IndiceSala)
+cache_indices_salas = CacheTTL(Config.CACHE_CAPACIDAD_SALAS_TTL, 1024)
+
+
+def invalidar_capacidad_salas():
+    """Invalida la capacidad y el índice de asientos memorizados tras crear, editar o eliminar asientos"""
+    cache_capacidad_salas.invalidar()
+    cache_indices_salas.invalidar()
+
+
+# Copias inmutables de los usuarios autenticados (models.UsuarioSesion) por Id
+cache_usuarios = CacheTTL(Config.CACHE_USUARIOS_TTL, Config.CACHE_USUARIOS_MAX_ENTRADAS)
+
+
+def invalidar_usuario(usuario_id):
+    """Descarta la identidad en caché tras editar los datos, el rol o la contraseña de un usuario"""
+    cache_usuarios.invalidar(int(usuario_id))
+
+
+# Totales de los listados administrativos paginados (por listado y filtros)
+cache_totales = CacheTTL(Config.PAGINACION_TOTAL_TTL, 512)
+
+
+def invalidar_totales():
+    """Invalida los totales memorizados tras crear, editar o eliminar registros desde la administración"""
+    cache_totales.invalidar()
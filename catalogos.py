@@ -0,0 +1,121 @@
+# catalogos.py
+# Registro en memoria de las tablas de catálogo (por proceso)
+
+import threading
+from cache import CacheTTL
+from config import Config
+from database import db
+from models import Clasificacion, Idioma, Genero, TipoSala, TipoBoleto, RolUsuario
+
+
+class RegistroCatalogos:
+    """
+    Carga una sola vez las tablas de catálogo pequeñas y ofrece búsquedas
+    id <-> nombre sin ir a la base de datos. Cada catálogo se recarga de forma
+    perezosa después de invalidar(), que llaman los controladores de catálogo
+    al escribir, o al vencer CACHE_CATALOGOS_TTL: invalidar() solo alcanza al
+    proceso que atendió la escritura, y el TTL acota cuánto tardan los demás
+    workers en ver el cambio.
+
+    Los objetos devueltos están desvinculados de la sesión y se comparten entre
+    peticiones: deben tratarse como de solo lectura.
+    """
+
+    # nombre del catálogo -> (modelo, atributo con el nombre visible)
+    CATALOGOS = {
+        'Clasificacion': (Clasificacion, 'Clasificacion'),
+        'Idioma': (Idioma, 'Idioma'),
+        'Genero': (Genero, 'Genero'),
+        'TipoSala': (TipoSala, 'Tipo'),
+        'TipoBoleto': (TipoBoleto, 'TipoBoleto'),
+        'RolUsuario': (RolUsuario, 'Rol'),
+    }
+
+    def __init__(self):
+        self._tablas = CacheTTL(Config.CACHE_CATALOGOS_TTL, len(self.CATALOGOS))
+        self._lock = threading.Lock()
+
+    def _cargar(self, catalogo: str) -> dict:
+        """Consulta un catálogo completo y construye sus índices"""
+        modelo, atributo = self.CATALOGOS[catalogo]
+        session = db.get_session()
+        try:
+            registros = session.query(modelo).order_by(getattr(modelo, atributo)).all()
+            for registro in registros:
+                session.expunge(registro)
+
+            return {
+                'registros': registros,
+                'por_id': {r.Id: r for r in registros},
+                'por_nombre': {getattr(r, atributo): r for r in registros}
+            }
+        finally:
+            session.close()
+
+    def _tabla(self, catalogo: str) -> dict:
+        encontrado, tabla = self._tablas.obtener(catalogo)
+        if not encontrado:
+            with self._lock:
+                encontrado, tabla = self._tablas.obtener(catalogo)
+                if not encontrado:
+                    tabla = self._cargar(catalogo)
+                    self._tablas.guardar(catalogo, tabla)
+        return tabla
+
+    def invalidar(self, catalogo: str = None):
+        """
+        Descarta un catálogo (o todos) para que se recargue en el siguiente acceso
+
+        Args:
+            catalogo: Nombre del catálogo (clave de CATALOGOS) o None para todos
+        """
+        self._tablas.invalidar(catalogo)
+
+    def obtener(self, catalogo: str, id_registro: int):
+        """Devuelve el registro con ese ID o None"""
+        return self._tabla(catalogo)['por_id'].get(id_registro)
+
+    def buscar_por_nombre(self, catalogo: str, nombre: str):
+        """Devuelve el registro con ese nombre o None"""
+        return self._tabla(catalogo)['por_nombre'].get(nombre)
+
+    def id_por_nombre(self, catalogo: str, nombre: str):
+        """Devuelve el ID del registro con ese nombre o None"""
+        registro = self.buscar_por_nombre(catalogo, nombre)
+        return registro.Id if registro else None
+
+    def nombre_por_id(self, catalogo: str, id_registro: int):
+        """Devuelve el nombre visible del registro con ese ID o None"""
+        registro = self.obtener(catalogo, id_registro)
+        if not registro:
+            return None
+        return getattr(registro, self.CATALOGOS[catalogo][1])
+
+    def activos(self, catalogo: str, ids=None, nombres=None) -> list:
+        """
+        Devuelve los registros activos ordenados por nombre, opcionalmente
+        restringidos a un conjunto de IDs y/o nombres
+
+        Args:
+            catalogo: Nombre del catálogo
+            ids: Conjunto de IDs permitidos (opcional)
+            nombres: Conjunto de nombres permitidos (opcional)
+
+        Returns:
+            list: Registros de solo lectura
+        """
+        atributo = self.CATALOGOS[catalogo][1]
+        resultado = []
+        for registro in self._tabla(catalogo)['registros']:
+            if not registro.Activo:
+                continue
+            if ids is not None and registro.Id not in ids:
+                continue
+            if nombres is not None and getattr(registro, atributo) not in nombres:
+                continue
+            resultado.append(registro)
+        return resultado
+
+
+# Instancia global del registro
+catalogos = RegistroCatalogos()
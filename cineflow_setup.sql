@@ -155,6 +155,48 @@ CREATE TABLE BoletosUsados(
     FOREIGN KEY (IdEncargado) REFERENCES Usuarios(Id)
 );
 
+-- Retenciones temporales de asientos entre la selección y el pago.
+-- La restricción UNIQUE hace que reclamar un asiento sea atómico.
+CREATE TABLE ReservasAsiento(
+    Id INT IDENTITY PRIMARY KEY,
+    IdFunción INT NOT NULL,
+    IdAsiento INT NOT NULL,
+    IdUsuario INT NOT NULL,
+    FechaExpiracion DATETIME2 NOT NULL,
+    FOREIGN KEY (IdFunción) REFERENCES Funciones(Id),
+    FOREIGN KEY (IdAsiento) REFERENCES Asientos(Id),
+    FOREIGN KEY (IdUsuario) REFERENCES Usuarios(Id),
+    UNIQUE (IdFunción, IdAsiento)
+);
+
+GO
+
+-- Resumen precalculado por función para el dashboard administrativo.
+-- Se mantiene desde la aplicación en cada compra, cancelación o uso de boletos
+-- y se puede reconstruir con: python reconstruir_resumen.py
+CREATE TABLE ResumenFunciones(
+    IdFunción INT PRIMARY KEY,
+    Fecha DATE NOT NULL,
+    IdSala INT NOT NULL,
+    IdCine INT NOT NULL,
+    IdPelícula INT NOT NULL,
+    Capacidad INT NOT NULL DEFAULT 0,
+    BoletosVendidos INT NOT NULL DEFAULT 0,
+    Ingresos DECIMAL(14,4) NOT NULL DEFAULT 0,
+    BoletosUsados INT NOT NULL DEFAULT 0,
+    BoletosCancelados INT NOT NULL DEFAULT 0,
+    ValorAcreditado DECIMAL(14,4) NOT NULL DEFAULT 0,
+    FechaActualizacion DATETIME2 NOT NULL DEFAULT GETDATE(),
+    FOREIGN KEY (IdFunción) REFERENCES Funciones(Id),
+    FOREIGN KEY (IdSala) REFERENCES Salas(Id),
+    FOREIGN KEY (IdCine) REFERENCES Cines(Id),
+    FOREIGN KEY (IdPelícula) REFERENCES Películas(Id)
+);
+
+GO
+
+CREATE INDEX IX_ResumenFunciones_Fecha ON ResumenFunciones(Fecha);
+
 GO
 
 -- # Crear validaciones
@@ -756,6 +798,11 @@ CREATE NONCLUSTERED INDEX IX_Usuarios_IdRol_CorreoElectronico
 ON Usuarios(IdRol, CorreoElectrónico)
 INCLUDE (Nombre, Apellidos, ContraseñaHash);
 
+-- Índice para la detección de solapamientos por sala (rango de FechaHora)
+CREATE NONCLUSTERED INDEX IX_Funciones_IdSala_FechaHora
+ON Funciones(IdSala, FechaHora)
+INCLUDE (IdPelícula, Activo);
+
 -- Índice compuesto para búsquedas por fecha en funciones
 CREATE NONCLUSTERED INDEX IX_Funciones_FechaHora_Activo
 ON Funciones(FechaHora, Activo)
@@ -763,4 +810,17 @@ INCLUDE (IdPelícula, IdSala);
 
 -- Índice para consultas de ocupación
 CREATE NONCLUSTERED INDEX IX_Asientos_Sala_Activo
-ON Asientos(IdSala, Activo);
\ No newline at end of file
+ON Asientos(IdSala, Activo);
+-- Índices para la paginación por cursor (keyset) de los listados administrativos:
+-- cubren el orden del listado con Id como desempate
+CREATE NONCLUSTERED INDEX IX_Boletos_FechaCreacion_Id
+ON Boletos(FechaCreacion DESC, Id DESC);
+
+CREATE NONCLUSTERED INDEX IX_BoletosUsados_FechaUso_Id
+ON BoletosUsados(FechaUso DESC, Id DESC);
+
+CREATE NONCLUSTERED INDEX IX_Peliculas_Titulo_Id
+ON Películas(TítuloPelícula, Id);
+
+CREATE NONCLUSTERED INDEX IX_Usuarios_Nombre_Apellidos_Id
+ON Usuarios(Nombre, Apellidos, Id);
\ No newline at end of file
@@ -2,6 +2,7 @@
 # Configuración de la conexión a SQL Server para el Sistema de Biblioteca
 
 import os
+import tempfile
 
 class Config:
     """Configuración de la conexión a SQL Server"""
@@ -23,6 +24,82 @@ class Config:
     CHARSET = 'utf8'
     TDS_VERSION = '7.4'
 
+    # Caché de cartelera y próximamente (segundos de vigencia y número máximo de combinaciones de filtros)
+    CACHE_CARTELERA_TTL = int(os.environ.get('CACHE_CARTELERA_TTL', '60'))
+    CACHE_CARTELERA_MAX_ENTRADAS = int(os.environ.get('CACHE_CARTELERA_MAX_ENTRADAS', '256'))
+    CACHE_CAPACIDAD_SALAS_TTL = int(os.environ.get('CACHE_CAPACIDAD_SALAS_TTL', '3600'))
+    # Catálogos (géneros, tipos de boleto, roles...). Se invalidan al editarlos en este
+    # proceso; el TTL acota cuánto puede tardar otro worker en ver el cambio
+    CACHE_CATALOGOS_TTL = int(os.environ.get('CACHE_CATALOGOS_TTL', '60'))
+    # Identidad del usuario autenticado (current_user). Se invalida al editar el usuario en
+    # este proceso; el TTL acota cuánto puede tardar otro worker en ver el cambio
+    CACHE_USUARIOS_TTL = int(os.environ.get('CACHE_USUARIOS_TTL', '30'))
+    CACHE_USUARIOS_MAX_ENTRADAS = int(os.environ.get('CACHE_USUARIOS_MAX_ENTRADAS', '4096'))
+    # Mapa de asientos vendidos por función (bitset). Las compras y cancelaciones de este
+    # proceso lo actualizan al instante; el TTL acota cuánto tarda en verse lo vendido en otro worker
+    MAPA_ASIENTOS_TTL = int(os.environ.get('MAPA_ASIENTOS_TTL', '15'))
+    MAPA_ASIENTOS_MAX_FUNCIONES = int(os.environ.get('MAPA_ASIENTOS_MAX_FUNCIONES', '2048'))
+
+    # Retención de asientos entre la selección y el pago
+    # 'bd' usa la tabla ReservasAsiento; 'memoria' es un sustituto en proceso (pruebas / un solo proceso)
+    RESERVAS_BACKEND = os.environ.get('RESERVAS_BACKEND', 'bd')
+    RESERVA_ASIENTOS_TTL = int(os.environ.get('RESERVA_ASIENTOS_TTL', '600'))
+
+    # Transacción de compra: los asientos los protege UNIQUE(IdFunción, IdAsiento)
+    # y los créditos de saldo se leen WITH (UPDLOCK, ROWLOCK) en _canjear_saldo, por lo que basta READ COMMITTED
+    COMPRA_ISOLATION_LEVEL = os.environ.get('COMPRA_ISOLATION_LEVEL', 'READ COMMITTED')
+    COMPRA_REINTENTOS_DEADLOCK = int(os.environ.get('COMPRA_REINTENTOS_DEADLOCK', '3'))
+
+    # Contraseñas: costo de bcrypt para hashes nuevos (los existentes conservan el suyo)
+    # y pool de procesos que los calcula fuera del hilo de la petición (0 = en el hilo)
+    BCRYPT_COSTO = int(os.environ.get('BCRYPT_COSTO', '12'))
+    CONTRASENAS_WORKERS = int(os.environ.get('CONTRASENAS_WORKERS', '2'))
+    CONTRASENAS_MAX_PENDIENTES = int(os.environ.get('CONTRASENAS_MAX_PENDIENTES', '8'))
+    CONTRASENAS_TIEMPO_MAXIMO = int(os.environ.get('CONTRASENAS_TIEMPO_MAXIMO', '10'))
+    # Inicios de sesión simultáneos por IP y por cuenta; el exceso se rechaza de inmediato
+    LOGIN_CONCURRENTES_POR_IP = int(os.environ.get('LOGIN_CONCURRENTES_POR_IP', '3'))
+    LOGIN_CONCURRENTES_POR_CUENTA = int(os.environ.get('LOGIN_CONCURRENTES_POR_CUENTA', '1'))
+
+    # Dashboard: leer las métricas de la tabla resumen ResumenFunciones en lugar de los boletos.
+    # Activar después de poblarla con: python reconstruir_resumen.py
+    DASHBOARD_USAR_RESUMEN = os.environ.get('DASHBOARD_USAR_RESUMEN', '0') == '1'
+
+    # Exportaciones del dashboard: filas leídas de la base de datos por lote
+    EXPORTACION_TAMANO_LOTE = int(os.environ.get('EXPORTACION_TAMANO_LOTE', '5000'))
+
+    # Trabajos de exportación en segundo plano (pool de procesos local)
+    EXPORTACION_DIRECTORIO = os.environ.get(
+        'EXPORTACION_DIRECTORIO', os.path.join(tempfile.gettempdir(), 'cineflow_exportaciones')
+    )
+    EXPORTACION_WORKERS = int(os.environ.get('EXPORTACION_WORKERS', '2'))
+    EXPORTACION_RETENCION_HORAS = int(os.environ.get('EXPORTACION_RETENCION_HORAS', '24'))
+    # Segundos tras los cuales un trabajo sin terminar se considera abandonado
+    EXPORTACION_TIEMPO_MAXIMO = int(os.environ.get('EXPORTACION_TIEMPO_MAXIMO', '1800'))
+
+    # Caché de reportes PDF del dashboard (clave: filtros + versión de los datos)
+    REPORTES_CACHE_DIRECTORIO = os.environ.get(
+        'REPORTES_CACHE_DIRECTORIO', os.path.join(tempfile.gettempdir(), 'cineflow_reportes')
+    )
+    REPORTES_CACHE_DIAS = int(os.environ.get('REPORTES_CACHE_DIAS', '7'))
+
+    # Pool de conexiones por proceso. Con gunicorn el máximo de conexiones a SQL Server
+    # es workers x (POOL_TAMANO + POOL_DESBORDE); ver /admin/sistema/pool
+    POOL_TAMANO = int(os.environ.get('POOL_TAMANO', '5'))
+    POOL_DESBORDE = int(os.environ.get('POOL_DESBORDE', '10'))
+    # Segundos que una petición espera una conexión libre antes de fallar
+    POOL_TIEMPO_ESPERA = int(os.environ.get('POOL_TIEMPO_ESPERA', '30'))
+    POOL_RECICLAJE = int(os.environ.get('POOL_RECICLAJE', '3600'))
+    # Verificación de la conexión al tomarla del pool:
+    # 'siempre' (un SELECT 1 en cada uso), 'inactividad' (solo si estuvo inactiva
+    # más de POOL_PING_INACTIVIDAD segundos) o 'nunca'
+    POOL_PRE_PING = os.environ.get('POOL_PRE_PING', 'inactividad')
+    POOL_PING_INACTIVIDAD = int(os.environ.get('POOL_PING_INACTIVIDAD', '60'))
+
+    # Listados administrativos: segundos que se memoriza el total de registros por filtro
+    PAGINACION_TOTAL_TTL = int(os.environ.get('PAGINACION_TOTAL_TTL', '30'))
+    # Sin filtros, usar el conteo de filas del catálogo (sys.dm_db_partition_stats) como total aproximado
+    PAGINACION_TOTAL_APROXIMADO = os.environ.get('PAGINACION_TOTAL_APROXIMADO', '0') == '1'
+
     @staticmethod
     def get_connection_string():
         """
@@ -42,10 +119,11 @@ class Config:
         )
             
 
-    @staticmethod
-    def get_sqlalchemy_url():
+    @classmethod
+    def get_sqlalchemy_url(cls):
         """
         Retorna la URL de conexión para SQLAlchemy usando pymssql
+        (con los valores de la clase de configuración sobre la que se invoca)
 
         Returns:
             str: URL de conexión para SQLAlchemy
@@ -53,8 +131,8 @@ class Config:
         
         # Construir la URL para pymssql
         url = (
-            f"mssql+pymssql://{Config.USERNAME}:{Config.PASSWORD}@{Config.SERVER}:{Config.PORT}/{Config.DATABASE}"
-            f"?charset={Config.CHARSET}&tds_version={Config.TDS_VERSION}"
+            f"mssql+pymssql://{cls.USERNAME}:{cls.PASSWORD}@{cls.SERVER}:{cls.PORT}/{cls.DATABASE}"
+            f"?charset={cls.CHARSET}&tds_version={cls.TDS_VERSION}"
         )
         return url
 
@@ -126,9 +204,25 @@ class ProductionConfig(Config):
     CHARSET = os.environ.get('DB_CHARSET', 'utf8')
     TDS_VERSION = os.environ.get('DB_TDS_VERSION', '7.4')
 
-
-# Configuración por defecto
-config = DevelopmentConfig()
+    # Servidor WSGI (gunicorn, ver gunicorn.conf.py): procesos pre-fork con hilos
+    SERVIDOR_BIND = os.environ.get('SERVIDOR_BIND', '0.0.0.0:5000')
+    SERVIDOR_WORKERS = int(os.environ.get('SERVIDOR_WORKERS', str(min(2 * (os.cpu_count() or 1) + 1, 9))))
+    SERVIDOR_THREADS = int(os.environ.get('SERVIDOR_THREADS', '4'))
+    # Segundos sin respuesta antes de reiniciar un worker, y de espera al detenerlo
+    SERVIDOR_TIMEOUT = int(os.environ.get('SERVIDOR_TIMEOUT', '60'))
+    SERVIDOR_GRACEFUL_TIMEOUT = int(os.environ.get('SERVIDOR_GRACEFUL_TIMEOUT', '30'))
+    SERVIDOR_KEEPALIVE = int(os.environ.get('SERVIDOR_KEEPALIVE', '5'))
+    # Reciclar cada worker tras N peticiones (con variación aleatoria para no reiniciarlos a la vez)
+    SERVIDOR_MAX_REQUESTS = int(os.environ.get('SERVIDOR_MAX_REQUESTS', '2000'))
+    SERVIDOR_MAX_REQUESTS_JITTER = int(os.environ.get('SERVIDOR_MAX_REQUESTS_JITTER', '200'))
+
+    # Una conexión por hilo del worker más un pequeño margen para picos
+    POOL_TAMANO = int(os.environ.get('POOL_TAMANO', str(SERVIDOR_THREADS + 1)))
+    POOL_DESBORDE = int(os.environ.get('POOL_DESBORDE', '4'))
+
+
+# Configuración por defecto (CINEFLOW_MODO=produccion la exporta entrypoint.sh)
+config = ProductionConfig() if os.environ.get('CINEFLOW_MODO') == 'produccion' else DevelopmentConfig()
 
 
 if __name__ == "__main__":
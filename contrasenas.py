@@ -0,0 +1,151 @@
+# contrasenas.py
+# Hash y verificación de contraseñas (bcrypt) fuera del hilo de la petición
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from config import Config
+import multiprocessing
+import threading
+
+
+class ServicioOcupado(Exception):
+    """Se rechaza la operación en lugar de encolar más trabajo de bcrypt del que se puede atender"""
+
+
+def _generar_hash(contrasena: str, costo: int) -> str:
+    from flask_bcrypt import generate_password_hash
+    return generate_password_hash(contrasena, costo).decode('utf-8')
+
+
+def _verificar_hash(hash_guardado: str, contrasena: str) -> bool:
+    from flask_bcrypt import check_password_hash
+    return check_password_hash(hash_guardado, contrasena)
+
+
+class ServicioContrasenas:
+    """
+    bcrypt consume decenas o cientos de ms de CPU por operación: se ejecuta en un
+    pool de procesos acotado para que una ráfaga de inicios de sesión no acapare
+    el intérprete del worker web. Cuando el pool ya tiene su cupo de operaciones
+    pendientes, o una misma IP o cuenta ya tiene verificaciones en curso, se
+    responde de inmediato con ServicioOcupado en lugar de esperar en cola.
+
+    Los límites son por proceso (cada worker de gunicorn tiene los suyos).
+    """
+
+    def __init__(self, workers: int, costo: int, max_pendientes: int,
+                 por_ip: int, por_cuenta: int, tiempo_maximo: int):
+        """
+        Args:
+            workers: Procesos del pool (0 = calcular en el hilo actual)
+            costo: Factor de costo de bcrypt (log2 de las rondas) para hashes nuevos
+            max_pendientes: Operaciones en curso o en cola admitidas a la vez
+            por_ip: Inicios de sesión simultáneos admitidos por IP
+            por_cuenta: Inicios de sesión simultáneos admitidos por cuenta
+            tiempo_maximo: Segundos máximos de espera por una operación
+        """
+        self.workers = workers
+        self.costo = costo
+        self.por_ip = por_ip
+        self.por_cuenta = por_cuenta
+        self.tiempo_maximo = tiempo_maximo
+        self._pendientes = threading.BoundedSemaphore(max(max_pendientes, 1))
+        self._pool = None
+        self._lock = threading.Lock()
+        self._en_curso = {}
+
+    def _obtener_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._pool
+
+    def _ejecutar(self, funcion, *args):
+        if self.workers <= 0:
+            return funcion(*args)
+
+        if not self._pendientes.acquire(blocking=False):
+            raise ServicioOcupado("El servicio está ocupado. Intenta de nuevo en unos segundos.")
+        try:
+            futuro = self._obtener_pool().submit(funcion, *args)
+        except BaseException as e:
+            self._pendientes.release()
+            if isinstance(e, BrokenProcessPool):
+                self._descartar_pool()
+            raise
+        # El cupo se libera cuando el proceso termina el cálculo, no cuando la petición
+        # deja de esperarlo: así un tiempo de espera agotado no abre hueco a más trabajo
+        futuro.add_done_callback(lambda _: self._pendientes.release())
+
+        try:
+            return futuro.result(timeout=self.tiempo_maximo)
+        except FuturesTimeoutError:
+            raise ServicioOcupado("El servicio está ocupado. Intenta de nuevo en unos segundos.")
+        except BrokenProcessPool:
+            self._descartar_pool()
+            raise
+
+    def _descartar_pool(self):
+        """Un proceso del pool murió: el siguiente uso crea un pool nuevo"""
+        with self._lock:
+            self._pool = None
+
+    def generar_hash(self, contrasena: str) -> str:
+        """Hash bcrypt de una contraseña con el costo configurado"""
+        return self._ejecutar(_generar_hash, contrasena, self.costo)
+
+    def verificar(self, hash_guardado: str, contrasena: str) -> bool:
+        """Indica si la contraseña corresponde al hash (un hash vacío nunca coincide)"""
+        if not hash_guardado or not contrasena:
+            return False
+        return self._ejecutar(_verificar_hash, hash_guardado, contrasena)
+
+    @contextmanager
+    def limitar(self, ip=None, cuenta=None):
+        """
+        Reserva un cupo de inicio de sesión para la IP y la cuenta durante el bloque
+
+        Raises:
+            ServicioOcupado: Si la IP o la cuenta ya agotaron sus intentos simultáneos
+        """
+        claves = []
+        if ip:
+            claves.append((f"ip:{ip}", self.por_ip))
+        if cuenta:
+            claves.append((f"cuenta:{cuenta}", self.por_cuenta))
+
+        with self._lock:
+            for clave, limite in claves:
+                if self._en_curso.get(clave, 0) >= limite:
+                    raise ServicioOcupado(
+                        "Ya hay un inicio de sesión en curso. Espera unos segundos e intenta de nuevo."
+                    )
+            for clave, _ in claves:
+                self._en_curso[clave] = self._en_curso.get(clave, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for clave, _ in claves:
+                    restantes = self._en_curso.get(clave, 1) - 1
+                    if restantes > 0:
+                        self._en_curso[clave] = restantes
+                    else:
+                        self._en_curso.pop(clave, None)
+
+
+# Instancia compartida por el proceso
+servicio_contrasenas = ServicioContrasenas(
+    Config.CONTRASENAS_WORKERS,
+    Config.BCRYPT_COSTO,
+    Config.CONTRASENAS_MAX_PENDIENTES,
+    Config.LOGIN_CONCURRENTES_POR_IP,
+    Config.LOGIN_CONCURRENTES_POR_CUENTA,
+    Config.CONTRASENAS_TIEMPO_MAXIMO
+)
@@ -1,6 +1,9 @@
 # controllers/asiento_controller.py
 from database import db
+from cache import invalidar_capacidad_salas, invalidar_totales
+from paginacion import paginar, resultado_vacio, clave_filtros
 from models import Asiento, Sala
+from controllers.resumen_controller import ResumenController
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
 from flask import flash, request
@@ -9,12 +12,11 @@ class AsientoController:
     """Controlador para operaciones CRUD de Asientos"""
 
     @staticmethod
-    def obtener_todos_paginados(pagina=1, por_pagina=25, filtros=None):
-        """Obtiene asientos con paginación"""
+    def obtener_todos_paginados(pagina=1, por_pagina=25, filtros=None, cursor=None):
+        """Obtiene asientos con paginación (por cursor si se indica uno)"""
         session = db.get_session()
         try:
             query = session.query(Asiento).\
-                options(joinedload(Asiento.sala)).\
                 filter(Asiento.Activo == True)
             
             # Aplicar filtros si existen
@@ -25,22 +27,18 @@ class AsientoController:
                     query = query.filter(Asiento.CodigoAsiento.ilike(f'%{filtros["codigo"]}%'))
             
             # Ordenar por sala y código de asiento
-            query = query.order_by(Asiento.IdSala, Asiento.CodigoAsiento)
-            
-            # Paginación
-            asientos = query.offset((pagina - 1) * por_pagina).limit(por_pagina).all()
-            total = query.count()
-            
-            return {
-                'asientos': asientos,
-                'total': total,
-                'pagina': pagina,
-                'por_pagina': por_pagina,
-                'paginas': (total + por_pagina - 1) // por_pagina
-            }
+            resultado = paginar(
+                query,
+                [(Asiento.IdSala, False), (Asiento.CodigoAsiento, False), (Asiento.Id, False)],
+                pagina, por_pagina, cursor,
+                opciones=(joinedload(Asiento.sala),),
+                clave_total=clave_filtros('asientos', filtros)
+            )
+            resultado['asientos'] = resultado.pop('items')
+            return resultado
         except Exception as e:
             flash(f'Error al obtener asientos: {str(e)}', 'danger')
-            return {'asientos': [], 'total': 0, 'pagina': 1, 'por_pagina': por_pagina, 'paginas': 0}
+            return resultado_vacio('asientos', por_pagina=por_pagina)
         finally:
             session.close()
     
@@ -89,7 +87,10 @@ class AsientoController:
                 else:
                     # Reactivar el existente
                     existente.Activo = True
+                    ResumenController.actualizar_capacidad(session, [existente.IdSala])
                     session.commit()
+                    invalidar_totales()
+                    invalidar_capacidad_salas()
                     return True, 'Asiento reactivado exitosamente', existente
             
             # Crear nuevo
@@ -100,7 +101,10 @@ class AsientoController:
             )
             
             session.add(nuevo_asiento)
+            ResumenController.actualizar_capacidad(session, [nuevo_asiento.IdSala])
             session.commit()
+            invalidar_totales()
+            invalidar_capacidad_salas()
             return True, 'Asiento creado exitosamente', nuevo_asiento
             
         except IntegrityError:
@@ -145,14 +149,18 @@ class AsientoController:
             if existente:
                 return False, 'Ya existe otro asiento con ese código en esta sala', None
             
-            # Actualizar
+            # Actualizar (la capacidad cambia en la sala anterior y en la nueva)
+            salas_afectadas = [asiento.IdSala, int(data['IdSala'])]
             asiento.IdSala = int(data['IdSala'])
             asiento.CodigoAsiento = data['CodigoAsiento'].strip()
             
             if 'Activo' in data:
                 asiento.Activo = data['Activo'] == 'on' if isinstance(data['Activo'], str) else bool(data['Activo'])
             
+            ResumenController.actualizar_capacidad(session, salas_afectadas)
             session.commit()
+            invalidar_totales()
+            invalidar_capacidad_salas()
             return True, 'Asiento actualizado exitosamente', asiento
             
         except Exception as e:
@@ -182,7 +190,10 @@ class AsientoController:
             
             # Desactivar (eliminación lógica)
             asiento.Activo = False
+            ResumenController.actualizar_capacidad(session, [asiento.IdSala])
             session.commit()
+            invalidar_totales()
+            invalidar_capacidad_salas()
             
             return True, 'Asiento eliminado exitosamente'
             
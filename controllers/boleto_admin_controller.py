@@ -1,6 +1,10 @@
 # controllers/boleto_admin_controller.py
 from database import db
+from cache import invalidar_totales
+from paginacion import paginar, resultado_vacio, clave_filtros
 from models import Boleto, Funcion, Pelicula, Sala, Cine, Asiento, Usuario, TipoBoleto
+from controllers.resumen_controller import ResumenController
+from mapa_asientos import mapa_asientos
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
 from flask import flash
@@ -10,18 +14,11 @@ class BoletoAdminController:
     """Controlador para operaciones CRUD de Boletos (Administrador)"""
 
     @staticmethod
-    def obtener_todos_paginados(pagina=1, por_pagina=25, filtros=None):
-        """Obtiene boletos con paginación"""
+    def obtener_todos_paginados(pagina=1, por_pagina=25, filtros=None, cursor=None):
+        """Obtiene boletos con paginación (por cursor si se indica uno)"""
         session = db.get_session()
         try:
-            query = session.query(Boleto).\
-                options(
-                    joinedload(Boleto.funcion).joinedload(Funcion.pelicula),
-                    joinedload(Boleto.funcion).joinedload(Funcion.sala).joinedload(Sala.cine),
-                    joinedload(Boleto.asiento),
-                    joinedload(Boleto.usuario),
-                    joinedload(Boleto.tipo_boleto)
-                )
+            query = session.query(Boleto)
             
             # Aplicar filtros si existen
             if filtros:
@@ -38,22 +35,25 @@ class BoletoAdminController:
                     query = query.filter(Boleto.FechaCreacion <= fecha_hasta)
             
             # Ordenar por fecha más reciente primero
-            query = query.order_by(Boleto.FechaCreacion.desc())
-            
-            # Paginación
-            boletos = query.offset((pagina - 1) * por_pagina).limit(por_pagina).all()
-            total = query.count()
-            
-            return {
-                'boletos': boletos,
-                'total': total,
-                'pagina': pagina,
-                'por_pagina': por_pagina,
-                'paginas': (total + por_pagina - 1) // por_pagina
-            }
+            resultado = paginar(
+                query,
+                [(Boleto.FechaCreacion, True), (Boleto.Id, True)],
+                pagina, por_pagina, cursor,
+                opciones=(
+                    joinedload(Boleto.funcion).joinedload(Funcion.pelicula),
+                    joinedload(Boleto.funcion).joinedload(Funcion.sala).joinedload(Sala.cine),
+                    joinedload(Boleto.asiento),
+                    joinedload(Boleto.usuario),
+                    joinedload(Boleto.tipo_boleto)
+                ),
+                clave_total=clave_filtros('boletos', filtros),
+                tabla_aproximada='Boletos' if not any((filtros or {}).values()) else None
+            )
+            resultado['boletos'] = resultado.pop('items')
+            return resultado
         except Exception as e:
             flash(f'Error al obtener boletos: {str(e)}', 'danger')
-            return {'boletos': [], 'total': 0, 'pagina': 1, 'por_pagina': por_pagina, 'paginas': 0}
+            return resultado_vacio('boletos', por_pagina=por_pagina)
         finally:
             session.close()
     
@@ -157,7 +157,13 @@ class BoletoAdminController:
             )
             
             session.add(nuevo_boleto)
+            deltas = {}
+            ResumenController.acumular(deltas, nuevo_boleto.IdFuncion, vendidos=1, ingresos=nuevo_boleto.ValorPagado)
+            session.flush()
+            ResumenController.aplicar_deltas(session, deltas)
             session.commit()
+            invalidar_totales()
+            mapa_asientos.invalidar([nuevo_boleto.IdFuncion])
             return True, 'Boleto creado exitosamente', nuevo_boleto
             
         except IntegrityError:
@@ -244,14 +250,18 @@ class BoletoAdminController:
                 if not cancelado:
                     return False, 'El asiento ya está ocupado para esta función', None
             
-            # Actualizar
+            # Actualizar (el resumen se recalcula para la función anterior y la nueva)
+            funciones_afectadas = [boleto.IdFuncion, int(data['IdFuncion'])]
             boleto.IdFuncion = int(data['IdFuncion'])
             boleto.IdAsiento = int(data['IdAsiento'])
             boleto.IdUsuario = int(data['IdUsuario'])
             boleto.IdTipoBoleto = int(data['IdTipoBoleto'])
             boleto.ValorPagado = float(data['ValorPagado'])
             
+            ResumenController.recalcular_funciones(session, funciones_afectadas)
             session.commit()
+            invalidar_totales()
+            mapa_asientos.invalidar(funciones_afectadas)
             return True, 'Boleto actualizado exitosamente', boleto
             
         except Exception as e:
@@ -289,7 +299,14 @@ class BoletoAdminController:
             
             # Eliminar (eliminación física, ya que es un registro de venta)
             session.delete(boleto)
+            # Solo se eliminan boletos sin cancelar ni usar: cuentan como vendidos y en los ingresos
+            deltas = {}
+            ResumenController.acumular(deltas, boleto.IdFuncion, vendidos=-1, ingresos=-float(boleto.ValorPagado))
+            session.flush()
+            ResumenController.aplicar_deltas(session, deltas)
             session.commit()
+            invalidar_totales()
+            mapa_asientos.invalidar([boleto.IdFuncion])
             
             return True, 'Boleto eliminado exitosamente'
             
@@ -1,6 +1,8 @@
 # controllers/boleto_cancelado_controller.py
 from database import db
 from models import BoletoCancelado, Boleto, Funcion, Pelicula, Usuario
+from controllers.resumen_controller import ResumenController
+from mapa_asientos import mapa_asientos
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
 from flask import flash
@@ -113,7 +115,15 @@ class BoletoCanceladoController:
             )
             
             session.add(nuevo_cancelado)
+            deltas = {}
+            ResumenController.acumular(
+                deltas, boleto.IdFuncion,
+                cancelados=1, ingresos=-float(boleto.ValorPagado), acreditado=nuevo_cancelado.ValorAcreditado
+            )
+            session.flush()
+            ResumenController.aplicar_deltas(session, deltas)
             session.commit()
+            mapa_asientos.liberar(boleto.IdFuncion, [boleto.IdAsiento])
             return True, 'Boleto cancelado registrado exitosamente', nuevo_cancelado
             
         except IntegrityError:
@@ -146,6 +156,7 @@ class BoletoCanceladoController:
             if 'Canjeado' in data:
                 cancelado.Canjeado = data['Canjeado'] == 'on' if isinstance(data['Canjeado'], str) else bool(data['Canjeado'])
             
+            ResumenController.recalcular_por_boletos(session, [cancelado.IdBoleto])
             session.commit()
             return True, 'Registro de boleto cancelado actualizado exitosamente', cancelado
             
@@ -166,9 +177,13 @@ class BoletoCanceladoController:
             if not cancelado:
                 return False, 'Registro de boleto cancelado no encontrado'
             
-            # Eliminar (eliminación física)
+            # Eliminar (eliminación física): el boleto vuelve a ocupar su asiento
+            boleto = session.get(Boleto, cancelado.IdBoleto)
             session.delete(cancelado)
+            ResumenController.recalcular_por_boletos(session, [cancelado.IdBoleto])
             session.commit()
+            if boleto:
+                mapa_asientos.invalidar([boleto.IdFuncion])
             
             return True, 'Registro de boleto cancelado eliminado exitosamente'
             
@@ -1,17 +1,30 @@
 # controllers/boleto_controller.py
 from database import db
-from models import Funcion, Sala, Asiento, Boleto, BoletoCancelado, TipoBoleto, Pelicula, Cine, BoletoUsado
+from config import Config
+from catalogos import catalogos
+from models import Funcion, Sala, Asiento, Boleto, BoletoCancelado, Pelicula, Cine, BoletoUsado
+from controllers.reserva_controller import ReservaController
+from controllers.resumen_controller import ResumenController
+from mapa_asientos import mapa_asientos
 from sqlalchemy.orm import joinedload
-from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, insert
 from datetime import datetime, timedelta
 import traceback
 
 
+class CompraRechazada(Exception):
+    """Rechazo de negocio que deshace la transacción de una compra"""
+
+
 class BoletoController:
     @staticmethod
     def crear_boletos(funcion_id: int, usuario_id: int, asientos_seleccionados: list, tipos_asientos: dict, usar_saldo: bool = False):
         """
-        Crea boletos en la base de datos para una función
+        Crea boletos en la base de datos para una función.
+        Reclamo de asientos, canje de saldo e inserción de boletos ocurren en una
+        sola transacción (una conexión, un commit) con el nivel de aislamiento
+        COMPRA_ISOLATION_LEVEL; ante un deadlock la compra se reintenta completa.
         
         Args:
             funcion_id: ID de la función
@@ -23,122 +36,145 @@ class BoletoController:
         Returns:
             tuple: (success: bool, message: str, boletos_ids: list or None, monto_saldo_usado: float)
         """
-        session = db.get_session()
-        
         try:
-            # Obtener la función con la sala y tipo de sala
-            funcion = session.query(Funcion).options(
-                joinedload(Funcion.sala).joinedload(Sala.tipo_sala)
-            ).filter(Funcion.Id == funcion_id).first()
-            
-            if not funcion:
-                return False, "La función no existe", None, 0.0
-            
-            # Obtener IDs de tipos de boleto
-            tipo_adulto = session.query(TipoBoleto).filter_by(TipoBoleto="Adulto").first()
-            tipo_nino = session.query(TipoBoleto).filter_by(TipoBoleto="Niño").first()
-            
-            if not tipo_adulto or not tipo_nino:
-                return False, "Error en tipos de boleto", None, 0.0
-            
-            # Verificar que todos los asientos estén disponibles
-            for codigo_asiento in asientos_seleccionados:
-                # Buscar el asiento por código en la sala
-                asiento = session.query(Asiento).filter_by(
-                    IdSala=funcion.IdSala,
-                    CodigoAsiento=codigo_asiento
-                ).first()
-                
-                if not asiento:
-                    return False, f"Asiento {codigo_asiento} no encontrado", None, 0.0
-                
-                if not asiento.Activo:
-                    return False, f"Asiento {codigo_asiento} no está activo", None, 0.0
-                
-                # Verificar si ya está vendido (y no cancelado)
-                boleto_existente = session.query(Boleto).filter_by(
-                    IdFuncion=funcion_id,
-                    IdAsiento=asiento.Id
-                ).first()
-                
-                if boleto_existente:
-                    # Verificar si fue cancelado
-                    boleto_cancelado = session.query(BoletoCancelado).filter_by(
-                        IdBoleto=boleto_existente.Id
-                    ).first()
-                    
-                    if not boleto_cancelado:
-                        return False, f"Asiento {codigo_asiento} ya está ocupado", None, 0.0
-            
-            # Calcular el total a pagar
-            total_a_pagar = 0.0
-            for codigo_asiento in asientos_seleccionados:
-                tipo = tipos_asientos.get(codigo_asiento, 'adulto')
-                if tipo == 'nino':
-                    precio = funcion.sala.tipo_sala.PrecioNino
-                else:
-                    precio = funcion.sala.tipo_sala.PrecioAdulto
-                total_a_pagar += float(precio)
-            
-            monto_saldo_usado = 0.0
-            mensaje_saldo = ""
-            
-            # Usar saldo si se solicitó
-            if usar_saldo and total_a_pagar > 0:
-                success_saldo, mensaje_saldo, monto_saldo_usado, boletos_actualizados = BoletoController.utilizar_saldo_en_compra(usuario_id, total_a_pagar)
-                if not success_saldo:
-                    # Si falla el uso de saldo, no continuamos
-                    return False, f"No se pudo usar el saldo: {mensaje_saldo}", None, 0.0
-            
-            boletos_ids = []
-            
-            # Crear boletos
-            for codigo_asiento in asientos_seleccionados:
-                # Obtener el asiento
-                asiento = session.query(Asiento).filter_by(
-                    IdSala=funcion.IdSala,
-                    CodigoAsiento=codigo_asiento
-                ).first()
-                
-                # Determinar precio según tipo
-                tipo = tipos_asientos.get(codigo_asiento, 'adulto')
-                if tipo == 'nino':
-                    id_tipo_boleto = tipo_nino.Id
-                    precio = funcion.sala.tipo_sala.PrecioNino
-                else:
-                    id_tipo_boleto = tipo_adulto.Id
-                    precio = funcion.sala.tipo_sala.PrecioAdulto
-                
-                # Crear boleto
-                boleto = Boleto(
-                    IdFuncion=funcion_id,
-                    IdAsiento=asiento.Id,
-                    IdUsuario=usuario_id,
-                    IdTipoBoleto=id_tipo_boleto,
-                    ValorPagado=float(precio)
-                )
-                
-                session.add(boleto)
-                session.flush()  # Para obtener el ID
-                boletos_ids.append(boleto.Id)
-            
-            # Confirmar transacción
-            session.commit()
-            
-            mensaje = f"{len(boletos_ids)} boletos creados exitosamente."
-            if usar_saldo:
-                mensaje += " " + mensaje_saldo
-            
-            return True, mensaje, boletos_ids, monto_saldo_usado
-            
+            resultado = db.ejecutar_transaccion(
+                lambda session: BoletoController._procesar_compra(
+                    session, funcion_id, usuario_id, asientos_seleccionados, tipos_asientos, usar_saldo
+                ),
+                isolation_level=Config.COMPRA_ISOLATION_LEVEL,
+                reintentos=Config.COMPRA_REINTENTOS_DEADLOCK
+            )
+            ReservaController.confirmar_compra(funcion_id, usuario_id)
+            mapa_asientos.marcar_vendidos(funcion_id, asientos_seleccionados)
+            return resultado
+            
+        except CompraRechazada as e:
+            return False, str(e), None, 0.0
+        except IntegrityError:
+            # UNIQUE(IdFunción, IdAsiento): otro cliente compró el asiento al mismo tiempo
+            # (probablemente en otro worker, cuyo mapa de asientos este proceso aún no conoce)
+            mapa_asientos.invalidar([funcion_id])
+            return False, "Uno o más asientos acaban de ser vendidos. Selecciona otros asientos.", None, 0.0
         except Exception as e:
-            session.rollback()
             print(f"Error al crear boletos: {e}")
             traceback.print_exc()
             return False, f"Error al crear boletos: {str(e)}", None, 0.0
+
+    @staticmethod
+    def _procesar_compra(session, funcion_id: int, usuario_id: int, asientos_seleccionados: list,
+                         tipos_asientos: dict, usar_saldo: bool):
+        """
+        Unidad de trabajo de la compra. No hace commit: lo hace db.ejecutar_transaccion.
+        Los rechazos de negocio se lanzan como CompraRechazada para deshacer todo.
+        """
+        # Obtener la función con la sala y tipo de sala
+        funcion = session.query(Funcion).options(
+            joinedload(Funcion.sala).joinedload(Sala.tipo_sala)
+        ).filter(Funcion.Id == funcion_id).first()
+        
+        if not funcion:
+            raise CompraRechazada("La función no existe")
+        
+        # Obtener IDs de tipos de boleto
+        tipo_adulto = catalogos.buscar_por_nombre('TipoBoleto', "Adulto")
+        tipo_nino = catalogos.buscar_por_nombre('TipoBoleto', "Niño")
+        
+        if not tipo_adulto or not tipo_nino:
+            raise CompraRechazada("Error en tipos de boleto")
+        
+        # Resolver todos los códigos de asiento de la sala en una sola consulta
+        codigos = list(dict.fromkeys(asientos_seleccionados))
+        if not codigos:
+            raise CompraRechazada("No se seleccionaron asientos")
+        
+        asientos = session.query(Asiento.Id, Asiento.CodigoAsiento, Asiento.Activo).filter(
+            Asiento.IdSala == funcion.IdSala,
+            Asiento.CodigoAsiento.in_(codigos)
+        ).all()
+        asientos_por_codigo = {a.CodigoAsiento: a for a in asientos}
+        
+        for codigo_asiento in codigos:
+            asiento = asientos_por_codigo.get(codigo_asiento)
             
-        finally:
-            session.close()
+            if not asiento:
+                raise CompraRechazada(f"Asiento {codigo_asiento} no encontrado")
+            
+            if not asiento.Activo:
+                raise CompraRechazada(f"Asiento {codigo_asiento} no está activo")
+        
+        # Verificar la ocupación de todos los asientos con un anti-join
+        # contra BoletosCancelados (vendido y no cancelado = ocupado)
+        ocupados = session.query(Asiento.CodigoAsiento).join(
+            Boleto, Boleto.IdAsiento == Asiento.Id
+        ).outerjoin(
+            BoletoCancelado, BoletoCancelado.IdBoleto == Boleto.Id
+        ).filter(
+            Boleto.IdFuncion == funcion_id,
+            Boleto.IdAsiento.in_([a.Id for a in asientos]),
+            BoletoCancelado.Id.is_(None)
+        ).all()
+        
+        if ocupados:
+            raise CompraRechazada(f"Asiento {ocupados[0].CodigoAsiento} ya está ocupado")
+        
+        # Verificar que ningún asiento esté retenido por otro cliente
+        retenidos = ReservaController.asientos_retenidos(funcion_id, excluir_usuario_id=usuario_id, session=session)
+        for codigo_asiento in codigos:
+            if asientos_por_codigo[codigo_asiento].Id in retenidos:
+                raise CompraRechazada(f"Asiento {codigo_asiento} está reservado por otro cliente")
+        
+        # Calcular el total a pagar y preparar las filas de boletos
+        total_a_pagar = 0.0
+        filas_boletos = []
+        for codigo_asiento in codigos:
+            tipo = tipos_asientos.get(codigo_asiento, 'adulto')
+            if tipo == 'nino':
+                id_tipo_boleto = tipo_nino.Id
+                precio = funcion.sala.tipo_sala.PrecioNino
+            else:
+                id_tipo_boleto = tipo_adulto.Id
+                precio = funcion.sala.tipo_sala.PrecioAdulto
+            total_a_pagar += float(precio)
+            
+            filas_boletos.append({
+                'IdFuncion': funcion_id,
+                'IdAsiento': asientos_por_codigo[codigo_asiento].Id,
+                'IdUsuario': usuario_id,
+                'IdTipoBoleto': id_tipo_boleto,
+                'ValorPagado': float(precio)
+            })
+        
+        monto_saldo_usado = 0.0
+        mensaje_saldo = ""
+        
+        # Usar saldo si se solicitó
+        if usar_saldo and total_a_pagar > 0:
+            success_saldo, mensaje_saldo, monto_saldo_usado, boletos_actualizados = BoletoController._canjear_saldo(session, usuario_id, total_a_pagar)
+            if not success_saldo:
+                # Si falla el uso de saldo, no continuamos
+                raise CompraRechazada(f"No se pudo usar el saldo: {mensaje_saldo}")
+        
+        # Crear todos los boletos en una sola sentencia que devuelve sus IDs
+        boletos_ids = list(session.scalars(
+            insert(Boleto).returning(Boleto.Id, sort_by_parameter_order=True),
+            filas_boletos
+        ))
+        
+        # Las retenciones del cliente se convierten en boletos dentro de la misma transacción
+        ReservaController.consumir(session, funcion_id, usuario_id)
+        
+        # Resumen del dashboard: incrementos de la función vendida y de las funciones cuyo crédito se canjeó
+        deltas = {}
+        ResumenController.acumular(deltas, funcion_id, vendidos=len(boletos_ids), ingresos=total_a_pagar)
+        if usar_saldo and monto_saldo_usado > 0:
+            BoletoController._acumular_canje(deltas, boletos_actualizados)
+        ResumenController.aplicar_deltas(session, deltas)
+        
+        mensaje = f"{len(boletos_ids)} boletos creados exitosamente."
+        if usar_saldo:
+            mensaje += " " + mensaje_saldo
+        
+        return True, mensaje, boletos_ids, monto_saldo_usado
 
     @staticmethod
     def obtener_boletos_usuario(usuario_id: int):
@@ -288,6 +324,8 @@ class BoletoController:
             
             total_acreditado = 0.0
             boletos_cancelados = []
+            asientos_liberados = {}
+            deltas = {}
             errores = []
             
             for boleto_id in boletos_ids:
@@ -339,6 +377,11 @@ class BoletoController:
                 session.add(boleto_cancelado)
                 total_acreditado += valor_acreditado
                 boletos_cancelados.append(boleto_id)
+                asientos_liberados.setdefault(boleto.IdFuncion, []).append(boleto.IdAsiento)
+                ResumenController.acumular(
+                    deltas, boleto.IdFuncion,
+                    cancelados=1, ingresos=-float(boleto.ValorPagado), acreditado=valor_acreditado
+                )
             
             if errores:
                 session.rollback()
@@ -347,9 +390,14 @@ class BoletoController:
             if not boletos_cancelados:
                 return False, "No se pudo cancelar ningún boleto", 0.0
             
+            ResumenController.aplicar_deltas(session, deltas)
+            
             # Confirmar transacción
             session.commit()
             
+            for funcion_id, asientos_ids in asientos_liberados.items():
+                mapa_asientos.liberar(funcion_id, asientos_ids)
+            
             mensaje = f"{len(boletos_cancelados)} boleto(s) cancelado(s) exitosamente. Se ha acreditado ${total_acreditado:.2f} a tu saldo."
             return True, mensaje, total_acreditado
             
@@ -376,59 +424,13 @@ class BoletoController:
         """
         session = db.get_session()
         try:
-            # Fecha límite: 3 meses atrás desde hoy
-            fecha_limite = datetime.now() - timedelta(days=90)
-            
-            # Obtener boletos cancelados no canjeados, dentro del límite de tiempo, ordenados por fecha de cancelación (más antiguos primero)
-            boletos_cancelados = session.query(BoletoCancelado).join(
-                Boleto, BoletoCancelado.IdBoleto == Boleto.Id
-            ).filter(
-                Boleto.IdUsuario == usuario_id,
-                BoletoCancelado.Canjeado == False,
-                BoletoCancelado.FechaCancelacion >= fecha_limite
-            ).order_by(BoletoCancelado.FechaCancelacion.asc()).all()
-            
-            if not boletos_cancelados:
-                return False, "No hay saldo disponible", 0.0, []
-            
-            monto_restante = monto_a_pagar
-            monto_saldo_usado = 0.0
-            boletos_actualizados = []
-            
-            for boleto_cancelado in boletos_cancelados:
-                if monto_restante <= 0:
-                    break
-                    
-                # Si el valor acreditado es menor o igual al monto restante, usamos todo y marcamos como canjeado
-                if boleto_cancelado.ValorAcreditado <= monto_restante:
-                    monto_restante -= float(boleto_cancelado.ValorAcreditado)
-                    monto_saldo_usado += float(boleto_cancelado.ValorAcreditado)
-                    boleto_cancelado.Canjeado = True
-                    boletos_actualizados.append({
-                        'id': boleto_cancelado.Id,
-                        'valor_acreditado': float(boleto_cancelado.ValorAcreditado),
-                        'canjeado': True
-                    })
-                else:
-                    # Si el valor acreditado es mayor, usamos solo lo necesario y actualizamos el valor restante
-                    monto_saldo_usado += monto_restante
-                    boleto_cancelado.ValorAcreditado -= monto_restante
-                    boletos_actualizados.append({
-                        'id': boleto_cancelado.Id,
-                        'valor_acreditado': float(boleto_cancelado.ValorAcreditado),
-                        'canjeado': False
-                    })
-                    monto_restante = 0
-            
-            session.commit()
-            
-            mensaje = f"Se utilizó ${monto_saldo_usado:.2f} de saldo. "
-            if monto_restante > 0:
-                mensaje += f"Falta pagar ${monto_restante:.2f} con otro método."
-            else:
-                mensaje += "El saldo cubrió el total de la compra."
-                
-            return True, mensaje, monto_saldo_usado, boletos_actualizados
+            resultado = BoletoController._canjear_saldo(session, usuario_id, monto_a_pagar)
+            if resultado[0]:
+                deltas = {}
+                BoletoController._acumular_canje(deltas, resultado[3])
+                ResumenController.aplicar_deltas(session, deltas)
+                session.commit()
+            return resultado
             
         except Exception as e:
             session.rollback()
@@ -436,4 +438,88 @@ class BoletoController:
             traceback.print_exc()
             return False, f"Error al utilizar saldo: {str(e)}", 0.0, []
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    @staticmethod
+    def _acumular_canje(deltas: dict, boletos_actualizados: list):
+        """
+        El resumen suma el ValorAcreditado vigente: un canje parcial lo reduce en
+        la función del boleto cancelado; un canje total solo marca Canjeado.
+        """
+        for boleto in boletos_actualizados:
+            if not boleto['canjeado']:
+                ResumenController.acumular(deltas, boleto['id_funcion'], acreditado=-boleto['monto_canjeado'])
+
+    @staticmethod
+    def _canjear_saldo(session, usuario_id: int, monto_a_pagar: float):
+        """
+        Canjea saldo dentro de la sesión recibida, sin hacer commit.
+        Las filas de BoletosCancelados se leen con WITH (UPDLOCK, ROWLOCK) y el
+        bloqueo se mantiene hasta el commit, para que dos compras simultáneas del
+        mismo cliente no canjeen el mismo crédito.
+        
+        Returns:
+            tuple: (success: bool, message: str, monto_saldo_usado: float, boletos_actualizados: list)
+        """
+        # Fecha límite: 3 meses atrás desde hoy
+        fecha_limite = datetime.now() - timedelta(days=90)
+        
+        # Obtener boletos cancelados no canjeados, dentro del límite de tiempo, ordenados por fecha de cancelación (más antiguos primero).
+        # with_for_update() no genera ningún bloqueo en SQL Server: el hint UPDLOCK se indica
+        # explícitamente. Una segunda compra del mismo cliente espera aquí hasta el commit de la
+        # primera y entonces lee los créditos ya canjeados o reducidos.
+        boletos_cancelados = session.query(BoletoCancelado, Boleto.IdFuncion).join(
+            Boleto, BoletoCancelado.IdBoleto == Boleto.Id
+        ).filter(
+            Boleto.IdUsuario == usuario_id,
+            BoletoCancelado.Canjeado == False,
+            BoletoCancelado.FechaCancelacion >= fecha_limite
+        ).order_by(
+            BoletoCancelado.FechaCancelacion.asc()
+        ).with_hint(BoletoCancelado, 'WITH (UPDLOCK, ROWLOCK)', 'mssql').all()
+        
+        if not boletos_cancelados:
+            return False, "No hay saldo disponible", 0.0, []
+        
+        monto_restante = monto_a_pagar
+        monto_saldo_usado = 0.0
+        boletos_actualizados = []
+        
+        for boleto_cancelado, id_funcion in boletos_cancelados:
+            if monto_restante <= 0:
+                break
+                
+            # Si el valor acreditado es menor o igual al monto restante, usamos todo y marcamos como canjeado
+            if boleto_cancelado.ValorAcreditado <= monto_restante:
+                monto_restante -= float(boleto_cancelado.ValorAcreditado)
+                monto_saldo_usado += float(boleto_cancelado.ValorAcreditado)
+                boleto_cancelado.Canjeado = True
+                boletos_actualizados.append({
+                    'id': boleto_cancelado.Id,
+                    'id_boleto': boleto_cancelado.IdBoleto,
+                    'id_funcion': id_funcion,
+                    'valor_acreditado': float(boleto_cancelado.ValorAcreditado),
+                    'monto_canjeado': float(boleto_cancelado.ValorAcreditado),
+                    'canjeado': True
+                })
+            else:
+                # Si el valor acreditado es mayor, usamos solo lo necesario y actualizamos el valor restante
+                monto_saldo_usado += monto_restante
+                boleto_cancelado.ValorAcreditado = float(boleto_cancelado.ValorAcreditado) - monto_restante
+                boletos_actualizados.append({
+                    'id': boleto_cancelado.Id,
+                    'id_boleto': boleto_cancelado.IdBoleto,
+                    'id_funcion': id_funcion,
+                    'valor_acreditado': float(boleto_cancelado.ValorAcreditado),
+                    'monto_canjeado': monto_restante,
+                    'canjeado': False
+                })
+                monto_restante = 0
+        
+        mensaje = f"Se utilizó ${monto_saldo_usado:.2f} de saldo. "
+        if monto_restante > 0:
+            mensaje += f"Falta pagar ${monto_restante:.2f} con otro método."
+        else:
+            mensaje += "El saldo cubrió el total de la compra."
+            
+        return True, mensaje, monto_saldo_usado, boletos_actualizados
\ No newline at end of file
@@ -1,6 +1,9 @@
 # controllers/boleto_usado_controller.py
 from database import db
+from cache import invalidar_totales
+from paginacion import paginar, resultado_vacio, clave_filtros
 from models import BoletoUsado, Boleto, Funcion, Pelicula, Usuario
+from controllers.resumen_controller import ResumenController
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
 from flask import flash
@@ -10,16 +13,11 @@ class BoletoUsadoController:
     """Controlador para operaciones CRUD de Boletos Usados"""
 
     @staticmethod
-    def obtener_todos_paginados(pagina=1, por_pagina=25, filtros=None):
-        """Obtiene boletos usados con paginación"""
+    def obtener_todos_paginados(pagina=1, por_pagina=25, filtros=None, cursor=None):
+        """Obtiene boletos usados con paginación (por cursor si se indica uno)"""
         session = db.get_session()
         try:
-            query = session.query(BoletoUsado).\
-                options(
-                    joinedload(BoletoUsado.boleto).joinedload(Boleto.funcion).joinedload(Funcion.pelicula),
-                    joinedload(BoletoUsado.boleto).joinedload(Boleto.usuario),
-                    joinedload(BoletoUsado.encargado)
-                )
+            query = session.query(BoletoUsado)
             
             # Aplicar filtros si existen
             if filtros:
@@ -37,22 +35,23 @@ class BoletoUsadoController:
                     query = query.filter(BoletoUsado.FechaUso <= fecha_hasta)
             
             # Ordenar por fecha de uso más reciente primero
-            query = query.order_by(BoletoUsado.FechaUso.desc())
-            
-            # Paginación
-            usados = query.offset((pagina - 1) * por_pagina).limit(por_pagina).all()
-            total = query.count()
-            
-            return {
-                'usados': usados,
-                'total': total,
-                'pagina': pagina,
-                'por_pagina': por_pagina,
-                'paginas': (total + por_pagina - 1) // por_pagina
-            }
+            resultado = paginar(
+                query,
+                [(BoletoUsado.FechaUso, True), (BoletoUsado.Id, True)],
+                pagina, por_pagina, cursor,
+                opciones=(
+                    joinedload(BoletoUsado.boleto).joinedload(Boleto.funcion).joinedload(Funcion.pelicula),
+                    joinedload(BoletoUsado.boleto).joinedload(Boleto.usuario),
+                    joinedload(BoletoUsado.encargado)
+                ),
+                clave_total=clave_filtros('usados', filtros),
+                tabla_aproximada='BoletosUsados' if not any((filtros or {}).values()) else None
+            )
+            resultado['usados'] = resultado.pop('items')
+            return resultado
         except Exception as e:
             flash(f'Error al obtener boletos usados: {str(e)}', 'danger')
-            return {'usados': [], 'total': 0, 'pagina': 1, 'por_pagina': por_pagina, 'paginas': 0}
+            return resultado_vacio('usados', por_pagina=por_pagina)
         finally:
             session.close()
     
@@ -124,7 +123,12 @@ class BoletoUsadoController:
             )
             
             session.add(nuevo_usado)
+            deltas = {}
+            ResumenController.acumular(deltas, boleto.IdFuncion, usados=1)
+            session.flush()
+            ResumenController.aplicar_deltas(session, deltas)
             session.commit()
+            invalidar_totales()
             return True, 'Boleto usado registrado exitosamente', nuevo_usado
             
         except IntegrityError:
@@ -165,6 +169,7 @@ class BoletoUsadoController:
             usado.IdEncargado = int(data['IdEncargado'])
             
             session.commit()
+            invalidar_totales()
             return True, 'Registro de boleto usado actualizado exitosamente', usado
             
         except Exception as e:
@@ -186,7 +191,9 @@ class BoletoUsadoController:
             
             # Eliminar (eliminación física)
             session.delete(usado)
+            ResumenController.recalcular_por_boletos(session, [usado.IdBoleto])
             session.commit()
+            invalidar_totales()
             
             return True, 'Registro de boleto usado eliminado exitosamente'
             
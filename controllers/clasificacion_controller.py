@@ -1,5 +1,6 @@
 # controllers/clasificacion_controller.py
 from database import db
+from catalogos import catalogos
 from models import Clasificacion
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
@@ -64,6 +65,7 @@ class ClasificacionController:
                     # Reactivar la existente
                     existente.Activo = True
                     session.commit()
+                    catalogos.invalidar('Clasificacion')
                     return True, 'Clasificación reactivada exitosamente', existente
             
             # Crear nueva
@@ -74,6 +76,7 @@ class ClasificacionController:
             
             session.add(nueva_clasificacion)
             session.commit()
+            catalogos.invalidar('Clasificacion')
             return True, 'Clasificación creada exitosamente', nueva_clasificacion
             
         except IntegrityError:
@@ -117,6 +120,7 @@ class ClasificacionController:
                 clasificacion.Activo = data['Activo'] == 'on' if isinstance(data['Activo'], str) else bool(data['Activo'])
             
             session.commit()
+            catalogos.invalidar('Clasificacion')
             return True, 'Clasificación actualizada exitosamente', clasificacion
             
         except Exception as e:
@@ -148,6 +152,7 @@ class ClasificacionController:
             # Desactivar (eliminación lógica)
             clasificacion.Activo = False
             session.commit()
+            catalogos.invalidar('Clasificacion')
             
             return True, 'Clasificación eliminada exitosamente'
             
@@ -2,18 +2,34 @@
 # Controlador completo corregido para operaciones del dashboard administrativo
 
 from database import db
+from config import Config
 from models import Cine, Genero, Pelicula, Funcion, Sala, Usuario, Boleto, TipoSala
 from sqlalchemy import text, func, and_, or_, case
 from sqlalchemy.orm import joinedload, aliased
 from datetime import datetime, date, timedelta
 import pandas as pd
 from io import BytesIO
+from openpyxl import Workbook
+import pyarrow as pa
+import pyarrow.parquet as pq
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.lib import colors
+from reportlab.graphics.shapes import Drawing
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+import csv
+import hashlib
+import io
+import json
+import math
+import os
+import tempfile
+import threading
 import traceback
-from typing import List, Dict, Any, Optional
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
 
 class DashboardController:
     """Controlador para operaciones del dashboard administrativo"""
@@ -86,44 +102,94 @@ class DashboardController:
             session.close()
     
     @staticmethod
-    def construir_filtros_sql(params: Dict[str, Any]) -> str:
-        """Construye cláusulas WHERE para SQL basadas en los filtros"""
+    def _fecha_filtro(valor) -> date:
+        """Convierte 'YYYY-MM-DD' (o un date) en date; lanza ValueError si no es válida"""
+        if isinstance(valor, datetime):
+            return valor.date()
+        if isinstance(valor, date):
+            return valor
+        return datetime.strptime(str(valor), '%Y-%m-%d').date()
+    
+    @staticmethod
+    def _lista_json(valores) -> str:
+        """Serializa una lista de IDs como arreglo JSON de enteros (se lee con OPENJSON)"""
+        return json.dumps(sorted({int(v) for v in valores}))
+    
+    @staticmethod
+    def construir_filtros_sql(params: Dict[str, Any]) -> Tuple[str, Dict[str, Tuple[str, Any]]]:
+        """
+        Compila los filtros del dashboard en una cláusula WHERE con parámetros @nombre.
+        Ningún valor se interpola en el texto: las fechas van como DATE y las listas de
+        IDs como un arreglo JSON que se expande con OPENJSON. Así el texto de la sentencia
+        solo depende de qué filtros están presentes y SQL Server reutiliza el plan.
+        
+        La cláusula usa los alias f (Funciones), s (Salas) y p (Películas).
+        
+        Args:
+            params: Filtros del dashboard
+        
+        Returns:
+            tuple: (where_clause: str, parametros: dict nombre -> (tipo_sql, valor))
+        """
         condiciones = []
+        parametros = {}
         
-        # Filtro de fechas (CORREGIDO)
+        # Filtro de fechas (rango semiabierto sobre la fecha de la función)
         if params.get('fecha_inicio') and params.get('fecha_fin'):
-            fecha_inicio = params['fecha_inicio']
-            fecha_fin = params['fecha_fin']
-            
+            condiciones.append("f.FechaHora >= @fecha_inicio AND f.FechaHora < DATEADD(day, 1, @fecha_fin)")
+            parametros['fecha_inicio'] = ('DATE', DashboardController._fecha_filtro(params['fecha_inicio']))
+            parametros['fecha_fin'] = ('DATE', DashboardController._fecha_filtro(params['fecha_fin']))
+        
+        # Listas de IDs: columna -> clave del filtro
+        listas = [
+            ('s.IdCine', 'cine_ids'),
+            ('f.IdPelícula', 'pelicula_ids'),
+            ('f.Id', 'funcion_ids'),
+            ('DATEPART(weekday, f.FechaHora)', 'dias_semana'),
+        ]
+        for columna, clave in listas:
+            if params.get(clave):
+                condiciones.append(f"{columna} IN (SELECT CAST([value] AS INT) FROM OPENJSON(@{clave}))")
+                parametros[clave] = ('NVARCHAR(MAX)', DashboardController._lista_json(params[clave]))
+        
+        # Géneros con EXISTS para no multiplicar filas con un JOIN
+        if params.get('genero_ids'):
             condiciones.append(
-                f"f.FechaHora >= CAST('{fecha_inicio}' AS DATE) "
-                f"AND f.FechaHora < DATEADD(day, 1, CAST('{fecha_fin}' AS DATE))"
+                "EXISTS (SELECT 1 FROM PelículaGénero pg WHERE pg.IdPelícula = p.Id "
+                "AND pg.IdGénero IN (SELECT CAST([value] AS INT) FROM OPENJSON(@genero_ids)))"
             )
+            parametros['genero_ids'] = ('NVARCHAR(MAX)', DashboardController._lista_json(params['genero_ids']))
         
-        # Filtro de cines
-        if params.get('cine_ids') and len(params['cine_ids']) > 0:
-            cine_ids = ','.join(map(str, params['cine_ids']))
-            condiciones.append(f"s.IdCine IN ({cine_ids})")
+        where_clause = " AND ".join(condiciones) if condiciones else "1=1"
+        return where_clause, parametros
+    
+    @staticmethod
+    def ejecutar_parametrizado(session, sql: str, parametros: Dict[str, Tuple[str, Any]]):
+        """
+        Ejecuta una sentencia con parámetros @nombre a través de sp_executesql.
+        pymssql sustituye los valores en el cliente, por lo que sin sp_executesql cada
+        combinación de valores llegaría al servidor como un texto distinto; así el plan
+        se guarda y reutiliza por el texto estable de la sentencia interna.
         
-        # NOTA: No incluimos filtro de géneros aquí para evitar duplicaciones
-        # Se manejará con EXISTS en las consultas principales
+        Args:
+            session: Sesión abierta
+            sql: Sentencia con parámetros @nombre (sin valores interpolados)
+            parametros: dict nombre -> (tipo_sql, valor), como lo devuelve construir_filtros_sql
         
-        # Filtro de películas
-        if params.get('pelicula_ids') and len(params['pelicula_ids']) > 0:
-            pelicula_ids = ','.join(map(str, params['pelicula_ids']))
-            condiciones.append(f"f.IdPelícula IN ({pelicula_ids})")
+        Returns:
+            Resultado de session.execute
+        """
+        if not parametros:
+            return session.execute(text(sql))
         
-        # Filtro de funciones
-        if params.get('funcion_ids') and len(params['funcion_ids']) > 0:
-            funcion_ids = ','.join(map(str, params['funcion_ids']))
-            condiciones.append(f"f.Id IN ({funcion_ids})")
+        def literal(valor: str) -> str:
+            return "N'" + valor.replace("'", "''") + "'"
         
-        # Filtro de días de semana
-        if params.get('dias_semana') and len(params['dias_semana']) > 0:
-            dias_semana = ','.join(map(str, params['dias_semana']))
-            condiciones.append(f"DATEPART(weekday, f.FechaHora) IN ({dias_semana})")
+        declaraciones = ", ".join(f"@{nombre} {tipo}" for nombre, (tipo, _) in parametros.items())
+        asignaciones = ", ".join(f"@{nombre} = :{nombre}" for nombre in parametros)
         
-        return " AND ".join(condiciones) if condiciones else "1=1"
+        lote = text(f"EXEC sp_executesql {literal(sql)}, {literal(declaraciones)}, {asignaciones}")
+        return session.execute(lote, {nombre: valor for nombre, (_, valor) in parametros.items()})
     
     @staticmethod
     def obtener_agrupacion_sql(agrupacion: str) -> str:
@@ -136,456 +202,231 @@ class DashboardController:
             return "CONVERT(DATE, f.FechaHora)"
     
     @staticmethod
-    def obtener_ingresos(filtros: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Obtiene ingresos por período según los filtros aplicados"""
+    def obtener_metricas_periodo(filtros: Dict[str, Any], usar_resumen: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Calcula en una sola consulta todos los contadores por período sobre el conjunto
+        filtrado de funciones y boletos. Cada fila trae lo necesario para derivar las
+        cuatro series del dashboard.
+        
+        Los contadores se leen de la tabla ResumenFunciones (una fila por función) o,
+        si no está activada, se calculan recorriendo una sola vez los boletos.
+        
+        Args:
+            filtros: Filtros del dashboard (fechas, cines, géneros, películas, funciones,
+                días de semana y agrupación)
+            usar_resumen: Leer de la tabla resumen (por defecto Config.DASHBOARD_USAR_RESUMEN)
+        
+        Returns:
+            Lista de diccionarios por período con 'Periodo', 'CapacidadTotal', 'BoletosTotales',
+            'BoletosVendidos' (no cancelados), 'BoletosCancelados', 'BoletosUsados' e 'Ingresos'
+        """
+        if usar_resumen is None:
+            usar_resumen = Config.DASHBOARD_USAR_RESUMEN
+        
         session = db.get_session()
         try:
-            # Construir filtros WHERE
-            where_clause = DashboardController.construir_filtros_sql(filtros)
+            where_clause, parametros = DashboardController.construir_filtros_sql(filtros)
             agrupacion_sql = DashboardController.obtener_agrupacion_sql(filtros.get('agrupacion', 'dia'))
             
-            # Condición de géneros si existe
-            condicion_generos = ""
-            if filtros.get('genero_ids') and len(filtros['genero_ids']) > 0:
-                genero_ids = ','.join(map(str, filtros['genero_ids']))
-                condicion_generos = f"""
-                    AND EXISTS (
-                        SELECT 1 FROM PelículaGénero pg 
-                        WHERE pg.IdPelícula = p.Id 
-                        AND pg.IdGénero IN ({genero_ids})
-                    )
-                """
-            
-            # Query SQL corregida para ingresos
-            query = text(f"""
-                SELECT 
-                    {agrupacion_sql} AS Periodo,
-                    SUM(b.ValorPagado) AS Ingresos,
-                    COUNT(b.Id) AS BoletosVendidos
-                FROM Funciones f
-                INNER JOIN Salas s ON f.IdSala = s.Id
-                INNER JOIN Películas p ON f.IdPelícula = p.Id
-                INNER JOIN Boletos b ON f.Id = b.IdFunción
-                LEFT JOIN BoletosCancelados bc ON b.Id = bc.IdBoleto
-                WHERE {where_clause}
-                    AND f.Activo = 1
-                    AND bc.Id IS NULL  -- Excluir boletos cancelados
-                    {condicion_generos}
-                GROUP BY {agrupacion_sql}
-                ORDER BY Periodo
-            """)
+            if usar_resumen:
+                sql = DashboardController._sql_metricas_resumen(where_clause, agrupacion_sql)
+            else:
+                sql = DashboardController._sql_metricas_boletos(where_clause, agrupacion_sql)
             
-            result = session.execute(query)
             datos = []
-            
-            for row in result:
+            for row in DashboardController.ejecutar_parametrizado(session, sql, parametros):
                 datos.append({
                     'Periodo': row.Periodo.isoformat() if hasattr(row.Periodo, 'isoformat') else str(row.Periodo),
-                    'Ingresos': float(row.Ingresos) if row.Ingresos else 0.0,
-                    'BoletosVendidos': row.BoletosVendidos or 0
+                    'CapacidadTotal': row.CapacidadTotal or 0,
+                    'BoletosTotales': row.BoletosTotales or 0,
+                    'BoletosVendidos': row.BoletosVendidos or 0,
+                    'BoletosCancelados': row.BoletosCancelados or 0,
+                    'BoletosUsados': row.BoletosUsados or 0,
+                    'Ingresos': float(row.Ingresos) if row.Ingresos else 0.0
                 })
             
             return datos
             
-        except Exception as e:
-            print(f"Error en obtener_ingresos: {e}")
-            traceback.print_exc()
-            return []
         finally:
             session.close()
     
     @staticmethod
-    def obtener_ocupacion(filtros: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Obtiene porcentaje de ocupación por período según los filtros."""
-        session = db.get_session()
-        try:
-            # Construir filtros base
-            where_clause = DashboardController.construir_filtros_sql(filtros)
-            agrupacion_sql = DashboardController.obtener_agrupacion_sql(filtros.get('agrupacion', 'dia'))
-            
-            # IMPORTANTE: Modificar where_clause para no incluir filtros que requieren JOIN problemático
-            # Si hay filtro de géneros, lo manejamos aparte
-            filtro_generos = filtros.get('genero_ids', [])
-            
-            # Crear where_clause SIN el filtro de géneros
-            where_conditions = []
-            
-            # Filtro de fechas
-            if filtros.get('fecha_inicio') and filtros.get('fecha_fin'):
-                fecha_inicio = filtros['fecha_inicio']
-                fecha_fin = filtros['fecha_fin']
-                where_conditions.append(f"f.FechaHora >= '{fecha_inicio}' AND f.FechaHora < DATEADD(day, 1, '{fecha_fin}')")
-            
-            # Filtro de cines
-            if filtros.get('cine_ids') and len(filtros['cine_ids']) > 0:
-                cine_ids = ','.join(map(str, filtros['cine_ids']))
-                where_conditions.append(f"s.IdCine IN ({cine_ids})")
-            
-            # Filtro de películas
-            if filtros.get('pelicula_ids') and len(filtros['pelicula_ids']) > 0:
-                pelicula_ids = ','.join(map(str, filtros['pelicula_ids']))
-                where_conditions.append(f"f.IdPelícula IN ({pelicula_ids})")
-            
-            # Filtro de funciones
-            if filtros.get('funcion_ids') and len(filtros['funcion_ids']) > 0:
-                funcion_ids = ','.join(map(str, filtros['funcion_ids']))
-                where_conditions.append(f"f.Id IN ({funcion_ids})")
-            
-            # Filtro de días de semana
-            if filtros.get('dias_semana') and len(filtros['dias_semana']) > 0:
-                dias_semana = ','.join(map(str, filtros['dias_semana']))
-                where_conditions.append(f"DATEPART(weekday, f.FechaHora) IN ({dias_semana})")
-            
-            where_clause_sin_generos = " AND ".join(where_conditions) if where_conditions else "1=1"
-            
-            # Si hay filtro de géneros, agregarlo de forma que no multiplique filas
-            if filtro_generos and len(filtro_generos) > 0:
-                genero_ids = ','.join(map(str, filtro_generos))
-                filtro_genero_sql = f"""
-                    AND EXISTS (
-                        SELECT 1 FROM PelículaGénero pg 
-                        WHERE pg.IdPelícula = p.Id 
-                        AND pg.IdGénero IN ({genero_ids})
-                    )
-                """
-            else:
-                filtro_genero_sql = ""
-            
-            # Query corregida - SIN JOIN con PelículaGénero que multiplica filas
-            query = text(f"""
-                WITH FuncionesConCapacidad AS (
-                    -- Paso 1: Obtener cada función con la capacidad de su sala
+    def _sql_metricas_resumen(where_clause: str, agrupacion_sql: str) -> str:
+        """Contadores por período desde ResumenFunciones: el costo depende del número de funciones"""
+        return f"""
+                SELECT 
+                    {agrupacion_sql} AS Periodo,
+                    SUM(r.Capacidad) AS CapacidadTotal,
+                    SUM(r.BoletosVendidos) AS BoletosTotales,
+                    SUM(r.BoletosVendidos - r.BoletosCancelados) AS BoletosVendidos,
+                    SUM(r.BoletosCancelados) AS BoletosCancelados,
+                    SUM(r.BoletosUsados) AS BoletosUsados,
+                    SUM(r.Ingresos) AS Ingresos
+                FROM ResumenFunciones r
+                INNER JOIN Funciones f ON r.IdFunción = f.Id
+                INNER JOIN Salas s ON f.IdSala = s.Id
+                INNER JOIN Películas p ON f.IdPelícula = p.Id
+                WHERE {where_clause}
+                    AND f.Activo = 1
+                GROUP BY {agrupacion_sql}
+                ORDER BY Periodo
+            """
+    
+    @staticmethod
+    def _sql_metricas_boletos(where_clause: str, agrupacion_sql: str) -> str:
+        """Contadores por período calculados directamente desde los boletos"""
+        return f"""
+                WITH FuncionesFiltradas AS (
+                    -- Funciones que cumplen los filtros, con la capacidad de su sala
                     SELECT 
                         f.Id AS FuncionId,
-                        f.FechaHora,
                         {agrupacion_sql} AS Periodo,
-                        s.Id AS SalaId,
-                        -- Capacidad de la sala para esta función
-                        (
-                            SELECT COUNT(*) 
-                            FROM Asientos a 
-                            WHERE a.IdSala = s.Id 
-                            AND a.Activo = 1
-                        ) AS CapacidadSala
+                        ISNULL(cap.Capacidad, 0) AS CapacidadSala
                     FROM Funciones f
                     INNER JOIN Salas s ON f.IdSala = s.Id
                     INNER JOIN Películas p ON f.IdPelícula = p.Id
-                    WHERE {where_clause_sin_generos}
-                        {filtro_genero_sql}
+                    LEFT JOIN (
+                        SELECT a.IdSala, COUNT(*) AS Capacidad
+                        FROM Asientos a
+                        WHERE a.Activo = 1
+                        GROUP BY a.IdSala
+                    ) cap ON cap.IdSala = s.Id
+                    WHERE {where_clause}
                         AND f.Activo = 1
                 ),
-                BoletosVendidosPorFuncion AS (
-                    -- Paso 2: Contar boletos por función SIN JOINs problemáticos
+                BoletosPorFuncion AS (
+                    -- Un solo recorrido de los boletos de esas funciones
                     SELECT 
                         b.IdFunción AS FuncionId,
-                        COUNT(b.Id) AS BoletosVendidos
+                        COUNT(*) AS BoletosTotales,
+                        SUM(CASE WHEN bc.Id IS NULL THEN 1 ELSE 0 END) AS BoletosVendidos,
+                        SUM(CASE WHEN bc.Id IS NOT NULL THEN 1 ELSE 0 END) AS BoletosCancelados,
+                        SUM(CASE WHEN bu.Id IS NOT NULL THEN 1 ELSE 0 END) AS BoletosUsados,
+                        SUM(CASE WHEN bc.Id IS NULL THEN b.ValorPagado ELSE 0 END) AS Ingresos
                     FROM Boletos b
+                    INNER JOIN FuncionesFiltradas ff ON b.IdFunción = ff.FuncionId
                     LEFT JOIN BoletosCancelados bc ON b.Id = bc.IdBoleto
-                    WHERE bc.Id IS NULL  -- Excluir cancelados
-                        -- Filtrar solo funciones que cumplan los criterios
-                        AND b.IdFunción IN (SELECT FuncionId FROM FuncionesConCapacidad)
+                    LEFT JOIN BoletosUsados bu ON b.Id = bu.IdBoleto
                     GROUP BY b.IdFunción
                 )
-                -- Paso 3: Agrupar por período
                 SELECT 
-                    fc.Periodo,
-                    SUM(fc.CapacidadSala) AS CapacidadTotal,
-                    SUM(ISNULL(bv.BoletosVendidos, 0)) AS BoletosVendidos,
-                    CASE 
-                        WHEN SUM(fc.CapacidadSala) > 0 
-                        THEN (SUM(ISNULL(bv.BoletosVendidos, 0)) * 100.0 / SUM(fc.CapacidadSala))
-                        ELSE 0 
-                    END AS PorcentajeOcupacion
-                FROM FuncionesConCapacidad fc
-                LEFT JOIN BoletosVendidosPorFuncion bv ON fc.FuncionId = bv.FuncionId
-                GROUP BY fc.Periodo
-                ORDER BY fc.Periodo
-            """)
-            
-            result = session.execute(query)
-            datos = []
-            
-            for row in result:
-                # VALIDACIÓN CRÍTICA: Nunca más de 100%
-                capacidad = row.CapacidadTotal or 0
-                boletos = row.BoletosVendidos or 0
-                porcentaje = float(row.PorcentajeOcupacion) if row.PorcentajeOcupacion else 0.0
-                
-                # Verificar integridad de datos
-                if boletos > capacidad:
-                    print(f"⚠️ ADVERTENCIA: Más boletos que capacidad en {row.Periodo}")
-                    print(f"   Capacidad: {capacidad}, Boletos: {boletos}")
-                    print(f"   Porcentaje calculado: {porcentaje:.2f}%")
-                    # Limitar a 100% como medida de seguridad
-                    porcentaje = 100.0
-                
-                datos.append({
-                    'Periodo': row.Periodo.isoformat() if hasattr(row.Periodo, 'isoformat') else str(row.Periodo),
-                    'CapacidadTotal': capacidad,
-                    'BoletosVendidos': boletos,
-                    'PorcentajeOcupacion': min(porcentaje, 100.0)  # Máximo 100%
+                    ff.Periodo,
+                    SUM(ff.CapacidadSala) AS CapacidadTotal,
+                    SUM(ISNULL(bf.BoletosTotales, 0)) AS BoletosTotales,
+                    SUM(ISNULL(bf.BoletosVendidos, 0)) AS BoletosVendidos,
+                    SUM(ISNULL(bf.BoletosCancelados, 0)) AS BoletosCancelados,
+                    SUM(ISNULL(bf.BoletosUsados, 0)) AS BoletosUsados,
+                    SUM(ISNULL(bf.Ingresos, 0)) AS Ingresos
+                FROM FuncionesFiltradas ff
+                LEFT JOIN BoletosPorFuncion bf ON ff.FuncionId = bf.FuncionId
+                GROUP BY ff.Periodo
+                ORDER BY ff.Periodo
+            """
+    
+    @staticmethod
+    def _porcentaje(parte, total) -> float:
+        return (parte * 100.0 / total) if total > 0 else 0.0
+    
+    @staticmethod
+    def derivar_series(metricas: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Deriva las cuatro series del dashboard a partir de los contadores por período
+        
+        Args:
+            metricas: Resultado de obtener_metricas_periodo
+        
+        Returns:
+            Dict con 'ingresos', 'ocupacion', 'boletos_usados' y 'cancelaciones'
+        """
+        porcentaje = DashboardController._porcentaje
+        series = {'ingresos': [], 'ocupacion': [], 'boletos_usados': [], 'cancelaciones': []}
+        
+        for m in metricas:
+            periodo = m['Periodo']
+            
+            # Ingresos: solo períodos con boletos no cancelados
+            if m['BoletosVendidos'] > 0:
+                series['ingresos'].append({
+                    'Periodo': periodo,
+                    'Ingresos': m['Ingresos'],
+                    'BoletosVendidos': m['BoletosVendidos']
                 })
             
-            # Log para debugging
-            if datos:
-                promedio = sum(d['PorcentajeOcupacion'] for d in datos) / len(datos)
-                print(f"📊 Ocupación calculada: {len(datos)} períodos, promedio {promedio:.2f}%")
-            
-            return datos
-            
-        except Exception as e:
-            print(f"❌ Error en obtener_ocupacion: {e}")
-            traceback.print_exc()
-            return []
-        finally:
-            session.close()
+            # Ocupación: todos los períodos con funciones (nunca más de 100%)
+            ocupacion = porcentaje(m['BoletosVendidos'], m['CapacidadTotal'])
+            if m['BoletosVendidos'] > m['CapacidadTotal']:
+                print(f"⚠️ ADVERTENCIA: Más boletos que capacidad en {periodo}")
+                print(f"   Capacidad: {m['CapacidadTotal']}, Boletos: {m['BoletosVendidos']}")
+            series['ocupacion'].append({
+                'Periodo': periodo,
+                'CapacidadTotal': m['CapacidadTotal'],
+                'BoletosVendidos': m['BoletosVendidos'],
+                'PorcentajeOcupacion': min(ocupacion, 100.0)
+            })
+            
+            # Usados y cancelados: sobre el total de boletos emitidos (incluye cancelados)
+            if m['BoletosTotales'] > 0:
+                series['boletos_usados'].append({
+                    'Periodo': periodo,
+                    'BoletosTotales': m['BoletosTotales'],
+                    'BoletosUsados': m['BoletosUsados'],
+                    'PorcentajeUsados': porcentaje(m['BoletosUsados'], m['BoletosTotales'])
+                })
+                series['cancelaciones'].append({
+                    'Periodo': periodo,
+                    'BoletosVendidos': m['BoletosTotales'],
+                    'BoletosCancelados': m['BoletosCancelados'],
+                    'PorcentajeCancelaciones': porcentaje(m['BoletosCancelados'], m['BoletosTotales'])
+                })
+        
+        return series
     
     @staticmethod
-    def obtener_boletos_usados(filtros: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Obtiene porcentaje de boletos usados por período - VERSIÓN SIMPLIFICADA Y CORREGIDA"""
-        session = db.get_session()
+    def _obtener_serie(nombre: str, filtros: Dict[str, Any]) -> List[Dict[str, Any]]:
         try:
-            # Construir filtros base sin condiciones de género para evitar problemas
-            where_conditions = []
-            
-            # Filtro de fechas
-            if filtros.get('fecha_inicio') and filtros.get('fecha_fin'):
-                fecha_inicio = filtros['fecha_inicio']
-                fecha_fin = filtros['fecha_fin']
-                where_conditions.append(f"f.FechaHora >= '{fecha_inicio}' AND f.FechaHora < DATEADD(day, 1, '{fecha_fin}')")
-            
-            # Filtro de cines
-            if filtros.get('cine_ids') and len(filtros['cine_ids']) > 0:
-                cine_ids = ','.join(map(str, filtros['cine_ids']))
-                where_conditions.append(f"s.IdCine IN ({cine_ids})")
-            
-            # Filtro de películas
-            if filtros.get('pelicula_ids') and len(filtros['pelicula_ids']) > 0:
-                pelicula_ids = ','.join(map(str, filtros['pelicula_ids']))
-                where_conditions.append(f"f.IdPelícula IN ({pelicula_ids})")
-            
-            # Filtro de funciones
-            if filtros.get('funcion_ids') and len(filtros['funcion_ids']) > 0:
-                funcion_ids = ','.join(map(str, filtros['funcion_ids']))
-                where_conditions.append(f"f.Id IN ({funcion_ids})")
-            
-            # Filtro de días de semana
-            if filtros.get('dias_semana') and len(filtros['dias_semana']) > 0:
-                dias_semana = ','.join(map(str, filtros['dias_semana']))
-                where_conditions.append(f"DATEPART(weekday, f.FechaHora) IN ({dias_semana})")
-            
-            where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-            
-            # Agrupación
-            agrupacion = filtros.get('agrupacion', 'dia')
-            if agrupacion == 'semana':
-                agrupacion_sql = "DATEADD(day, 1 - DATEPART(weekday, f.FechaHora), CONVERT(DATE, f.FechaHora))"
-            elif agrupacion == 'mes':
-                agrupacion_sql = "DATEFROMPARTS(YEAR(f.FechaHora), MONTH(f.FechaHora), 1)"
-            else:  # 'dia'
-                agrupacion_sql = "CONVERT(DATE, f.FechaHora)"
-            
-            # Consulta simplificada y corregida - Cambiando nombres de CTEs
-            query = text(f"""
-                -- Total de boletos vendidos por período
-                WITH BoletosVendidosCTE AS (
-                    SELECT 
-                        {agrupacion_sql} AS Periodo,
-                        COUNT(*) AS TotalBoletos
-                    FROM Boletos b
-                    INNER JOIN Funciones f ON b.IdFunción = f.Id
-                    INNER JOIN Salas s ON f.IdSala = s.Id
-                    INNER JOIN Películas p ON f.IdPelícula = p.Id
-                    WHERE {where_clause}
-                        AND f.Activo = 1
-                    GROUP BY {agrupacion_sql}
-                ),
-                -- Boletos usados por período
-                BoletosUsadosCTE AS (
-                    SELECT 
-                        {agrupacion_sql} AS Periodo,
-                        COUNT(*) AS BoletosUsados
-                    FROM Boletos b
-                    INNER JOIN Funciones f ON b.IdFunción = f.Id
-                    INNER JOIN Salas s ON f.IdSala = s.Id
-                    INNER JOIN Películas p ON f.IdPelícula = p.Id
-                    INNER JOIN BoletosUsados bu ON b.Id = bu.IdBoleto
-                    WHERE {where_clause}
-                        AND f.Activo = 1
-                    GROUP BY {agrupacion_sql}
-                )
-                -- Combinar resultados
-                SELECT 
-                    COALESCE(bv.Periodo, bu.Periodo) AS Periodo,
-                    COALESCE(bv.TotalBoletos, 0) AS BoletosTotales,
-                    COALESCE(bu.BoletosUsados, 0) AS BoletosUsados,
-                    CASE 
-                        WHEN COALESCE(bv.TotalBoletos, 0) > 0 
-                        THEN (COALESCE(bu.BoletosUsados, 0) * 100.0 / COALESCE(bv.TotalBoletos, 0))
-                        ELSE 0 
-                    END AS PorcentajeUsados
-                FROM BoletosVendidosCTE bv
-                FULL OUTER JOIN BoletosUsadosCTE bu ON bv.Periodo = bu.Periodo
-                ORDER BY Periodo
-            """)
-            
-            print(f"📋 Query Boletos Usados: {query}")  # Para depuración
-            
-            result = session.execute(query)
-            datos = []
-            
-            for row in result:
-                datos.append({
-                    'Periodo': row.Periodo.isoformat() if hasattr(row.Periodo, 'isoformat') else str(row.Periodo),
-                    'BoletosTotales': row.BoletosTotales or 0,
-                    'BoletosUsados': row.BoletosUsados or 0,
-                    'PorcentajeUsados': float(row.PorcentajeUsados) if row.PorcentajeUsados else 0.0
-                })
-            
-            print(f"📊 Boletos Usados: {len(datos)} períodos encontrados")  # Para depuración
-            return datos
-            
+            metricas = DashboardController.obtener_metricas_periodo(filtros)
+            return DashboardController.derivar_series(metricas)[nombre]
         except Exception as e:
-            print(f"❌ Error en obtener_boletos_usados: {e}")
+            print(f"❌ Error al obtener la serie {nombre}: {e}")
             traceback.print_exc()
             return []
-        finally:
-            session.close()
+    
+    @staticmethod
+    def obtener_ingresos(filtros: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Obtiene ingresos por período según los filtros aplicados"""
+        return DashboardController._obtener_serie('ingresos', filtros)
+    
+    @staticmethod
+    def obtener_ocupacion(filtros: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Obtiene porcentaje de ocupación por período según los filtros."""
+        return DashboardController._obtener_serie('ocupacion', filtros)
+    
+    @staticmethod
+    def obtener_boletos_usados(filtros: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Obtiene porcentaje de boletos usados por período"""
+        return DashboardController._obtener_serie('boletos_usados', filtros)
     
     @staticmethod
     def obtener_cancelaciones(filtros: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Obtiene porcentaje de cancelaciones por período - VERSIÓN CORREGIDA"""
-        session = db.get_session()
-        try:
-            # Construir filtros base sin condiciones de género para evitar problemas
-            where_conditions = []
-            
-            # Filtro de fechas
-            if filtros.get('fecha_inicio') and filtros.get('fecha_fin'):
-                fecha_inicio = filtros['fecha_inicio']
-                fecha_fin = filtros['fecha_fin']
-                where_conditions.append(f"f.FechaHora >= '{fecha_inicio}' AND f.FechaHora < DATEADD(day, 1, '{fecha_fin}')")
-            
-            # Filtro de cines
-            if filtros.get('cine_ids') and len(filtros['cine_ids']) > 0:
-                cine_ids = ','.join(map(str, filtros['cine_ids']))
-                where_conditions.append(f"s.IdCine IN ({cine_ids})")
-            
-            # Filtro de películas
-            if filtros.get('pelicula_ids') and len(filtros['pelicula_ids']) > 0:
-                pelicula_ids = ','.join(map(str, filtros['pelicula_ids']))
-                where_conditions.append(f"f.IdPelícula IN ({pelicula_ids})")
-            
-            # Filtro de funciones
-            if filtros.get('funcion_ids') and len(filtros['funcion_ids']) > 0:
-                funcion_ids = ','.join(map(str, filtros['funcion_ids']))
-                where_conditions.append(f"f.Id IN ({funcion_ids})")
-            
-            # Filtro de días de semana
-            if filtros.get('dias_semana') and len(filtros['dias_semana']) > 0:
-                dias_semana = ','.join(map(str, filtros['dias_semana']))
-                where_conditions.append(f"DATEPART(weekday, f.FechaHora) IN ({dias_semana})")
-            
-            where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-            
-            # Agrupación
-            agrupacion = filtros.get('agrupacion', 'dia')
-            if agrupacion == 'semana':
-                agrupacion_sql = "DATEADD(day, 1 - DATEPART(weekday, f.FechaHora), CONVERT(DATE, f.FechaHora))"
-            elif agrupacion == 'mes':
-                agrupacion_sql = "DATEFROMPARTS(YEAR(f.FechaHora), MONTH(f.FechaHora), 1)"
-            else:  # 'dia'
-                agrupacion_sql = "CONVERT(DATE, f.FechaHora)"
-            
-            # Consulta simplificada y corregida - Cambiando nombres de CTEs
-            query = text(f"""
-                -- Total de boletos vendidos por período
-                WITH BoletosVendidosCTE AS (
-                    SELECT 
-                        {agrupacion_sql} AS Periodo,
-                        COUNT(*) AS TotalBoletos
-                    FROM Boletos b
-                    INNER JOIN Funciones f ON b.IdFunción = f.Id
-                    INNER JOIN Salas s ON f.IdSala = s.Id
-                    INNER JOIN Películas p ON f.IdPelícula = p.Id
-                    WHERE {where_clause}
-                        AND f.Activo = 1
-                    GROUP BY {agrupacion_sql}
-                ),
-                -- Boletos cancelados por período
-                CancelacionesCTE AS (
-                    SELECT 
-                        {agrupacion_sql} AS Periodo,
-                        COUNT(*) AS BoletosCancelados
-                    FROM Boletos b
-                    INNER JOIN Funciones f ON b.IdFunción = f.Id
-                    INNER JOIN Salas s ON f.IdSala = s.Id
-                    INNER JOIN Películas p ON f.IdPelícula = p.Id
-                    INNER JOIN BoletosCancelados bc ON b.Id = bc.IdBoleto
-                    WHERE {where_clause}
-                        AND f.Activo = 1
-                    GROUP BY {agrupacion_sql}
-                )
-                -- Combinar resultados
-                SELECT 
-                    COALESCE(bv.Periodo, cc.Periodo) AS Periodo,
-                    COALESCE(bv.TotalBoletos, 0) AS BoletosVendidos,
-                    COALESCE(cc.BoletosCancelados, 0) AS BoletosCancelados,
-                    CASE 
-                        WHEN COALESCE(bv.TotalBoletos, 0) > 0 
-                        THEN (COALESCE(cc.BoletosCancelados, 0) * 100.0 / COALESCE(bv.TotalBoletos, 0))
-                        ELSE 0 
-                    END AS PorcentajeCancelaciones
-                FROM BoletosVendidosCTE bv
-                FULL OUTER JOIN CancelacionesCTE cc ON bv.Periodo = cc.Periodo
-                ORDER BY Periodo
-            """)
-            
-            print(f"📋 Query Cancelaciones: {query}")  # Para depuración
-            
-            result = session.execute(query)
-            datos = []
-            
-            for row in result:
-                datos.append({
-                    'Periodo': row.Periodo.isoformat() if hasattr(row.Periodo, 'isoformat') else str(row.Periodo),
-                    'BoletosVendidos': row.BoletosVendidos or 0,
-                    'BoletosCancelados': row.BoletosCancelados or 0,
-                    'PorcentajeCancelaciones': float(row.PorcentajeCancelaciones) if row.PorcentajeCancelaciones else 0.0
-                })
-            
-            print(f"📊 Cancelaciones: {len(datos)} períodos encontrados")  # Para depuración
-            return datos
-            
-        except Exception as e:
-            print(f"❌ Error en obtener_cancelaciones: {e}")
-            traceback.print_exc()
-            return []
-        finally:
-            session.close()
+        """Obtiene porcentaje de cancelaciones por período"""
+        return DashboardController._obtener_serie('cancelaciones', filtros)
     
     @staticmethod
     def obtener_datos_completos(filtros: Dict[str, Any]) -> Dict[str, Any]:
-        """Obtiene todos los datos del dashboard en un solo llamado"""
+        """Obtiene todos los datos del dashboard con una sola consulta a la base de datos"""
         try:
             print(f"🎯 Obteniendo datos completos con filtros: {filtros}")
             
-            ingresos = DashboardController.obtener_ingresos(filtros)
-            ocupacion = DashboardController.obtener_ocupacion(filtros)
-            boletos_usados = DashboardController.obtener_boletos_usados(filtros)
-            cancelaciones = DashboardController.obtener_cancelaciones(filtros)
+            metricas = DashboardController.obtener_metricas_periodo(filtros)
+            series = DashboardController.derivar_series(metricas)
             
-            print(f"📈 Resultados:")
-            print(f"  - Ingresos: {len(ingresos)} períodos")
-            print(f"  - Ocupación: {len(ocupacion)} períodos")
-            print(f"  - Boletos usados: {len(boletos_usados)} períodos")
-            print(f"  - Cancelaciones: {len(cancelaciones)} períodos")
+            print(f"📈 Resultados: {len(metricas)} períodos")
             
             return {
-                'ingresos': ingresos,
-                'ocupacion': ocupacion,
-                'boletos_usados': boletos_usados,
-                'cancelaciones': cancelaciones,
+                'ingresos': series['ingresos'],
+                'ocupacion': series['ocupacion'],
+                'boletos_usados': series['boletos_usados'],
+                'cancelaciones': series['cancelaciones'],
                 'filtros': filtros
             }
             
@@ -600,26 +441,23 @@ class DashboardController:
                 'filtros': filtros
             }
     
+    # Columnas del detalle exportado, en el orden de _sql_datos_raw
+    COLUMNAS_DETALLE = [
+        'FuncionId', 'FechaHora', 'Cine', 'DireccionCine', 'NúmeroDeSala', 'TipoSala',
+        'Pelicula', 'Clasificación', 'Idioma', 'Generos', 'BoletoId', 'FechaCreacion',
+        'TipoBoleto', 'ValorPagado', 'Cancelado', 'FechaCancelacion', 'ValorAcreditado',
+        'Usado', 'FechaUso', 'Cliente', 'CódigoAsiento'
+    ]
+    
+    # Conversión aplicada al leer cada columna (los nulos numéricos se exportan como 0)
+    COLUMNAS_DETALLE_ENTERAS = {'FuncionId', 'NúmeroDeSala', 'BoletoId', 'Cancelado', 'Usado'}
+    COLUMNAS_DETALLE_DECIMALES = {'ValorPagado', 'ValorAcreditado'}
+    COLUMNAS_DETALLE_FECHAS = {'FechaHora', 'FechaCreacion', 'FechaCancelacion', 'FechaUso'}
+    
     @staticmethod
-    def obtener_datos_raw(filtros: Dict[str, Any]) -> pd.DataFrame:
-        """Obtiene datos sin procesar para exportación a Excel - VERSIÓN CORREGIDA"""
-        session = db.get_session()
-        try:
-            where_clause = DashboardController.construir_filtros_sql(filtros)
-            
-            # Condición de géneros si existe
-            condicion_generos = ""
-            if filtros.get('genero_ids') and len(filtros['genero_ids']) > 0:
-                genero_ids = ','.join(map(str, filtros['genero_ids']))
-                condicion_generos = f"""
-                    AND EXISTS (
-                        SELECT 1 FROM PelículaGénero pg 
-                        WHERE pg.IdPelícula = p.Id 
-                        AND pg.IdGénero IN ({genero_ids})
-                    )
-                """
-            
-            query = text(f"""
+    def _sql_datos_raw(where_clause: str) -> str:
+        """Detalle por boleto (una fila por función sin boletos) para exportación"""
+        return f"""
                 SELECT 
                     f.Id AS FuncionId,
                     f.FechaHora,
@@ -663,118 +501,399 @@ class DashboardController:
                 LEFT JOIN Asientos a ON b.IdAsiento = a.Id
                 WHERE {where_clause}
                     AND f.Activo = 1
-                    {condicion_generos}
                 ORDER BY f.FechaHora, c.Cine, s.NúmeroDeSala
-            """)
-            
-            result = session.execute(query)
-            columns = result.keys()
-            data = result.fetchall()
-            
-            df = pd.DataFrame(data, columns=columns)
-            return df
+            """
+    
+    @staticmethod
+    def _conversor_columna(columna: str):
+        """Devuelve la función que tipa un valor de la columna al leerlo"""
+        if columna in DashboardController.COLUMNAS_DETALLE_ENTERAS:
+            return lambda v: int(v) if v is not None else 0
+        if columna in DashboardController.COLUMNAS_DETALLE_DECIMALES:
+            return lambda v: float(v) if v is not None else 0.0
+        if columna in DashboardController.COLUMNAS_DETALLE_FECHAS:
+            # Sin zona horaria para que Excel no se confunda
+            return lambda v: v.replace(tzinfo=None) if isinstance(v, datetime) else v
+        return lambda v: v
+    
+    @staticmethod
+    def iterar_datos_raw(filtros: Dict[str, Any], tamano_lote: int = None):
+        """
+        Recorre el detalle de exportación por lotes, sin cargarlo completo en memoria.
+        Las filas se leen del cursor con fetchmany (pymssql las va leyendo del flujo
+        TDS a medida que se piden) y se tipan al leerlas.
+        
+        Args:
+            filtros: Filtros del dashboard
+            tamano_lote: Filas por lote (por defecto Config.EXPORTACION_TAMANO_LOTE)
+        
+        Yields:
+            list: Lote de tuplas en el orden de COLUMNAS_DETALLE
+        """
+        tamano_lote = tamano_lote or Config.EXPORTACION_TAMANO_LOTE
+        conversores = [DashboardController._conversor_columna(c) for c in DashboardController.COLUMNAS_DETALLE]
+        
+        session = db.get_session()
+        try:
+            where_clause, parametros = DashboardController.construir_filtros_sql(filtros)
+            sql = DashboardController._sql_datos_raw(where_clause)
+            result = DashboardController.ejecutar_parametrizado(session, sql, parametros)
+            
+            while True:
+                filas = result.fetchmany(tamano_lote)
+                if not filas:
+                    break
+                yield [
+                    tuple(convertir(valor) for convertir, valor in zip(conversores, fila))
+                    for fila in filas
+                ]
+        finally:
+            session.close()
+    
+    @staticmethod
+    def obtener_datos_raw(filtros: Dict[str, Any]) -> pd.DataFrame:
+        """Obtiene el detalle completo en un DataFrame (solo para rangos pequeños)"""
+        try:
+            filas = [fila for lote in DashboardController.iterar_datos_raw(filtros) for fila in lote]
+            return pd.DataFrame(filas, columns=DashboardController.COLUMNAS_DETALLE)
             
         except Exception as e:
             print(f"Error en obtener_datos_raw: {e}")
             traceback.print_exc()
             return pd.DataFrame()
-        finally:
-            session.close()
     
     @staticmethod
-    def generar_excel(filtros: Dict[str, Any]) -> BytesIO:
-        """Genera archivo Excel con datos del dashboard"""
+    def metadatos_exportacion(filtros: Dict[str, Any]) -> List[tuple]:
+        """Filas (parámetro, valor) que describen los filtros de una exportación"""
+        return [
+            ('Fecha de generación', datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+            ('Fecha inicio', filtros.get('fecha_inicio', 'No especificado')),
+            ('Fecha fin', filtros.get('fecha_fin', 'No especificado')),
+            ('Agrupación', filtros.get('agrupacion', 'día').capitalize()),
+            ('Cines seleccionados', len(filtros.get('cine_ids', []))),
+            ('Géneros seleccionados', len(filtros.get('genero_ids', []))),
+            ('Películas seleccionadas', len(filtros.get('pelicula_ids', []))),
+            ('Funciones seleccionadas', len(filtros.get('funcion_ids', []))),
+            ('Días de semana', len(filtros.get('dias_semana', [])))
+        ]
+    
+    @staticmethod
+    def generar_excel(filtros: Dict[str, Any]) -> str:
+        """
+        Genera el archivo Excel del dashboard en un archivo temporal con memoria acotada:
+        el detalle se lee por lotes y se escribe con un libro de solo escritura de
+        openpyxl, que vuelca cada fila a disco en lugar de mantener la hoja en memoria.
+        
+        Args:
+            filtros: Filtros del dashboard
+        
+        Returns:
+            str: Ruta del archivo .xlsx temporal (eliminarlo tras enviarlo, ver transmitir_archivo)
+        """
+        fd, ruta = tempfile.mkstemp(prefix='cineflow_dashboard_', suffix='.xlsx')
+        os.close(fd)
         try:
-            # Obtener datos raw
-            df_raw = DashboardController.obtener_datos_raw(filtros)
-
-            if not df_raw.empty:
-                # 1. Conversión de COLUMNAS NUMÉRICAS
-                columnas_numericas = [
-                    'FuncionId', 'NúmeroDeSala', 'BoletoId', 
-                    'ValorPagado', 'Cancelado', 'ValorAcreditado', 'Usado'
-                ]
-                for col in columnas_numericas:
-                    if col in df_raw.columns:
-                        df_raw[col] = pd.to_numeric(df_raw[col], errors='coerce').fillna(0)
-
-                # 2. Conversión de COLUMNAS DE FECHA
-                # Esto elimina la zona horaria para que Excel no se confunda
-                columnas_fecha = [
-                    'FechaHora', 'FechaCreacion', 'FechaCancelacion', 'FechaUso'
-                ]
-                for col in columnas_fecha:
-                    if col in df_raw.columns:
-                        df_raw[col] = pd.to_datetime(df_raw[col], errors='coerce').dt.tz_localize(None)
-            
-            # Obtener datos agregados
+            libro = Workbook(write_only=True)
+            
+            # Hoja 1: Datos detallados (solo si hay filas)
+            hoja_detalle = None
+            for lote in DashboardController.iterar_datos_raw(filtros):
+                if hoja_detalle is None:
+                    hoja_detalle = libro.create_sheet('Datos_Detallados')
+                    hoja_detalle.append(DashboardController.COLUMNAS_DETALLE)
+                for fila in lote:
+                    hoja_detalle.append(fila)
+            
+            # Hojas 2 a 5: Resúmenes agregados (una consulta)
             datos_completos = DashboardController.obtener_datos_completos(filtros)
-            
-            # Crear buffer para Excel
-            output = BytesIO()
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                # Hoja 1: Datos detallados
-                if not df_raw.empty:
-                    df_raw.to_excel(writer, sheet_name='Datos_Detallados', index=False)
-                
-                # Hoja 2: Resumen de ingresos
-                if datos_completos['ingresos']:
-                    df_ingresos = pd.DataFrame(datos_completos['ingresos'])
-                    df_ingresos.to_excel(writer, sheet_name='Resumen_Ingresos', index=False)
-                
-                # Hoja 3: Resumen de ocupación
-                if datos_completos['ocupacion']:
-                    df_ocupacion = pd.DataFrame(datos_completos['ocupacion'])
-                    df_ocupacion.to_excel(writer, sheet_name='Resumen_Ocupacion', index=False)
-                
-                # Hoja 4: Resumen de boletos usados
-                if datos_completos['boletos_usados']:
-                    df_usados = pd.DataFrame(datos_completos['boletos_usados'])
-                    df_usados.to_excel(writer, sheet_name='Resumen_Boletos_Usados', index=False)
-                
-                # Hoja 5: Resumen de cancelaciones
-                if datos_completos['cancelaciones']:
-                    df_cancel = pd.DataFrame(datos_completos['cancelaciones'])
-                    df_cancel.to_excel(writer, sheet_name='Resumen_Cancelaciones', index=False)
-                
-                # Hoja 6: Metadatos y filtros
-                filtros_info = {
-                    'Parámetro': [
-                        'Fecha de generación',
-                        'Fecha inicio',
-                        'Fecha fin',
-                        'Agrupación',
-                        'Cines seleccionados',
-                        'Géneros seleccionados',
-                        'Películas seleccionadas',
-                        'Funciones seleccionadas',
-                        'Días de semana'
-                    ],
-                    'Valor': [
-                        datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        filtros.get('fecha_inicio', 'No especificado'),
-                        filtros.get('fecha_fin', 'No especificado'),
-                        filtros.get('agrupacion', 'día').capitalize(),
-                        len(filtros.get('cine_ids', [])),
-                        len(filtros.get('genero_ids', [])),
-                        len(filtros.get('pelicula_ids', [])),
-                        len(filtros.get('funcion_ids', [])),
-                        len(filtros.get('dias_semana', []))
-                    ]
-                }
-                
-                df_metadatos = pd.DataFrame(filtros_info)
-                df_metadatos.to_excel(writer, sheet_name='Metadatos', index=False)
-            
-            output.seek(0)
-            return output
+            hojas_resumen = [
+                ('ingresos', 'Resumen_Ingresos'),
+                ('ocupacion', 'Resumen_Ocupacion'),
+                ('boletos_usados', 'Resumen_Boletos_Usados'),
+                ('cancelaciones', 'Resumen_Cancelaciones')
+            ]
+            for clave, nombre_hoja in hojas_resumen:
+                serie = datos_completos[clave]
+                if serie:
+                    hoja = libro.create_sheet(nombre_hoja)
+                    columnas = list(serie[0].keys())
+                    hoja.append(columnas)
+                    for item in serie:
+                        hoja.append([item[c] for c in columnas])
+            
+            # Hoja 6: Metadatos y filtros
+            hoja_metadatos = libro.create_sheet('Metadatos')
+            hoja_metadatos.append(['Parámetro', 'Valor'])
+            for fila in DashboardController.metadatos_exportacion(filtros):
+                hoja_metadatos.append(list(fila))
+            
+            libro.save(ruta)
+            return ruta
             
         except Exception as e:
+            os.remove(ruta)
             print(f"Error en generar_excel: {e}")
             traceback.print_exc()
             raise
     
+    @staticmethod
+    def generar_csv(filtros: Dict[str, Any], comprimir: bool = False):
+        """
+        Genera el detalle en CSV (UTF-8 con BOM para Excel) directamente como flujo
+        de bytes: cada lote leído de la base se escribe y se envía sin acumular el
+        archivo completo. Opcionalmente se comprime con gzip sobre la marcha.
+        
+        Args:
+            filtros: Filtros del dashboard
+            comprimir: Comprimir con gzip
+        
+        Yields:
+            bytes: Bloques del archivo
+        """
+        compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+        
+        def salida(texto: str) -> bytes:
+            datos = texto.encode('utf-8')
+            return compresor.compress(datos) if compresor else datos
+        
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(DashboardController.COLUMNAS_DETALLE)
+        bloque = salida('\ufeff' + buffer.getvalue())
+        if bloque:
+            yield bloque
+        
+        for lote in DashboardController.iterar_datos_raw(filtros):
+            buffer.seek(0)
+            buffer.truncate()
+            escritor.writerows(lote)
+            bloque = salida(buffer.getvalue())
+            if bloque:
+                yield bloque
+        
+        if compresor:
+            yield compresor.flush()
+    
+    @staticmethod
+    def _esquema_parquet():
+        """Esquema explícito del detalle para Parquet (mismo orden que COLUMNAS_DETALLE)"""
+        tipos = {
+            'FuncionId': pa.int32(),
+            'FechaHora': pa.timestamp('ms'),
+            'NúmeroDeSala': pa.int32(),
+            'BoletoId': pa.int32(),
+            'FechaCreacion': pa.timestamp('ms'),
+            'ValorPagado': pa.float64(),
+            'Cancelado': pa.int8(),
+            'FechaCancelacion': pa.timestamp('ms'),
+            'ValorAcreditado': pa.float64(),
+            'Usado': pa.int8(),
+            'FechaUso': pa.timestamp('ms'),
+        }
+        return pa.schema([
+            pa.field(columna, tipos.get(columna, pa.string()))
+            for columna in DashboardController.COLUMNAS_DETALLE
+        ])
+    
+    @staticmethod
+    def generar_parquet(filtros: Dict[str, Any]) -> str:
+        """
+        Genera el detalle en Parquet (columnar, comprimido con snappy) en un archivo
+        temporal. Cada lote leído de la base se escribe como un row group, por lo que
+        la memoria queda acotada al tamaño de lote.
+        
+        Args:
+            filtros: Filtros del dashboard
+        
+        Returns:
+            str: Ruta del archivo .parquet temporal (eliminarlo tras enviarlo, ver transmitir_archivo)
+        """
+        esquema = DashboardController._esquema_parquet()
+        columnas = DashboardController.COLUMNAS_DETALLE
+        
+        fd, ruta = tempfile.mkstemp(prefix='cineflow_dashboard_', suffix='.parquet')
+        os.close(fd)
+        try:
+            with pq.ParquetWriter(ruta, esquema, compression='snappy') as escritor:
+                for lote in DashboardController.iterar_datos_raw(filtros):
+                    valores = list(zip(*lote))
+                    tabla = pa.Table.from_arrays(
+                        [pa.array(valores[i], type=esquema.field(i).type) for i in range(len(columnas))],
+                        schema=esquema
+                    )
+                    escritor.write_table(tabla)
+            return ruta
+            
+        except Exception as e:
+            os.remove(ruta)
+            print(f"Error en generar_parquet: {e}")
+            traceback.print_exc()
+            raise
+    
+    @staticmethod
+    def transmitir_archivo(ruta: str, tamano_bloque: int = 64 * 1024):
+        """
+        Lee un archivo temporal por bloques para una respuesta HTTP en streaming
+        y lo elimina al terminar (o si el cliente corta la descarga).
+        
+        Args:
+            ruta: Ruta del archivo generado
+            tamano_bloque: Bytes por bloque
+        
+        Yields:
+            bytes: Bloques del archivo
+        """
+        try:
+            with open(ruta, 'rb') as archivo:
+                while True:
+                    bloque = archivo.read(tamano_bloque)
+                    if not bloque:
+                        break
+                    yield bloque
+        finally:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+    
+    @staticmethod
+    def _grafica_serie(etiquetas: List[str], valores: List[float], color, tipo: str = 'linea',
+                       maximo: Optional[float] = None) -> Drawing:
+        """
+        Construye una gráfica vectorial (ReportLab graphics) de una serie por período
+        
+        Args:
+            etiquetas: Períodos del eje X
+            valores: Valores de la serie
+            color: Color de la serie
+            tipo: 'linea' o 'barras'
+            maximo: Valor máximo fijo del eje Y (ej. 100 para porcentajes)
+        """
+        dibujo = Drawing(480, 190)
+        grafica = VerticalBarChart() if tipo == 'barras' else HorizontalLineChart()
+        grafica.x, grafica.y = 45, 45
+        grafica.width, grafica.height = 420, 135
+        grafica.data = [valores]
+        
+        # Como máximo ~12 etiquetas en el eje X para que sigan siendo legibles
+        paso = max(1, math.ceil(len(etiquetas) / 12))
+        grafica.categoryAxis.categoryNames = [e if i % paso == 0 else '' for i, e in enumerate(etiquetas)]
+        grafica.categoryAxis.labels.angle = 45
+        grafica.categoryAxis.labels.boxAnchor = 'ne'
+        grafica.categoryAxis.labels.fontSize = 7
+        
+        grafica.valueAxis.valueMin = 0
+        grafica.valueAxis.valueMax = maximo or (max(valores) * 1.1 if valores and max(valores) > 0 else 1)
+        grafica.valueAxis.labels.fontSize = 7
+        
+        if tipo == 'barras':
+            grafica.bars[0].fillColor = color
+            grafica.bars[0].strokeColor = None
+        else:
+            grafica.lines[0].strokeColor = color
+            grafica.lines[0].strokeWidth = 1.5
+        
+        dibujo.add(grafica)
+        return dibujo
+    
+    @staticmethod
+    def _agregar_grafica(elements: list, serie: List[Dict[str, Any]], campo: str, color,
+                         tipo: str = 'linea', maximo: Optional[float] = None):
+        """Agrega al PDF la gráfica de una serie, si tiene datos"""
+        if not serie:
+            return
+        etiquetas = [str(item.get('Periodo', '')) for item in serie]
+        valores = [float(item.get(campo, 0) or 0) for item in serie]
+        elements.append(DashboardController._grafica_serie(etiquetas, valores, color, tipo, maximo))
+        elements.append(Spacer(1, 10))
+    
+    @staticmethod
+    def version_datos() -> str:
+        """
+        Versión de los datos de origen del dashboard, en ambos modos:
+
+        - Hechos: ResumenController actualiza FechaActualizacion de la función en
+          cada compra, cancelación, canje, entrada a sala, edición de boletos o
+          funciones y cambio de asientos (capacidad) de su sala.
+        - Géneros de las películas: se leen en vivo para filtrar, así que se
+          incluye un checksum de PelículaGénero (tabla pequeña).
+
+        Los nombres de catálogos, cines o películas no forman parte de la versión:
+        si se renombran, un PDF en caché conserva el nombre anterior hasta que
+        cambie algún dato o venza REPORTES_CACHE_DIAS.
+        
+        Returns:
+            str: Identificador opaco de la versión
+        """
+        session = db.get_session()
+        try:
+            fila = session.execute(text("""
+                SELECT
+                    (SELECT COUNT_BIG(*) FROM ResumenFunciones) AS Filas,
+                    (SELECT MAX(FechaActualizacion) FROM ResumenFunciones) AS Ultima,
+                    (SELECT COUNT_BIG(*) FROM PelículaGénero) AS Generos,
+                    (SELECT CHECKSUM_AGG(CHECKSUM(IdPelícula, IdGénero)) FROM PelículaGénero) AS ChecksumGeneros
+            """)).one()
+            return '|'.join(str(valor) for valor in fila)
+        finally:
+            session.close()
+    
+    @staticmethod
+    def obtener_pdf(filtros: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        Devuelve el PDF del dashboard desde una caché en disco direccionada por contenido:
+        la clave es el hash de los filtros y de la versión de los datos, por lo que un
+        reporte solo se regenera cuando cambian los datos de origen.
+        
+        Args:
+            filtros: Filtros del dashboard
+        
+        Returns:
+            tuple: (ruta del PDF en caché: str, desde_cache: bool). El archivo no debe eliminarse.
+        """
+        directorio = Config.REPORTES_CACHE_DIRECTORIO
+        os.makedirs(directorio, exist_ok=True)
+        
+        normalizados = {
+            clave: sorted(valor) if isinstance(valor, list) else valor
+            for clave, valor in filtros.items()
+        }
+        contenido = json.dumps(
+            {'filtros': normalizados, 'version': DashboardController.version_datos()},
+            sort_keys=True, default=str
+        )
+        clave = hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+        ruta = os.path.join(directorio, f"{clave}.pdf")
+        
+        if os.path.exists(ruta):
+            os.utime(ruta)
+            return ruta, True
+        
+        DashboardController.limpiar_cache_pdf()
+        
+        datos_dashboard = DashboardController.obtener_datos_completos(filtros)
+        pdf = DashboardController.generar_pdf(datos_dashboard, filtros)
+        
+        # Escritura atómica: otra petición idéntica puede estar generando el mismo archivo
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, 'wb') as archivo:
+            archivo.write(pdf.getbuffer())
+        os.replace(temporal, ruta)
+        
+        return ruta, False
+    
+    @staticmethod
+    def limpiar_cache_pdf():
+        """Elimina los PDF en caché que no se han usado en REPORTES_CACHE_DIAS días"""
+        directorio = Config.REPORTES_CACHE_DIRECTORIO
+        limite = datetime.now() - timedelta(days=Config.REPORTES_CACHE_DIAS)
+        
+        for nombre in os.listdir(directorio):
+            ruta = os.path.join(directorio, nombre)
+            try:
+                if datetime.fromtimestamp(os.path.getmtime(ruta)) < limite:
+                    os.remove(ruta)
+            except OSError:
+                continue
+    
     @staticmethod
     def generar_pdf(datos_dashboard: Dict[str, Any], filtros: Dict[str, Any]) -> BytesIO:
         """Genera PDF con reporte del dashboard"""
@@ -835,6 +954,9 @@ class DashboardController:
             # Ingresos
             ingresos_titulo = Paragraph("1. Ingresos por Boletos", styles['Heading3'])
             elements.append(ingresos_titulo)
+            DashboardController._agregar_grafica(
+                elements, datos_dashboard.get('ingresos'), 'Ingresos', colors.HexColor('#0d6efd'), tipo='barras'
+            )
             
             if datos_dashboard.get('ingresos') and datos_dashboard['ingresos']:
                 ingresos_data = [["Periodo", "Ingresos ($)", "Boletos Vendidos"]]
@@ -864,6 +986,9 @@ class DashboardController:
             # Ocupación
             ocupacion_titulo = Paragraph("2. Ocupación de Salas (%)", styles['Heading3'])
             elements.append(ocupacion_titulo)
+            DashboardController._agregar_grafica(
+                elements, datos_dashboard.get('ocupacion'), 'PorcentajeOcupacion', colors.HexColor('#198754'), maximo=100
+            )
             
             if datos_dashboard.get('ocupacion') and datos_dashboard['ocupacion']:
                 ocupacion_data = [["Periodo", "Capacidad Total", "Boletos Vendidos", "Ocupación %"]]
@@ -893,6 +1018,9 @@ class DashboardController:
             # Boletos Usados
             usados_titulo = Paragraph("3. Boletos Usados (%)", styles['Heading3'])
             elements.append(usados_titulo)
+            DashboardController._agregar_grafica(
+                elements, datos_dashboard.get('boletos_usados'), 'PorcentajeUsados', colors.HexColor('#ffc107'), maximo=100
+            )
             
             if datos_dashboard.get('boletos_usados') and datos_dashboard['boletos_usados']:
                 usados_data = [["Periodo", "Boletos Totales", "Boletos Usados", "Porcentaje %"]]
@@ -921,6 +1049,9 @@ class DashboardController:
             # Cancelaciones
             cancel_titulo = Paragraph("4. Cancelaciones (%)", styles['Heading3'])
             elements.append(cancel_titulo)
+            DashboardController._agregar_grafica(
+                elements, datos_dashboard.get('cancelaciones'), 'PorcentajeCancelaciones', colors.HexColor('#dc3545'), maximo=100
+            )
             
             if datos_dashboard.get('cancelaciones') and datos_dashboard['cancelaciones']:
                 cancel_data = [["Periodo", "Boletos Vendidos", "Boletos Cancelados", "Porcentaje %"]]
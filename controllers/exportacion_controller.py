@@ -0,0 +1,233 @@
+# controllers/exportacion_controller.py
+# Generación de reportes del dashboard en segundo plano (sin broker externo)
+from config import Config
+from controllers.dashboard_controller import DashboardController
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import traceback
+
+
+# Formato -> (extensión, mimetype)
+FORMATOS_EXPORTACION = {
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf'),
+}
+
+ESTADOS_EN_CURSO = ('pendiente', 'procesando')
+
+
+def _ruta_estado(directorio: str, trabajo_id: str) -> str:
+    return os.path.join(directorio, f"{trabajo_id}.json")
+
+
+def _guardar_estado(directorio: str, estado: dict):
+    """Escribe el estado de forma atómica (archivo temporal + reemplazo)"""
+    estado['actualizado'] = datetime.now().isoformat()
+    ruta = _ruta_estado(directorio, estado['id'])
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(estado, archivo, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+
+def _ejecutar_trabajo(estado: dict, filtros: dict, directorio: str):
+    """
+    Punto de entrada en el proceso de trabajo: genera el reporte y lo deja en
+    el directorio de exportaciones, actualizando el archivo de estado.
+    """
+    estado['estado'] = 'procesando'
+    _guardar_estado(directorio, estado)
+
+    extension = FORMATOS_EXPORTACION[estado['formato']][0]
+    destino = os.path.join(directorio, f"{estado['id']}.{extension}")
+    try:
+        if estado['formato'] == 'excel':
+            ruta_temporal = DashboardController.generar_excel(filtros)
+            shutil.move(ruta_temporal, destino)
+        else:
+            ruta_cache, _ = DashboardController.obtener_pdf(filtros)
+            shutil.copyfile(ruta_cache, destino)
+
+        estado['estado'] = 'completado'
+        estado['archivo'] = os.path.basename(destino)
+        estado['tamano'] = os.path.getsize(destino)
+    except Exception as e:
+        print(f"Error en trabajo de exportación {estado['id']}: {e}")
+        traceback.print_exc()
+        estado['estado'] = 'error'
+        estado['mensaje'] = str(e)
+
+    _guardar_estado(directorio, estado)
+
+
+class ExportacionController:
+    """
+    Cola local de trabajos de exportación del dashboard.
+
+    Los reportes se generan en un pool de procesos y tanto el estado (JSON) como
+    el archivo resultante se guardan en Config.EXPORTACION_DIRECTORIO, de modo que
+    cualquier proceso web puede consultar el estado o servir la descarga. El ID del
+    trabajo es un hash del formato, los filtros y la versión de los datos
+    (DashboardController.version_datos): dos solicitudes idénticas comparten el
+    trabajo en curso, y un reporte terminado solo se reutiliza mientras no haya
+    cambiado ningún dato de origen.
+    """
+
+    _pool = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _directorio() -> str:
+        os.makedirs(Config.EXPORTACION_DIRECTORIO, exist_ok=True)
+        return Config.EXPORTACION_DIRECTORIO
+
+    @staticmethod
+    def _obtener_pool() -> ProcessPoolExecutor:
+        if ExportacionController._pool is None:
+            with ExportacionController._lock:
+                if ExportacionController._pool is None:
+                    # 'spawn' evita heredar las conexiones abiertas del proceso web
+                    ExportacionController._pool = ProcessPoolExecutor(
+                        max_workers=Config.EXPORTACION_WORKERS,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return ExportacionController._pool
+
+    @staticmethod
+    def calcular_id(formato: str, filtros: dict, version: str) -> str:
+        """Hash estable del formato, los filtros (las listas se normalizan) y la versión de los datos"""
+        normalizados = {
+            clave: sorted(valor) if isinstance(valor, list) else valor
+            for clave, valor in filtros.items()
+        }
+        contenido = json.dumps(
+            {'formato': formato, 'filtros': normalizados, 'version': version},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:32]
+
+    @staticmethod
+    def obtener_estado(trabajo_id: str):
+        """
+        Obtiene el estado de un trabajo
+
+        Returns:
+            dict or None: Estado del trabajo o None si no existe
+        """
+        if not re.fullmatch(r'[0-9a-f]{32}', trabajo_id or ''):
+            return None
+
+        ruta = _ruta_estado(ExportacionController._directorio(), trabajo_id)
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    @staticmethod
+    def _vigente(estado: dict) -> bool:
+        """
+        Un trabajo sirve para deduplicar si está en curso (sin exceder el tiempo
+        máximo) o completado dentro del período de retención; como el ID incluye la
+        versión de los datos, un trabajo completado refleja los datos actuales.
+        """
+        actualizado = datetime.fromisoformat(estado['actualizado'])
+        if estado['estado'] in ESTADOS_EN_CURSO:
+            return datetime.now() - actualizado < timedelta(seconds=Config.EXPORTACION_TIEMPO_MAXIMO)
+        if estado['estado'] == 'completado':
+            return datetime.now() - actualizado < timedelta(hours=Config.EXPORTACION_RETENCION_HORAS)
+        return False
+
+    @staticmethod
+    def solicitar(formato: str, filtros: dict):
+        """
+        Encola la generación de un reporte o reutiliza uno idéntico en curso o ya
+        generado con los mismos datos
+
+        Args:
+            formato: 'excel' o 'pdf'
+            filtros: Filtros del dashboard
+
+        Returns:
+            tuple: (success: bool, message: str, estado: dict or None)
+        """
+        if formato not in FORMATOS_EXPORTACION:
+            return False, f"Formato no soportado: {formato}", None
+
+        try:
+            directorio = ExportacionController._directorio()
+            ExportacionController.limpiar_vencidos()
+
+            trabajo_id = ExportacionController.calcular_id(formato, filtros, DashboardController.version_datos())
+            existente = ExportacionController.obtener_estado(trabajo_id)
+            if existente and ExportacionController._vigente(existente):
+                if existente['estado'] == 'completado':
+                    return True, "Los datos no han cambiado desde el último reporte idéntico: se reutiliza", existente
+                return True, "Ya se está preparando un reporte idéntico", existente
+
+            ahora = datetime.now()
+            estado = {
+                'id': trabajo_id,
+                'formato': formato,
+                'estado': 'pendiente',
+                'creado': ahora.isoformat(),
+                'nombre_descarga': f"cineflow_dashboard_{ahora.strftime('%Y%m%d_%H%M%S')}.{FORMATOS_EXPORTACION[formato][0]}",
+                'archivo': None,
+                'mensaje': None
+            }
+
+            # Reclamo atómico del ID: si otro proceso web lo acaba de crear, se reutiliza el suyo
+            ruta = _ruta_estado(directorio, trabajo_id)
+            if existente is None:
+                try:
+                    os.close(os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                except FileExistsError:
+                    otro = ExportacionController.obtener_estado(trabajo_id)
+                    return True, "Ya se está preparando un reporte idéntico", otro or estado
+            _guardar_estado(directorio, estado)
+
+            ExportacionController._obtener_pool().submit(_ejecutar_trabajo, estado, filtros, directorio)
+            return True, "Reporte en preparación", estado
+
+        except Exception as e:
+            print(f"Error al solicitar exportación: {e}")
+            traceback.print_exc()
+            return False, f"Error al solicitar exportación: {str(e)}", None
+
+    @staticmethod
+    def ruta_archivo(estado: dict):
+        """
+        Ruta del archivo generado por un trabajo completado
+
+        Returns:
+            tuple: (ruta: str or None, mimetype: str or None)
+        """
+        if not estado or estado.get('estado') != 'completado' or not estado.get('archivo'):
+            return None, None
+
+        ruta = os.path.join(ExportacionController._directorio(), os.path.basename(estado['archivo']))
+        if not os.path.exists(ruta):
+            return None, None
+        return ruta, FORMATOS_EXPORTACION[estado['formato']][1]
+
+    @staticmethod
+    def limpiar_vencidos():
+        """Elimina los reportes (y sus estados) que superaron el período de retención"""
+        directorio = ExportacionController._directorio()
+        limite = datetime.now() - timedelta(hours=Config.EXPORTACION_RETENCION_HORAS)
+
+        for nombre in os.listdir(directorio):
+            ruta = os.path.join(directorio, nombre)
+            try:
+                if datetime.fromtimestamp(os.path.getmtime(ruta)) < limite:
+                    os.remove(ruta)
+            except OSError:
+                # Otro proceso lo eliminó o lo está reemplazando
+                continue
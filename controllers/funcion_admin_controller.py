@@ -1,25 +1,33 @@
 # controllers/funcion_admin_controller.py
 from database import db
+from cache import invalidar_cartelera, cache_capacidad_salas, invalidar_totales
+from paginacion import paginar, resultado_vacio, clave_filtros
+from mapa_asientos import mapa_asientos
 from models import Funcion, Pelicula, Sala, Cine, TipoSala, Asiento, Boleto, BoletoCancelado, BoletoUsado
+from controllers.resumen_controller import ResumenController
+from sqlalchemy import func, insert
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
 from flask import flash
 from datetime import datetime, timedelta
+from bisect import bisect_left, insort
+import traceback
 
 class FuncionAdminController:
     """Controlador para operaciones CRUD de Funciones (Administrador)"""
 
+    # Minutos de limpieza/preparación entre funciones de una misma sala
+    MARGEN_MINUTOS = 30
+
+    # Máximo de funciones que se pueden proponer en una programación en bloque
+    MAX_FUNCIONES_LOTE = 1000
+
     @staticmethod
-    def obtener_todas_paginadas(pagina=1, por_pagina=25, filtros=None):
-        """Obtiene funciones con paginación"""
+    def obtener_todas_paginadas(pagina=1, por_pagina=25, filtros=None, cursor=None):
+        """Obtiene funciones con paginación (por cursor si se indica uno)"""
         session = db.get_session()
         try:
             query = session.query(Funcion).\
-                options(
-                    joinedload(Funcion.pelicula),
-                    joinedload(Funcion.sala).joinedload(Sala.cine),
-                    joinedload(Funcion.sala).joinedload(Sala.tipo_sala)
-                ).\
                 filter(Funcion.Activo == True)
             
             # Aplicar filtros si existen
@@ -36,23 +44,23 @@ class FuncionAdminController:
                     fecha_hasta = fecha_hasta.replace(hour=23, minute=59, second=59)
                     query = query.filter(Funcion.FechaHora <= fecha_hasta)
             
-            # Ordenar por fecha más reciente primero
-            query = query.order_by(Funcion.FechaHora.desc())
-            
-            # Paginación
-            funciones = query.offset((pagina - 1) * por_pagina).limit(por_pagina).all()
-            total = query.count()
-            
-            return {
-                'funciones': funciones,
-                'total': total,
-                'pagina': pagina,
-                'por_pagina': por_pagina,
-                'paginas': (total + por_pagina - 1) // por_pagina
-            }
+            # Fecha más reciente primero (Id desempata funciones a la misma hora)
+            resultado = paginar(
+                query,
+                [(Funcion.FechaHora, True), (Funcion.Id, True)],
+                pagina, por_pagina, cursor,
+                opciones=(
+                    joinedload(Funcion.pelicula),
+                    joinedload(Funcion.sala).joinedload(Sala.cine),
+                    joinedload(Funcion.sala).joinedload(Sala.tipo_sala)
+                ),
+                clave_total=clave_filtros('funciones', filtros)
+            )
+            resultado['funciones'] = resultado.pop('items')
+            return resultado
         except Exception as e:
             flash(f'Error al obtener funciones: {str(e)}', 'danger')
-            return {'funciones': [], 'total': 0, 'pagina': 1, 'por_pagina': por_pagina, 'paginas': 0}
+            return resultado_vacio('funciones', por_pagina=por_pagina)
         finally:
             session.close()
     
@@ -76,6 +84,129 @@ class FuncionAdminController:
         finally:
             session.close()
     
+    @staticmethod
+    def _cargar_intervalos(session, sala_ids, desde: datetime, hasta: datetime, excluir_ids=None) -> dict:
+        """
+        Carga las funciones activas de las salas que pueden solaparse con [desde, hasta).
+        Solo se consulta la ventana [desde - (duración máxima + margen), hasta), que
+        resuelve el índice IX_Funciones_IdSala_FechaHora; la duración de cada
+        película se trae en la misma consulta.
+        
+        Returns:
+            dict: sala_id -> lista ordenada de (inicio, fin, funcion_id)
+        """
+        duracion_maxima = session.query(func.max(Pelicula.DuracionMinutos)).scalar() or 0
+        inicio_ventana = desde - timedelta(minutes=duracion_maxima + FuncionAdminController.MARGEN_MINUTOS)
+        
+        query = session.query(
+            Funcion.Id,
+            Funcion.IdSala,
+            Funcion.FechaHora,
+            Pelicula.DuracionMinutos
+        ).join(
+            Pelicula, Funcion.IdPelicula == Pelicula.Id
+        ).filter(
+            Funcion.IdSala.in_(list(set(sala_ids))),
+            Funcion.Activo == True,
+            Funcion.FechaHora >= inicio_ventana,
+            Funcion.FechaHora < hasta
+        )
+        if excluir_ids:
+            query = query.filter(~Funcion.Id.in_(list(excluir_ids)))
+        
+        intervalos = {sala_id: [] for sala_id in sala_ids}
+        for funcion_id, sala_id, inicio, duracion in query.all():
+            fin = inicio + timedelta(minutes=duracion + FuncionAdminController.MARGEN_MINUTOS)
+            intervalos[sala_id].append((inicio, fin, funcion_id))
+        
+        for lista in intervalos.values():
+            lista.sort()
+        return intervalos
+    
+    @staticmethod
+    def _buscar_en_intervalos(intervalos, inicio: datetime, fin: datetime, duracion_maxima_minutos: int):
+        """
+        Busca en una lista ordenada de (inicio, fin, funcion_id) el primer intervalo
+        que se cruce con [inicio, fin). Solo se revisan los que empiezan dentro de
+        la ventana posible gracias a la búsqueda binaria.
+        """
+        inicios = [i[0] for i in intervalos]
+        desde = bisect_left(inicios, inicio - timedelta(minutes=duracion_maxima_minutos))
+        hasta = bisect_left(inicios, fin)
+        for inicio_existente, fin_existente, funcion_id in intervalos[desde:hasta]:
+            if inicio < fin_existente and fin > inicio_existente:
+                return {'funcion_id': funcion_id, 'inicio': inicio_existente, 'fin': fin_existente}
+        return None
+    
+    @staticmethod
+    def buscar_solapamiento(session, sala_id: int, inicio: datetime, duracion_minutos: int, excluir_id=None):
+        """
+        Verifica si una función propuesta se solapa con otra de la misma sala
+        
+        Args:
+            session: Sesión abierta
+            sala_id: ID de la sala
+            inicio: Fecha y hora de inicio propuesta
+            duracion_minutos: Duración de la película (sin margen)
+            excluir_id: ID de función a ignorar (la que se está editando)
+            
+        Returns:
+            dict con la función en conflicto ('funcion_id', 'inicio', 'fin') o None
+        """
+        fin = inicio + timedelta(minutes=duracion_minutos + FuncionAdminController.MARGEN_MINUTOS)
+        intervalos = FuncionAdminController._cargar_intervalos(
+            session, [sala_id], inicio, fin, excluir_ids=[excluir_id] if excluir_id else None
+        )
+        duracion_maxima = max([(f - i).total_seconds() // 60 for i, f, _ in intervalos[sala_id]] or [0])
+        return FuncionAdminController._buscar_en_intervalos(intervalos[sala_id], inicio, fin, duracion_maxima)
+    
+    @staticmethod
+    def verificar_solapamientos_lote(session, propuestas: list) -> dict:
+        """
+        Valida de una vez una grilla de funciones propuestas (ej. una semana completa)
+        contra las funciones existentes y contra las demás propuestas del lote.
+        Hace una sola consulta por rango para todas las salas involucradas.
+        
+        Args:
+            session: Sesión abierta
+            propuestas: Lista de dicts con 'clave', 'sala_id', 'inicio' y 'duracion'
+                (minutos de película, sin margen). Se evalúan en el orden recibido.
+            
+        Returns:
+            dict: clave -> None si la propuesta es válida, o dict del conflicto
+                ('funcion_id' es None cuando el conflicto es con otra propuesta del lote)
+        """
+        if not propuestas:
+            return {}
+        
+        margen = FuncionAdminController.MARGEN_MINUTOS
+        desde = min(p['inicio'] for p in propuestas)
+        hasta = max(p['inicio'] + timedelta(minutes=p['duracion'] + margen) for p in propuestas)
+        
+        intervalos = FuncionAdminController._cargar_intervalos(
+            session, [p['sala_id'] for p in propuestas], desde, hasta
+        )
+        
+        duracion_maxima = max(
+            [(f - i).total_seconds() // 60 for lista in intervalos.values() for i, f, _ in lista] +
+            [p['duracion'] + margen for p in propuestas]
+        )
+        
+        resultado = {}
+        for propuesta in propuestas:
+            inicio = propuesta['inicio']
+            fin = inicio + timedelta(minutes=propuesta['duracion'] + margen)
+            lista = intervalos[propuesta['sala_id']]
+            
+            conflicto = FuncionAdminController._buscar_en_intervalos(lista, inicio, fin, duracion_maxima)
+            resultado[propuesta['clave']] = conflicto
+            
+            # Una propuesta válida ocupa su horario para las siguientes del lote
+            if conflicto is None:
+                insort(lista, (inicio, fin, None))
+        
+        return resultado
+    
     @staticmethod
     def crear(data):
         """Crea una nueva función"""
@@ -117,30 +248,9 @@ class FuncionAdminController:
             
             # Verificar si hay solapamiento de funciones en la misma sala
             # Considerar duración de la película (margen de 30 minutos entre funciones)
-            duracion_total = pelicula.DuracionMinutos + 30  # Película + limpieza/preparación
-            
-            inicio_funcion = fecha_hora
-            fin_funcion = fecha_hora + timedelta(minutes=duracion_total)
-            
-            # CORRECCIÓN: Obtener las funciones existentes y verificar solapamiento en Python
-            funciones_existentes = session.query(Funcion).\
-                join(Pelicula, Funcion.IdPelicula == Pelicula.Id).\
-                filter(Funcion.IdSala == int(data['IdSala'])).\
-                filter(Funcion.Activo == True).all()
-            
-            solapamiento = False
-            for funcion_existente in funciones_existentes:
-                # Calcular duración de la función existente
-                duracion_existente = funcion_existente.pelicula.DuracionMinutos + 30
-                
-                # Calcular inicio y fin de la función existente
-                inicio_existente = funcion_existente.FechaHora
-                fin_existente = inicio_existente + timedelta(minutes=duracion_existente)
-                
-                # Verificar solapamiento
-                if (inicio_funcion < fin_existente) and (fin_funcion > inicio_existente):
-                    solapamiento = True
-                    break
+            solapamiento = FuncionAdminController.buscar_solapamiento(
+                session, int(data['IdSala']), fecha_hora, pelicula.DuracionMinutos
+            )
             
             if solapamiento:
                 return False, 'La sala ya tiene una función programada en ese horario', None
@@ -154,7 +264,11 @@ class FuncionAdminController:
             )
             
             session.add(nueva_funcion)
+            session.flush()
+            ResumenController.recalcular_funciones(session, [nueva_funcion.Id])
             session.commit()
+            invalidar_totales()
+            invalidar_cartelera()
             return True, 'Función creada exitosamente', nueva_funcion
             
         except IntegrityError:
@@ -166,6 +280,158 @@ class FuncionAdminController:
         finally:
             session.close()
     
+    @staticmethod
+    def programar_lote(data):
+        """
+        Programa en bloque una película en varias salas, para un rango de fechas
+        y un conjunto de horarios. Toda la grilla se valida en memoria después de
+        una sola consulta por rango y las funciones válidas se insertan en una
+        única transacción.
+        
+        Args:
+            data: Diccionario con 'IdPelicula', 'salas' (lista de IDs), 'fecha_desde' y
+                'fecha_hasta' ('YYYY-MM-DD'), 'horas' (lista 'HH:MM') y 'solo_validar' (bool)
+        
+        Returns:
+            tuple: (success: bool, message: str, reporte: dict or None)
+                reporte = {'creadas', 'conflictos', 'detalle': [{'sala_id', 'sala', 'fecha_hora',
+                           'estado', 'motivo', 'funcion_id'}]}
+        """
+        session = db.get_session()
+        try:
+            # Validaciones
+            if not data.get('IdPelicula'):
+                return False, 'Debe seleccionar una película', None
+            salas_ids = sorted({int(s) for s in data.get('salas', []) if str(s).isdigit()})
+            if not salas_ids:
+                return False, 'Debe seleccionar al menos una sala', None
+            if not data.get('horas'):
+                return False, 'Debe seleccionar al menos un horario', None
+            
+            try:
+                fecha_desde = datetime.strptime(data['fecha_desde'], '%Y-%m-%d').date()
+                fecha_hasta = datetime.strptime(data['fecha_hasta'], '%Y-%m-%d').date()
+                horas = sorted({datetime.strptime(h, '%H:%M').time() for h in data['horas']})
+            except (KeyError, ValueError):
+                return False, 'Formato de fechas u horas inválido', None
+            
+            if fecha_hasta < fecha_desde:
+                return False, 'La fecha final debe ser posterior a la inicial', None
+            
+            dias = (fecha_hasta - fecha_desde).days + 1
+            total_propuestas = dias * len(salas_ids) * len(horas)
+            if total_propuestas > FuncionAdminController.MAX_FUNCIONES_LOTE:
+                return False, f'El lote excede el máximo de {FuncionAdminController.MAX_FUNCIONES_LOTE} funciones', None
+            
+            # Verificar que la película exista y esté activa
+            pelicula = session.query(Pelicula).filter(
+                Pelicula.Id == int(data['IdPelicula']),
+                Pelicula.Activo == True
+            ).first()
+            if not pelicula:
+                return False, 'La película seleccionada no existe o no está activa', None
+            
+            # Verificar salas activas (una consulta)
+            salas = {sala.Id: sala for sala in session.query(Sala).options(
+                joinedload(Sala.cine)
+            ).filter(
+                Sala.Id.in_(salas_ids),
+                Sala.Activo == True
+            ).all()}
+            if len(salas) != len(salas_ids):
+                return False, 'Una o más salas seleccionadas no existen o no están activas', None
+            
+            # Construir la grilla de propuestas
+            ahora = datetime.now()
+            detalle = []
+            propuestas = []
+            for dia in range(dias):
+                fecha = fecha_desde + timedelta(days=dia)
+                for sala_id in salas_ids:
+                    for hora in horas:
+                        fecha_hora = datetime.combine(fecha, hora)
+                        item = {
+                            'sala_id': sala_id,
+                            'sala': f'Sala {salas[sala_id].NumeroDeSala} - {salas[sala_id].cine.Cine}',
+                            'fecha_hora': fecha_hora,
+                            'estado': 'pendiente',
+                            'motivo': '',
+                            'funcion_id': None
+                        }
+                        detalle.append(item)
+                        
+                        if fecha_hora < ahora:
+                            item['estado'] = 'conflicto'
+                            item['motivo'] = 'Horario en el pasado'
+                            continue
+                        
+                        propuestas.append({
+                            'clave': len(detalle) - 1,
+                            'sala_id': sala_id,
+                            'inicio': fecha_hora,
+                            'duracion': pelicula.DuracionMinutos
+                        })
+            
+            # Validar toda la grilla contra las funciones existentes y entre sí
+            conflictos = FuncionAdminController.verificar_solapamientos_lote(session, propuestas)
+            
+            validas = []
+            for indice, conflicto in conflictos.items():
+                item = detalle[indice]
+                if conflicto is None:
+                    item['estado'] = 'valida'
+                    validas.append(item)
+                elif conflicto['funcion_id'] is None:
+                    item['estado'] = 'conflicto'
+                    item['motivo'] = f"Se solapa con otro horario del lote ({conflicto['inicio'].strftime('%H:%M')})"
+                else:
+                    item['estado'] = 'conflicto'
+                    item['motivo'] = (f"Se solapa con la función #{conflicto['funcion_id']} "
+                                      f"({conflicto['inicio'].strftime('%d/%m %H:%M')} - {conflicto['fin'].strftime('%H:%M')})")
+            
+            creadas = 0
+            if validas and not data.get('solo_validar'):
+                funciones_ids = list(session.scalars(
+                    insert(Funcion).returning(Funcion.Id, sort_by_parameter_order=True),
+                    [{
+                        'IdPelicula': pelicula.Id,
+                        'IdSala': item['sala_id'],
+                        'FechaHora': item['fecha_hora'],
+                        'Activo': True
+                    } for item in validas]
+                ))
+                ResumenController.recalcular_funciones(session, funciones_ids)
+                session.commit()
+                invalidar_totales()
+                invalidar_cartelera()
+                
+                for item, funcion_id in zip(validas, funciones_ids):
+                    item['estado'] = 'creada'
+                    item['funcion_id'] = funcion_id
+                creadas = len(funciones_ids)
+            
+            total_conflictos = sum(1 for item in detalle if item['estado'] == 'conflicto')
+            reporte = {
+                'creadas': creadas,
+                'validas': len(validas),
+                'conflictos': total_conflictos,
+                'detalle': detalle
+            }
+            
+            if data.get('solo_validar'):
+                mensaje = f'{len(validas)} funciones válidas y {total_conflictos} con conflicto'
+            else:
+                mensaje = f'{creadas} funciones creadas, {total_conflictos} con conflicto'
+            return True, mensaje, reporte
+            
+        except Exception as e:
+            session.rollback()
+            print(f"Error al programar funciones en lote: {e}")
+            traceback.print_exc()
+            return False, f'Error al programar funciones: {str(e)}', None
+        finally:
+            session.close()
+    
     @staticmethod
     def actualizar(id, data):
         """Actualiza una función existente"""
@@ -212,31 +478,9 @@ class FuncionAdminController:
                 return False, 'La sala seleccionada no existe o no está activa', None
             
             # Verificar si hay solapamiento de funciones en la misma sala (excluyendo esta función)
-            duracion_total = pelicula.DuracionMinutos + 30
-            
-            inicio_funcion = fecha_hora
-            fin_funcion = fecha_hora + timedelta(minutes=duracion_total)
-            
-            # CORRECCIÓN: Obtener funciones existentes (excluyendo esta) y verificar en Python
-            funciones_existentes = session.query(Funcion).\
-                join(Pelicula, Funcion.IdPelicula == Pelicula.Id).\
-                filter(Funcion.IdSala == int(data['IdSala'])).\
-                filter(Funcion.Activo == True).\
-                filter(Funcion.Id != id).all()
-            
-            solapamiento = False
-            for funcion_existente in funciones_existentes:
-                # Calcular duración de la función existente
-                duracion_existente = funcion_existente.pelicula.DuracionMinutos + 30
-                
-                # Calcular inicio y fin de la función existente
-                inicio_existente = funcion_existente.FechaHora
-                fin_existente = inicio_existente + timedelta(minutes=duracion_existente)
-                
-                # Verificar solapamiento
-                if (inicio_funcion < fin_existente) and (fin_funcion > inicio_existente):
-                    solapamiento = True
-                    break
+            solapamiento = FuncionAdminController.buscar_solapamiento(
+                session, int(data['IdSala']), fecha_hora, pelicula.DuracionMinutos, excluir_id=id
+            )
             
             if solapamiento:
                 return False, 'La sala ya tiene otra función programada en ese horario', None
@@ -249,7 +493,12 @@ class FuncionAdminController:
             if 'Activo' in data:
                 funcion.Activo = data['Activo'] == 'on' if isinstance(data['Activo'], str) else bool(data['Activo'])
             
+            ResumenController.recalcular_funciones(session, [funcion.Id])
             session.commit()
+            invalidar_totales()
+            invalidar_cartelera()
+            # La sala pudo cambiar: el bitset de asientos se recalcula con su nuevo índice
+            mapa_asientos.invalidar([funcion.Id])
             return True, 'Función actualizada exitosamente', funcion
             
         except Exception as e:
@@ -276,9 +525,12 @@ class FuncionAdminController:
             if boletos > 0:
                 return False, f'No se puede eliminar la función porque tiene {boletos} boleto(s) vendido(s)'
             
-            # Desactivar (eliminación lógica)
+            # Desactivar (eliminación lógica); el resumen se toca para que cambie la versión de datos
             funcion.Activo = False
+            ResumenController.recalcular_funciones(session, [funcion.Id])
             session.commit()
+            invalidar_totales()
+            invalidar_cartelera()
             
             return True, 'Función eliminada exitosamente'
             
@@ -364,32 +616,108 @@ class FuncionAdminController:
             session.close()
     
     @staticmethod
-    def obtener_funciones_con_estadisticas(funciones_list):
-        """Agrega estadísticas a una lista de funciones"""
+    def obtener_capacidad_salas(session, sala_ids) -> dict:
+        """
+        Obtiene la capacidad (asientos activos) de varias salas.
+        Los valores se memorizan en cache_capacidad_salas y solo las salas
+        que faltan se cuentan, con una única consulta agrupada.
+        
+        Args:
+            session: Sesión abierta a reutilizar
+            sala_ids: IDs de las salas
+            
+        Returns:
+            dict: sala_id -> capacidad
+        """
+        capacidades = {}
+        faltantes = []
+        for sala_id in set(sala_ids):
+            encontrado, capacidad = cache_capacidad_salas.obtener(sala_id)
+            if encontrado:
+                capacidades[sala_id] = capacidad
+            else:
+                faltantes.append(sala_id)
+        
+        if faltantes:
+            conteos = dict(session.query(
+                Asiento.IdSala,
+                func.count(Asiento.Id)
+            ).filter(
+                Asiento.IdSala.in_(faltantes),
+                Asiento.Activo == True
+            ).group_by(Asiento.IdSala).all())
+            
+            for sala_id in faltantes:
+                capacidad = conteos.get(sala_id, 0)
+                cache_capacidad_salas.guardar(sala_id, capacidad)
+                capacidades[sala_id] = capacidad
+        
+        return capacidades
+    
+    @staticmethod
+    def obtener_estadisticas_lote(funciones_salas) -> dict:
+        """
+        Calcula boletos vendidos, capacidad, asientos libres y ocupación para
+        un lote de funciones con una sola consulta agrupada sobre Boletos
+        (más, a lo sumo, una para las capacidades que no estén memorizadas).
+        
+        Args:
+            funciones_salas: Lista de tuplas (funcion_id, sala_id)
+            
+        Returns:
+            dict: funcion_id -> {'total_boletos', 'capacidad', 'asientos_disponibles', 'ocupacion'}
+        """
+        if not funciones_salas:
+            return {}
+        
         session = db.get_session()
         try:
-            for funcion in funciones_list:
-                # Contar boletos vendidos
-                total_boletos = session.query(Boleto).\
-                    filter(Boleto.IdFuncion == funcion.Id).count()
-                
-                # Obtener capacidad de la sala - SOLUCIÓN SIMPLE
-                capacidad = 0
-                if funcion.sala:
-                    capacidad = session.query(Asiento).\
-                        filter(Asiento.IdSala == funcion.sala.Id, Asiento.Activo == True).count()
+            funciones_ids = [funcion_id for funcion_id, _ in funciones_salas]
+            
+            boletos_por_funcion = dict(session.query(
+                Boleto.IdFuncion,
+                func.count(Boleto.Id)
+            ).filter(
+                Boleto.IdFuncion.in_(funciones_ids)
+            ).group_by(Boleto.IdFuncion).all())
+            
+            capacidades = FuncionAdminController.obtener_capacidad_salas(
+                session, [sala_id for _, sala_id in funciones_salas]
+            )
+            
+            estadisticas = {}
+            for funcion_id, sala_id in funciones_salas:
+                total_boletos = boletos_por_funcion.get(funcion_id, 0)
+                capacidad = capacidades.get(sala_id, 0)
+                ocupacion = (total_boletos / capacidad * 100) if capacidad > 0 else 0
                 
-                # Calcular ocupación
-                if capacidad > 0:
-                    ocupacion = (total_boletos / capacidad * 100)
-                else:
-                    ocupacion = 0
+                estadisticas[funcion_id] = {
+                    'total_boletos': total_boletos,
+                    'capacidad': capacidad,
+                    'asientos_disponibles': max(0, capacidad - total_boletos),
+                    'ocupacion': round(ocupacion, 2)
+                }
+            
+            return estadisticas
+        finally:
+            session.close()
+    
+    @staticmethod
+    def obtener_funciones_con_estadisticas(funciones_list):
+        """Agrega estadísticas a una lista de funciones (calculadas en lote)"""
+        try:
+            estadisticas = FuncionAdminController.obtener_estadisticas_lote(
+                [(funcion.Id, funcion.IdSala) for funcion in funciones_list]
+            )
+            
+            for funcion in funciones_list:
+                datos = estadisticas.get(funcion.Id, {})
                 
                 # Agregar estadísticas
-                funcion.total_boletos = total_boletos
-                funcion.boletos_vendidos = total_boletos
-                funcion.asientos_disponibles = max(0, capacidad - total_boletos)
-                funcion.ocupacion = round(ocupacion, 2)
+                funcion.total_boletos = datos.get('total_boletos', 0)
+                funcion.boletos_vendidos = datos.get('total_boletos', 0)
+                funcion.asientos_disponibles = datos.get('asientos_disponibles', 0)
+                funcion.ocupacion = datos.get('ocupacion', 0.0)
             
             return funciones_list
             
@@ -405,5 +733,3 @@ class FuncionAdminController:
                 if not hasattr(funcion, 'ocupacion'):
                     funcion.ocupacion = 0.0
             return funciones_list
-        finally:
-            session.close()
\ No newline at end of file
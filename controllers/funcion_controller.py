@@ -1,6 +1,8 @@
 # controllers/funcion_controller.py
 from database import db
-from models import Funcion, Sala, Pelicula, Boleto, BoletoCancelado
+from models import Funcion, Sala, Pelicula
+from controllers.reserva_controller import ReservaController
+from mapa_asientos import mapa_asientos
 from sqlalchemy.orm import joinedload
 from datetime import datetime, date
 from typing import List, Dict, Any, Optional
@@ -227,7 +229,7 @@ class FuncionController:
     @staticmethod
     def contar_asientos_disponibles(funcion_id: int) -> int:
         """
-        Cuenta los asientos disponibles para una función
+        Cuenta los asientos disponibles (activos y sin boleto vigente) para una función
         
         Args:
             funcion_id: ID de la función
@@ -235,82 +237,40 @@ class FuncionController:
         Returns:
             Número de asientos disponibles
         """
-        session = db.get_session()
         try:
-            # Obtener la función y la sala
-            funcion = session.query(Funcion).\
-                options(joinedload(Funcion.sala).joinedload(Sala.asientos)).\
-                filter(Funcion.Id == funcion_id).\
-                first()
-            
-            if not funcion:
-                return 0
-            
-            # Contar asientos totales en la sala
-            asientos_totales = len(funcion.sala.asientos)
-            
-            # Contar boletos vendidos para esta función
-            from models import Boleto
-            boletos_vendidos = session.query(Boleto).\
-                filter(Boleto.IdFuncion == funcion_id).\
-                count()
-            
-            return max(0, asientos_totales - boletos_vendidos)
+            estado = mapa_asientos.obtener(funcion_id)
+            return estado.contar_disponibles() if estado else 0
             
         except Exception as e:
             print(f"Error en contar_asientos_disponibles: {e}")
             return 0
-        finally:
-            session.close()
 
 
 # Agregar al archivo funcion_controller.py (en la clase FuncionController)
 
     @staticmethod
-    def obtener_asientos_con_disponibilidad(funcion_id: int) -> List[Dict[str, Any]]:
+    def obtener_asientos_con_disponibilidad(funcion_id: int, usuario_id: int = None) -> List[Dict[str, Any]]:
         """
         Obtiene todos los asientos de la sala de una función, con indicador de disponibilidad.
-        Un asiento está disponible si está activo y no tiene un boleto vendido (no cancelado).
+        Un asiento está disponible si está activo, no tiene un boleto vendido (no cancelado)
+        y no está retenido por otro cliente.
         
         Args:
             funcion_id: ID de la función
+            usuario_id: ID del cliente que consulta (sus propias retenciones cuentan como disponibles)
             
         Returns:
             Lista de diccionarios con información de cada asiento
         """
-        session = db.get_session()
         try:
-            # Obtener la función con la sala
-            funcion = session.query(Funcion).options(
-                joinedload(Funcion.sala).joinedload(Sala.asientos)
-            ).filter(Funcion.Id == funcion_id).first()
-            
-            if not funcion:
+            estado = mapa_asientos.obtener(funcion_id)
+            if not estado:
                 return []
             
-            subquery = session.query(BoletoCancelado.IdBoleto).subquery()
-            asientos_vendidos = session.query(Boleto.IdAsiento).filter(
-                Boleto.IdFuncion == funcion_id
-            ).filter(
-                ~Boleto.Id.in_(subquery)
-            ).all()
-            asientos_vendidos_ids = {av[0] for av in asientos_vendidos}
-            
-            # Construir la lista de asientos con su estado
-            asientos_info = []
-            for asiento in funcion.sala.asientos:
-                # El asiento está disponible si está activo y no ha sido vendido
-                disponible = (asiento.Activo and asiento.Id not in asientos_vendidos_ids)
-                asientos_info.append({
-                    'id': asiento.Id,
-                    'codigo_asiento': asiento.CodigoAsiento,
-                    'disponible': disponible
-                })
-            
-            return asientos_info
+            # Las retenciones vencen solas, por eso se consultan en cada vista y no forman parte del bitset
+            retenidos = ReservaController.asientos_retenidos(funcion_id, excluir_usuario_id=usuario_id)
+            return estado.asientos(estado.indice.mascara(retenidos))
             
         except Exception as e:
             print(f"Error al obtener asientos con disponibilidad: {e}")
             return []
-        finally:
-            session.close()
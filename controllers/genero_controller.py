@@ -1,5 +1,6 @@
 # controllers/genero_controller.py
 from database import db
+from catalogos import catalogos
 from models import Genero, PeliculaGenero
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
@@ -74,6 +75,7 @@ class GeneroController:
                 else:
                     existente.Activo = True
                     session.commit()
+                    catalogos.invalidar('Genero')
                     return True, 'Género reactivado exitosamente', existente
             
             nuevo_genero = Genero(
@@ -83,6 +85,7 @@ class GeneroController:
             
             session.add(nuevo_genero)
             session.commit()
+            catalogos.invalidar('Genero')
             return True, 'Género creado exitosamente', nuevo_genero
             
         except IntegrityError:
@@ -123,6 +126,7 @@ class GeneroController:
                 genero.Activo = data['Activo'] == 'on' if isinstance(data['Activo'], str) else bool(data['Activo'])
             
             session.commit()
+            catalogos.invalidar('Genero')
             return True, 'Género actualizado exitosamente', genero
             
         except Exception as e:
@@ -150,10 +154,12 @@ class GeneroController:
                 # Solo desactivar, no impedir la acción
                 genero.Activo = False
                 session.commit()
+                catalogos.invalidar('Genero')
                 return True, f'Género desactivado. Nota: Está siendo usado por {peliculas_count} película(s)'
             
             genero.Activo = False
             session.commit()
+            catalogos.invalidar('Genero')
             
             return True, 'Género eliminado exitosamente'
             
@@ -1,5 +1,6 @@
 # controllers/idioma_controller.py
 from database import db
+from catalogos import catalogos
 from models import Idioma, Pelicula
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
@@ -59,6 +60,7 @@ class IdiomaController:
                 else:
                     existente.Activo = True
                     session.commit()
+                    catalogos.invalidar('Idioma')
                     return True, 'Idioma reactivado exitosamente', existente
             
             nuevo_idioma = Idioma(
@@ -68,6 +70,7 @@ class IdiomaController:
             
             session.add(nuevo_idioma)
             session.commit()
+            catalogos.invalidar('Idioma')
             return True, 'Idioma creado exitosamente', nuevo_idioma
             
         except IntegrityError:
@@ -108,6 +111,7 @@ class IdiomaController:
                 idioma.Activo = data['Activo'] == 'on' if isinstance(data['Activo'], str) else bool(data['Activo'])
             
             session.commit()
+            catalogos.invalidar('Idioma')
             return True, 'Idioma actualizado exitosamente', idioma
             
         except Exception as e:
@@ -136,6 +140,7 @@ class IdiomaController:
             
             idioma.Activo = False
             session.commit()
+            catalogos.invalidar('Idioma')
             
             return True, 'Idioma eliminado exitosamente'
             
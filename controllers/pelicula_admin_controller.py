@@ -1,7 +1,9 @@
 # controllers/pelicula_admin_controller.py (VERSIÓN CORREGIDA)
 from database import db
+from cache import invalidar_cartelera, invalidar_totales
+from paginacion import paginar, resultado_vacio, clave_filtros
 from models import Pelicula, Clasificacion, Idioma, PeliculaGenero, Genero, Funcion, Sala
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
 from flask import flash
 from datetime import datetime
@@ -12,15 +14,11 @@ class PeliculaAdminController:
     """Controlador para operaciones CRUD de Películas (Administrador)"""
 
     @staticmethod
-    def obtener_todas_paginadas(pagina=1, por_pagina=25, filtros=None):
-        """Obtiene películas con paginación"""
+    def obtener_todas_paginadas(pagina=1, por_pagina=25, filtros=None, cursor=None):
+        """Obtiene películas con paginación (por cursor si se indica uno)"""
         session = db.get_session()
         try:
-            query = session.query(Pelicula).options(
-                joinedload(Pelicula.clasificacion),
-                joinedload(Pelicula.idioma),
-                joinedload(Pelicula.generos).joinedload(PeliculaGenero.genero)
-            )
+            query = session.query(Pelicula)
             
             if filtros:
                 if filtros.get('titulo'):
@@ -33,15 +31,20 @@ class PeliculaAdminController:
                     elif filtros['activo'] is False:
                         query = query.filter(Pelicula.Activo == False)
             
-            query = query.order_by(Pelicula.Titulo)
-            
-            total = query.count()
-            
-            offset = (pagina - 1) * por_pagina
-            peliculas = query.offset(offset).limit(por_pagina).all()
+            resultado = paginar(
+                query,
+                [(Pelicula.Titulo, False), (Pelicula.Id, False)],
+                pagina, por_pagina, cursor,
+                opciones=(
+                    joinedload(Pelicula.clasificacion),
+                    joinedload(Pelicula.idioma),
+                    selectinload(Pelicula.generos).joinedload(PeliculaGenero.genero)
+                ),
+                clave_total=clave_filtros('peliculas', filtros)
+            )
             
             peliculas_procesadas = []
-            for pelicula in peliculas:
+            for pelicula in resultado.pop('items'):
                 generos = [pg.genero.Genero for pg in pelicula.generos]
                 
                 pelicula_dict = {
@@ -60,25 +63,14 @@ class PeliculaAdminController:
                 }
                 peliculas_procesadas.append(pelicula_dict)
             
-            return {
-                'peliculas': peliculas_procesadas,
-                'total': total,
-                'pagina': pagina,
-                'por_pagina': por_pagina,
-                'paginas': (total + por_pagina - 1) // por_pagina
-            }
+            resultado['peliculas'] = peliculas_procesadas
+            return resultado
             
         except Exception as e:
             flash(f'Error al obtener películas: {str(e)}', 'danger')
             print(f"Error en obtener_todas_paginadas: {e}")
             traceback.print_exc()
-            return {
-                'peliculas': [],
-                'total': 0,
-                'pagina': pagina,
-                'por_pagina': por_pagina,
-                'paginas': 0
-            }
+            return resultado_vacio('peliculas', pagina, por_pagina)
         finally:
             session.close()
     
@@ -208,6 +200,8 @@ class PeliculaAdminController:
                         session.add(pelicula_genero)
             
             session.commit()
+            invalidar_totales()
+            invalidar_cartelera()
             return True, 'Película creada exitosamente', nueva_pelicula
             
         except IntegrityError as e:
@@ -309,6 +303,8 @@ class PeliculaAdminController:
                         session.add(pelicula_genero)
             
             session.commit()
+            invalidar_totales()
+            invalidar_cartelera()
             
             # Cargar la película actualizada con relaciones
             pelicula_actualizada = session.query(Pelicula).options(
@@ -350,6 +346,8 @@ class PeliculaAdminController:
             # Desactivar (eliminación lógica)
             pelicula.Activo = False
             session.commit()
+            invalidar_totales()
+            invalidar_cartelera()
             
             return True, 'Película desactivada exitosamente'
             
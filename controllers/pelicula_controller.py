@@ -1,14 +1,99 @@
 # controllers/pelicula_controller.py
 # Controlador para operaciones de películas
 
-from models import Pelicula, Funcion, Boleto, PeliculaGenero, Genero, Sala, TipoSala, Idioma, Clasificacion
+from models import Pelicula, Funcion, Boleto, PeliculaGenero, Sala, TipoSala
 from database import db
-from sqlalchemy import desc, func
+from cache import cache_cartelera, normalizar_lista
+from catalogos import catalogos
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
+from flask import g, has_app_context
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import traceback
 
+
+class CarteleraSnapshot:
+    """
+    Resultado de filtrar_pelis_cartelera() calculado una vez, con las vistas
+    derivadas (top-N, últimas-N, pertenencia) resueltas en memoria.
+    """
+
+    def __init__(self, resultado_cartelera: Dict[str, Any]):
+        self.resultado = resultado_cartelera
+        self.peliculas = resultado_cartelera.get('peliculas', [])
+        self._ids = {p['id'] for p in self.peliculas}
+        self._boletos_por_pelicula = None
+
+    def contiene(self, pelicula_id: int) -> bool:
+        """Indica si la película forma parte de la cartelera"""
+        return pelicula_id in self._ids
+
+    def ultimas(self, n: int = 3) -> List[Dict[str, Any]]:
+        """
+        Devuelve las n películas más recientes (ID descendente)
+        
+        Args:
+            n: Cantidad de películas a devolver
+            
+        Returns:
+            Lista de copias de los diccionarios de la cartelera
+        """
+        ordenadas = sorted(self.peliculas, key=lambda p: p['id'], reverse=True)
+        return [dict(p) for p in ordenadas[:n]]
+
+    def top(self, n: int = 3) -> List[Dict[str, Any]]:
+        """
+        Devuelve las n películas con más boletos vendidos para funciones futuras.
+        El conteo se hace con una sola consulta agrupada y se reutiliza.
+        
+        Args:
+            n: Cantidad de películas a devolver
+            
+        Returns:
+            Lista de diccionarios con total_boletos y popularidad
+        """
+        if not self.peliculas:
+            return []
+        
+        conteos = self._contar_boletos()
+        
+        # sorted es estable: en caso de empate se respeta el orden por título
+        ordenadas = sorted(self.peliculas, key=lambda p: conteos.get(p['id'], 0), reverse=True)
+        
+        resultado = []
+        for pelicula in ordenadas[:n]:
+            pelicula_info = dict(pelicula)
+            total_boletos = conteos.get(pelicula['id'], 0)
+            pelicula_info['total_boletos'] = total_boletos
+            pelicula_info['popularidad'] = PeliculaController._calcular_popularidad(total_boletos)
+            resultado.append(pelicula_info)
+        
+        return resultado
+
+    def _contar_boletos(self) -> Dict[int, int]:
+        """Cuenta los boletos de funciones futuras por película (una sola consulta)"""
+        if self._boletos_por_pelicula is not None:
+            return self._boletos_por_pelicula
+        
+        session = db.get_session()
+        try:
+            filas = session.query(
+                Funcion.IdPelicula,
+                func.count(Boleto.Id)
+            ).join(Boleto, Funcion.Id == Boleto.IdFuncion
+            ).filter(
+                Funcion.Activo == True,
+                Funcion.IdPelicula.in_(self._ids),
+                Funcion.FechaHora > datetime.now()
+            ).group_by(Funcion.IdPelicula).all()
+            
+            self._boletos_por_pelicula = {pelicula_id: total or 0 for pelicula_id, total in filas}
+            return self._boletos_por_pelicula
+        finally:
+            session.close()
+
+
 class PeliculaController:
     """Controlador para operaciones de películas"""
 
@@ -16,6 +101,25 @@ class PeliculaController:
         pass
 
 
+    @staticmethod
+    def obtener_snapshot_cartelera():
+        """
+        Obtiene la cartelera por defecto (sin filtros) calculada una sola vez por petición.
+        Dentro de un contexto de Flask el snapshot se guarda en `g`, de modo que
+        index, top_3_pelis, ultimas_3_pelis y detalle_pelicula lo comparten.
+        
+        Returns:
+            CarteleraSnapshot: Snapshot de la cartelera actual
+        """
+        if has_app_context():
+            snapshot = g.get('_cartelera_snapshot')
+            if snapshot is None:
+                snapshot = CarteleraSnapshot(PeliculaController.filtrar_pelis_cartelera())
+                g._cartelera_snapshot = snapshot
+            return snapshot
+        
+        return CarteleraSnapshot(PeliculaController.filtrar_pelis_cartelera())
+
     @staticmethod
     def ultimas_3_pelis():
         """
@@ -24,36 +128,12 @@ class PeliculaController:
         Returns:
             list: Lista de diccionarios con información de películas
         """
-        session = db.get_session()
         try:
-            # Primero obtenemos todas las películas en cartelera usando el método existente
-            resultado_cartelera = PeliculaController.filtrar_pelis_cartelera()
-            peliculas_cartelera = resultado_cartelera.get('peliculas', [])
-            
-            if not peliculas_cartelera:
-                return []
-            
-            # Ordenamos por ID descendente (las más recientes primero)
-            peliculas_cartelera.sort(key=lambda x: x['id'], reverse=True)
-            
-            # Tomamos las primeras 3
-            ultimas_3 = peliculas_cartelera[:3]
-            
-            # Para mantener compatibilidad con el formato esperado,
-            # agregamos información adicional si es necesario
-            for pelicula in ultimas_3:
-                # Ya obtenemos la próxima función desde el método filtrar_pelis_cartelera
-                # Si necesitamos más datos específicos, los agregamos aquí
-                pass
-                
-            return ultimas_3
-            
+            return PeliculaController.obtener_snapshot_cartelera().ultimas(3)
         except Exception as e:
             print(f"Error al obtener últimas películas: {e}")
             traceback.print_exc()
             return []
-        finally:
-            session.close()
 
 
     @staticmethod
@@ -65,56 +145,13 @@ class PeliculaController:
         Returns:
             list: Lista de diccionarios con información de películas
         """
-        session = db.get_session()
         try:
-            # Primero obtenemos todas las películas en cartelera
-            resultado_cartelera = PeliculaController.filtrar_pelis_cartelera()
-            peliculas_cartelera = resultado_cartelera.get('peliculas', [])
-            
-            if not peliculas_cartelera:
-                return PeliculaController.ultimas_3_pelis()
-            
-            # Extraemos los IDs de las películas en cartelera
-            peliculas_cartelera_ids = [p['id'] for p in peliculas_cartelera]
-            
-            # Subconsulta para contar boletos SOLO de películas en cartelera
-            subquery = session.query(
-                Funcion.IdPelicula,
-                func.count(Boleto.Id).label('total_boletos')
-            ).join(Boleto, Funcion.Id == Boleto.IdFuncion
-            ).filter(
-                Funcion.Activo == True,
-                Funcion.IdPelicula.in_(peliculas_cartelera_ids),
-                Funcion.FechaHora > datetime.now()
-            ).group_by(Funcion.IdPelicula).subquery()
-
-            # Obtenemos las películas con más boletos vendidos
-            peliculas_populares = session.query(
-                Pelicula.Id,
-                func.coalesce(subquery.c.total_boletos, 0).label('total_boletos')
-            ).outerjoin(subquery, Pelicula.Id == subquery.c.IdPelicula
-            ).filter(
-                Pelicula.Activo == True,
-                Pelicula.Id.in_(peliculas_cartelera_ids)
-            ).order_by(desc(func.coalesce(subquery.c.total_boletos, 0))).limit(3).all()
-
-            resultado = []
-            for pelicula_id, total_boletos in peliculas_populares:
-                # Buscamos la información completa de la película en nuestros datos ya filtrados
-                pelicula_info = next((p for p in peliculas_cartelera if p['id'] == pelicula_id), None)
-                
-                if not pelicula_info:
-                    continue
-                    
-                # Enriquecer con información adicional si es necesario
-                pelicula_info['total_boletos'] = total_boletos or 0
-                pelicula_info['popularidad'] = PeliculaController._calcular_popularidad(total_boletos or 0)
-                
-                resultado.append(pelicula_info)
+            snapshot = PeliculaController.obtener_snapshot_cartelera()
+            resultado = snapshot.top(3)
             
             # Si no hay películas con boletos, devolver las últimas 3 en cartelera
             if not resultado:
-                return PeliculaController.ultimas_3_pelis()
+                return snapshot.ultimas(3)
                 
             return resultado
             
@@ -122,8 +159,6 @@ class PeliculaController:
             print(f"Error al obtener películas populares: {e}")
             traceback.print_exc()
             return PeliculaController.ultimas_3_pelis()
-        finally:
-            session.close()
 
     @staticmethod
     def _calcular_popularidad(total_boletos):
@@ -197,6 +232,7 @@ class PeliculaController:
         """
         Filtra películas para la cartelera basándose en los criterios proporcionados.
         Lógica: OR dentro de cada categoría, AND entre categorías.
+        El resultado se sirve desde cache_cartelera mientras siga vigente.
         
         Args:
             dia (str, opcional): Fecha en formato 'YYYY-MM-DD'. 
@@ -209,6 +245,43 @@ class PeliculaController:
         Returns:
             dict: Diccionario con películas filtradas y metadatos
         """
+        # La fecha actual forma parte de la clave: el rango por defecto cambia cada día
+        clave = (
+            'cartelera',
+            datetime.now().date(),
+            dia or '',
+            normalizar_lista(genero_list),
+            normalizar_lista(sala_tipo_list),
+            normalizar_lista(idioma_list),
+            normalizar_lista(clasificacion_list)
+        )
+        
+        try:
+            return cache_cartelera.obtener_o_calcular(
+                clave,
+                lambda: PeliculaController._consultar_cartelera(
+                    dia, genero_list, sala_tipo_list, idioma_list, clasificacion_list
+                )
+            )
+        except Exception as e:
+            print(f"Error al filtrar películas para cartelera: {e}")
+            traceback.print_exc()
+            
+            return {
+                'peliculas': [],
+                'fecha_seleccionada': datetime.now().date().strftime('%Y-%m-%d'),
+                'fecha_minima': datetime.now().date().strftime('%Y-%m-%d'),
+                'fecha_maxima': (datetime.now().date() + timedelta(days=12)).strftime('%Y-%m-%d'),
+                'fecha_mostrada': datetime.now().date().strftime('%Y-%m-%d')
+            }
+
+    @staticmethod
+    def _consultar_cartelera(dia=None, genero_list=None, sala_tipo_list=None,
+                             idioma_list=None, clasificacion_list=None):
+        """
+        Ejecuta las consultas de filtrar_pelis_cartelera contra la base de datos.
+        Los errores se propagan para que no se guarden en caché.
+        """
         
         session = db.get_session()
         try:
@@ -378,17 +451,6 @@ class PeliculaController:
                 'fecha_mostrada': fecha_filtro.strftime('%Y-%m-%d')
             }
             
-        except Exception as e:
-            print(f"Error al filtrar películas para cartelera: {e}")
-            traceback.print_exc()
-            
-            return {
-                'peliculas': [],
-                'fecha_seleccionada': datetime.now().date().strftime('%Y-%m-%d'),
-                'fecha_minima': datetime.now().date().strftime('%Y-%m-%d'),
-                'fecha_maxima': (datetime.now().date() + timedelta(days=12)).strftime('%Y-%m-%d'),
-                'fecha_mostrada': datetime.now().date().strftime('%Y-%m-%d')
-            }
         finally:
             session.close()
 
@@ -415,7 +477,6 @@ class PeliculaController:
                 'clasificaciones': []
             }
         
-        session = db.get_session()
         try:
             # Paso 1: Recopilar nombres únicos e IDs de las películas filtradas
             generos_nombres = set()
@@ -440,39 +501,11 @@ class PeliculaController:
                 for sala_id in pelicula.get('salas_tipos_ids', []):
                     salas_ids.add(sala_id)
             
-            # Paso 2: Consultar la BD para obtener objetos con IDs reales
-            
-            # Obtener géneros
-            generos_objs = []
-            if generos_nombres:
-                generos_objs = session.query(Genero).filter(
-                    Genero.Genero.in_(generos_nombres),
-                    Genero.Activo == True
-                ).order_by(Genero.Genero).all()
-            
-            # Obtener idiomas
-            idiomas_objs = []
-            if idiomas_nombres:
-                idiomas_objs = session.query(Idioma).filter(
-                    Idioma.Idioma.in_(idiomas_nombres),
-                    Idioma.Activo == True
-                ).order_by(Idioma.Idioma).all()
-            
-            # Obtener clasificaciones
-            clasificaciones_objs = []
-            if clasificaciones_nombres:
-                clasificaciones_objs = session.query(Clasificacion).filter(
-                    Clasificacion.Clasificacion.in_(clasificaciones_nombres),
-                    Clasificacion.Activo == True
-                ).order_by(Clasificacion.Clasificacion).all()
-            
-            # Obtener tipos de sala usando los IDs que ya tenemos
-            salas_objs = []
-            if salas_ids:
-                salas_objs = session.query(TipoSala).filter(
-                    TipoSala.Id.in_(salas_ids),
-                    TipoSala.Activo == True
-                ).order_by(TipoSala.Tipo).all()
+            # Paso 2: Resolver los objetos con IDs reales desde el registro de catálogos
+            generos_objs = catalogos.activos('Genero', nombres=generos_nombres) if generos_nombres else []
+            idiomas_objs = catalogos.activos('Idioma', nombres=idiomas_nombres) if idiomas_nombres else []
+            clasificaciones_objs = catalogos.activos('Clasificacion', nombres=clasificaciones_nombres) if clasificaciones_nombres else []
+            salas_objs = catalogos.activos('TipoSala', ids=salas_ids) if salas_ids else []
             
             return {
                 'generos': generos_objs,
@@ -491,8 +524,6 @@ class PeliculaController:
                 'idiomas': [],
                 'clasificaciones': []
             }
-        finally:
-            session.close()
 
     @staticmethod
     def convertir_parametros_filtro(parametros):
@@ -527,6 +558,32 @@ class PeliculaController:
         Returns:
             list: Lista de diccionarios con información de películas próximas
         """
+        clave = (
+            'proximamente',
+            datetime.now().date(),
+            normalizar_lista(genero_list),
+            normalizar_lista(idioma_list),
+            normalizar_lista(clasificacion_list)
+        )
+        
+        try:
+            return cache_cartelera.obtener_o_calcular(
+                clave,
+                lambda: PeliculaController._consultar_proximamente(
+                    genero_list, idioma_list, clasificacion_list
+                )
+            )
+        except Exception as e:
+            print(f"Error al filtrar películas próximas: {e}")
+            traceback.print_exc()
+            return []
+
+    @staticmethod
+    def _consultar_proximamente(genero_list=None, idioma_list=None, clasificacion_list=None):
+        """
+        Ejecuta las consultas de filtrar_pelis_prox contra la base de datos.
+        Los errores se propagan para que no se guarden en caché.
+        """
         
         session = db.get_session()
         try:
@@ -619,10 +676,6 @@ class PeliculaController:
             
             return peliculas_proximas
             
-        except Exception as e:
-            print(f"Error al filtrar películas próximas: {e}")
-            traceback.print_exc()
-            return []
         finally:
             session.close()
 
@@ -647,7 +700,6 @@ class PeliculaController:
                 'clasificaciones': []
             }
         
-        session = db.get_session()
         try:
             # Paso 1: Recopilar nombres únicos de los elementos presentes en las películas filtradas
             generos_nombres = set()
@@ -670,31 +722,10 @@ class PeliculaController:
                 if clasificacion:
                     clasificaciones_nombres.add(clasificacion)
             
-            # Paso 2: Consultar la base de datos para obtener objetos completos con IDs
-            
-            # Obtener géneros activos que coincidan con los nombres encontrados
-            generos_objs = []
-            if generos_nombres:
-                generos_objs = session.query(Genero).filter(
-                    Genero.Genero.in_(list(generos_nombres)),
-                    Genero.Activo == True
-                ).order_by(Genero.Genero).all()
-            
-            # Obtener idiomas activos que coincidan con los nombres encontrados
-            idiomas_objs = []
-            if idiomas_nombres:
-                idiomas_objs = session.query(Idioma).filter(
-                    Idioma.Idioma.in_(list(idiomas_nombres)),
-                    Idioma.Activo == True
-                ).order_by(Idioma.Idioma).all()
-            
-            # Obtener clasificaciones activas que coincidan con los nombres encontrados
-            clasificaciones_objs = []
-            if clasificaciones_nombres:
-                clasificaciones_objs = session.query(Clasificacion).filter(
-                    Clasificacion.Clasificacion.in_(list(clasificaciones_nombres)),
-                    Clasificacion.Activo == True
-                ).order_by(Clasificacion.Clasificacion).all()
+            # Paso 2: Obtener los objetos activos con IDs desde el registro de catálogos
+            generos_objs = catalogos.activos('Genero', nombres=generos_nombres) if generos_nombres else []
+            idiomas_objs = catalogos.activos('Idioma', nombres=idiomas_nombres) if idiomas_nombres else []
+            clasificaciones_objs = catalogos.activos('Clasificacion', nombres=clasificaciones_nombres) if clasificaciones_nombres else []
             
             return {
                 'generos': generos_objs,
@@ -711,8 +742,6 @@ class PeliculaController:
                 'idiomas': [],
                 'clasificaciones': []
             }
-        finally:
-            session.close()
 
     @staticmethod
     def obtener_peli_detalle(pelicula_id: int) -> Optional[Dict[str, Any]]:
@@ -0,0 +1,307 @@
+# controllers/reserva_controller.py
+# Retención temporal de asientos entre la selección y el pago
+from database import db
+from config import Config
+from models import Funcion, Asiento, Boleto, BoletoCancelado, ReservaAsiento
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import threading
+import traceback
+
+
+class BackendReservasBD:
+    """
+    Retenciones guardadas en la tabla ReservasAsiento. La restricción
+    UNIQUE(IdFunción, IdAsiento) garantiza que solo un cliente pueda
+    reclamar cada asiento aunque haya varios procesos atendiendo peticiones.
+    """
+
+    def reclamar(self, funcion_id: int, usuario_id: int, asientos_ids: List[int],
+                 expira: datetime) -> Tuple[bool, Set[int]]:
+        """
+        Reclama todos los asientos o ninguno
+
+        Returns:
+            tuple: (success: bool, asientos_en_conflicto: set)
+        """
+        session = db.get_session()
+        ahora = datetime.now()
+        try:
+            # Descartar retenciones vencidas de la función y las anteriores del mismo usuario
+            session.query(ReservaAsiento).filter(
+                ReservaAsiento.IdFuncion == funcion_id,
+                or_(
+                    ReservaAsiento.FechaExpiracion < ahora,
+                    ReservaAsiento.IdUsuario == usuario_id
+                )
+            ).delete(synchronize_session=False)
+
+            session.execute(insert(ReservaAsiento), [{
+                'IdFuncion': funcion_id,
+                'IdAsiento': asiento_id,
+                'IdUsuario': usuario_id,
+                'FechaExpiracion': expira
+            } for asiento_id in asientos_ids])
+
+            session.commit()
+            return True, set()
+
+        except IntegrityError:
+            session.rollback()
+            conflictos = session.query(ReservaAsiento.IdAsiento).filter(
+                ReservaAsiento.IdFuncion == funcion_id,
+                ReservaAsiento.IdAsiento.in_(asientos_ids),
+                ReservaAsiento.IdUsuario != usuario_id,
+                ReservaAsiento.FechaExpiracion >= ahora
+            ).all()
+            return False, {c[0] for c in conflictos}
+        finally:
+            session.close()
+
+    def liberar(self, funcion_id: int, usuario_id: int):
+        """Elimina las retenciones del usuario para la función"""
+        session = db.get_session()
+        try:
+            session.query(ReservaAsiento).filter(
+                ReservaAsiento.IdFuncion == funcion_id,
+                ReservaAsiento.IdUsuario == usuario_id
+            ).delete(synchronize_session=False)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def consumir(self, session, funcion_id: int, usuario_id: int):
+        """Elimina las retenciones del usuario dentro de la transacción de compra"""
+        session.query(ReservaAsiento).filter(
+            ReservaAsiento.IdFuncion == funcion_id,
+            ReservaAsiento.IdUsuario == usuario_id
+        ).delete(synchronize_session=False)
+
+    def confirmar(self, funcion_id: int, usuario_id: int):
+        """Nada que hacer: el commit de la compra ya eliminó las retenciones"""
+
+    def retenidos(self, funcion_id: int, excluir_usuario_id: Optional[int] = None, session=None) -> Set[int]:
+        """
+        IDs de asientos con retención vigente (opcionalmente sin contar las de un usuario).
+        Si se recibe una sesión se consulta dentro de ella, sin abrir otra conexión.
+        """
+        sesion_propia = session is None
+        if sesion_propia:
+            session = db.get_session()
+        try:
+            query = session.query(ReservaAsiento.IdAsiento).filter(
+                ReservaAsiento.IdFuncion == funcion_id,
+                ReservaAsiento.FechaExpiracion >= datetime.now()
+            )
+            if excluir_usuario_id is not None:
+                query = query.filter(ReservaAsiento.IdUsuario != excluir_usuario_id)
+            return {r[0] for r in query.all()}
+        finally:
+            if sesion_propia:
+                session.close()
+
+
+class BackendReservasMemoria:
+    """
+    Sustituto en proceso con la misma semántica de reclamo atómico.
+    Solo es válido con un único proceso (pruebas o servidor de desarrollo).
+    """
+
+    def __init__(self):
+        # funcion_id -> {asiento_id: (usuario_id, expira)}
+        self._reservas: Dict[int, Dict[int, Tuple[int, datetime]]] = {}
+        self._lock = threading.Lock()
+
+    def _vigentes(self, funcion_id: int, ahora: datetime) -> Dict[int, Tuple[int, datetime]]:
+        reservas = self._reservas.setdefault(funcion_id, {})
+        for asiento_id in [a for a, (_, expira) in reservas.items() if expira < ahora]:
+            del reservas[asiento_id]
+        return reservas
+
+    def reclamar(self, funcion_id: int, usuario_id: int, asientos_ids: List[int],
+                 expira: datetime) -> Tuple[bool, Set[int]]:
+        with self._lock:
+            reservas = self._vigentes(funcion_id, datetime.now())
+            conflictos = {
+                asiento_id for asiento_id in asientos_ids
+                if asiento_id in reservas and reservas[asiento_id][0] != usuario_id
+            }
+            if conflictos:
+                return False, conflictos
+
+            for asiento_id in [a for a, (u, _) in reservas.items() if u == usuario_id]:
+                del reservas[asiento_id]
+            for asiento_id in asientos_ids:
+                reservas[asiento_id] = (usuario_id, expira)
+            return True, set()
+
+    def liberar(self, funcion_id: int, usuario_id: int):
+        with self._lock:
+            reservas = self._reservas.get(funcion_id, {})
+            for asiento_id in [a for a, (u, _) in reservas.items() if u == usuario_id]:
+                del reservas[asiento_id]
+
+    def consumir(self, session, funcion_id: int, usuario_id: int):
+        # Sin transacción propia: las retenciones se mantienen hasta que la compra
+        # haga commit (confirmar); si falla, siguen protegiendo los asientos
+        pass
+
+    def confirmar(self, funcion_id: int, usuario_id: int):
+        self.liberar(funcion_id, usuario_id)
+
+    def retenidos(self, funcion_id: int, excluir_usuario_id: Optional[int] = None, session=None) -> Set[int]:
+        with self._lock:
+            reservas = self._vigentes(funcion_id, datetime.now())
+            return {a for a, (u, _) in reservas.items() if u != excluir_usuario_id}
+
+
+def _crear_backend():
+    if Config.RESERVAS_BACKEND == 'memoria':
+        return BackendReservasMemoria()
+    return BackendReservasBD()
+
+
+class ReservaController:
+    """Controlador para la retención de asientos durante la compra"""
+
+    backend = _crear_backend()
+
+    @staticmethod
+    def reservar(funcion_id: int, usuario_id: int, codigos_asientos: list):
+        """
+        Retiene los asientos seleccionados durante RESERVA_ASIENTOS_TTL segundos.
+        Todos los asientos quedan retenidos o ninguno.
+
+        Args:
+            funcion_id: ID de la función
+            usuario_id: ID del cliente
+            codigos_asientos: Lista de códigos de asiento
+
+        Returns:
+            tuple: (success: bool, message: str, expira: datetime or None)
+        """
+        session = db.get_session()
+        try:
+            codigos = list(dict.fromkeys(codigos_asientos))
+            if not codigos:
+                return False, "No se han seleccionado asientos", None
+
+            asientos = session.query(Asiento.Id, Asiento.CodigoAsiento).join(
+                Funcion, Funcion.IdSala == Asiento.IdSala
+            ).filter(
+                Funcion.Id == funcion_id,
+                Asiento.Activo == True,
+                Asiento.CodigoAsiento.in_(codigos)
+            ).all()
+            codigo_por_id = {a.Id: a.CodigoAsiento for a in asientos}
+
+            faltantes = set(codigos) - set(codigo_por_id.values())
+            if faltantes:
+                return False, f"Asientos no disponibles: {', '.join(sorted(faltantes))}", None
+
+            # Asientos ya vendidos (y no cancelados)
+            vendidos = session.query(Boleto.IdAsiento).outerjoin(
+                BoletoCancelado, BoletoCancelado.IdBoleto == Boleto.Id
+            ).filter(
+                Boleto.IdFuncion == funcion_id,
+                Boleto.IdAsiento.in_(list(codigo_por_id)),
+                BoletoCancelado.Id.is_(None)
+            ).all()
+            if vendidos:
+                ocupados = sorted(codigo_por_id[v[0]] for v in vendidos)
+                return False, f"Asientos ya vendidos: {', '.join(ocupados)}", None
+
+            expira = datetime.now() + timedelta(seconds=Config.RESERVA_ASIENTOS_TTL)
+            exito, conflictos = ReservaController.backend.reclamar(
+                funcion_id, usuario_id, list(codigo_por_id), expira
+            )
+
+            if not exito:
+                retenidos = sorted(codigo_por_id[a] for a in conflictos if a in codigo_por_id)
+                if not retenidos:
+                    # La retención en conflicto ya venció o se liberó antes de consultarla
+                    return False, "Uno o más asientos ya están reservados. Intenta de nuevo.", None
+                return False, f"Asientos reservados por otro cliente: {', '.join(retenidos)}", None
+
+            return True, f"Asientos reservados hasta las {expira.strftime('%H:%M')}", expira
+
+        except Exception as e:
+            print(f"Error al reservar asientos: {e}")
+            traceback.print_exc()
+            return False, f"Error al reservar asientos: {str(e)}", None
+        finally:
+            session.close()
+
+    @staticmethod
+    def liberar(funcion_id: int, usuario_id: int) -> bool:
+        """
+        Libera las retenciones del usuario para una función
+
+        Returns:
+            bool: True si se liberaron sin errores
+        """
+        try:
+            ReservaController.backend.liberar(funcion_id, usuario_id)
+            return True
+        except Exception as e:
+            print(f"Error al liberar asientos: {e}")
+            traceback.print_exc()
+            return False
+
+    @staticmethod
+    def consumir(session, funcion_id: int, usuario_id: int):
+        """
+        Convierte las retenciones del usuario en definitivas eliminándolas dentro
+        de la transacción de compra (se deshace junto con ella si la compra falla)
+
+        Args:
+            session: Sesión de la unidad de trabajo de la compra
+            funcion_id: ID de la función
+            usuario_id: ID del cliente
+        """
+        ReservaController.backend.consumir(session, funcion_id, usuario_id)
+
+    @staticmethod
+    def confirmar_compra(funcion_id: int, usuario_id: int):
+        """
+        Se llama después del commit de la compra. Con el backend en memoria, que no
+        participa en la transacción, es aquí donde se liberan las retenciones.
+
+        Args:
+            funcion_id: ID de la función
+            usuario_id: ID del cliente
+        """
+        try:
+            ReservaController.backend.confirmar(funcion_id, usuario_id)
+        except Exception as e:
+            # La compra ya se confirmó: las retenciones vencerán solas
+            print(f"Error al confirmar retenciones: {e}")
+            traceback.print_exc()
+
+    @staticmethod
+    def asientos_retenidos(funcion_id: int, excluir_usuario_id: Optional[int] = None, session=None) -> Set[int]:
+        """
+        Obtiene los IDs de asientos con retención vigente
+
+        Args:
+            funcion_id: ID de la función
+            excluir_usuario_id: Usuario cuyas retenciones no se cuentan (las propias)
+            session: Sesión existente a reutilizar (opcional). Con sesión, los errores se propagan.
+
+        Returns:
+            set: IDs de asientos retenidos
+        """
+        if session is not None:
+            return ReservaController.backend.retenidos(funcion_id, excluir_usuario_id, session)
+        
+        try:
+            return ReservaController.backend.retenidos(funcion_id, excluir_usuario_id)
+        except Exception as e:
+            print(f"Error al consultar asientos retenidos: {e}")
+            traceback.print_exc()
+            return set()
@@ -0,0 +1,254 @@
+# controllers/resumen_controller.py
+# Mantenimiento de la tabla resumen ResumenFunciones usada por el dashboard
+from database import db
+from sqlalchemy import text, bindparam
+from datetime import date
+from typing import Dict, Iterable, Optional
+import traceback
+
+
+class ResumenController:
+    """
+    Mantiene una fila por función con sus contadores de boletos (vendidos, usados,
+    cancelados), ingresos netos, valor acreditado y capacidad de la sala.
+
+    Las operaciones frecuentes (compra, cancelación, canje de saldo, entrada a
+    sala) aplican incrementos a la fila de la función con un UPDATE de una sola
+    fila, al final de su transacción: no vuelven a leer los boletos de la función,
+    así que compras simultáneas de la misma función solo se esperan en esa fila y
+    no se bloquean mutuamente sobre Boletos. Las ediciones administrativas, menos
+    frecuentes, recalculan la fila completa de las funciones afectadas, y
+    reconstruir() recalcula toda la tabla.
+
+    El mantenimiento se hace siempre, aunque DASHBOARD_USAR_RESUMEN esté
+    desactivado: DashboardController.version_datos usa FechaActualizacion para
+    saber si cambiaron los datos, y así la tabla está lista al activar la opción.
+    """
+
+    # Campos que admiten incrementos: nombre del parámetro -> columna
+    CAMPOS_DELTA = {
+        'vendidos': 'BoletosVendidos',
+        'ingresos': 'Ingresos',
+        'usados': 'BoletosUsados',
+        'cancelados': 'BoletosCancelados',
+        'acreditado': 'ValorAcreditado',
+    }
+
+    SQL_DELTA = """
+        UPDATE ResumenFunciones SET
+            BoletosVendidos = BoletosVendidos + :vendidos,
+            Ingresos = Ingresos + :ingresos,
+            BoletosUsados = BoletosUsados + :usados,
+            BoletosCancelados = BoletosCancelados + :cancelados,
+            ValorAcreditado = ValorAcreditado + :acreditado,
+            FechaActualizacion = SYSDATETIME()
+        WHERE IdFunción = :funcion_id
+    """
+
+    # Fila resumen calculada desde las tablas de origen. {filtro} se sustituye por
+    # la condición sobre las funciones a recalcular.
+    SQL_MERGE = """
+        MERGE ResumenFunciones WITH (HOLDLOCK) AS r
+        USING (
+            SELECT
+                f.Id AS IdFunción,
+                CONVERT(DATE, f.FechaHora) AS Fecha,
+                f.IdSala,
+                s.IdCine,
+                f.IdPelícula,
+                ISNULL(cap.Capacidad, 0) AS Capacidad,
+                COUNT(b.Id) AS BoletosVendidos,
+                ISNULL(SUM(CASE WHEN bc.Id IS NULL THEN b.ValorPagado END), 0) AS Ingresos,
+                SUM(CASE WHEN bu.Id IS NOT NULL THEN 1 ELSE 0 END) AS BoletosUsados,
+                SUM(CASE WHEN bc.Id IS NOT NULL THEN 1 ELSE 0 END) AS BoletosCancelados,
+                ISNULL(SUM(bc.ValorAcreditado), 0) AS ValorAcreditado
+            FROM Funciones f
+            INNER JOIN Salas s ON f.IdSala = s.Id
+            LEFT JOIN (
+                SELECT a.IdSala, COUNT(*) AS Capacidad
+                FROM Asientos a
+                WHERE a.Activo = 1
+                GROUP BY a.IdSala
+            ) cap ON cap.IdSala = s.Id
+            LEFT JOIN Boletos b ON b.IdFunción = f.Id
+            LEFT JOIN BoletosCancelados bc ON bc.IdBoleto = b.Id
+            LEFT JOIN BoletosUsados bu ON bu.IdBoleto = b.Id
+            WHERE {filtro}
+            GROUP BY f.Id, CONVERT(DATE, f.FechaHora), f.IdSala, s.IdCine, f.IdPelícula, cap.Capacidad
+        ) AS src
+        ON r.IdFunción = src.IdFunción
+        WHEN MATCHED THEN UPDATE SET
+            Fecha = src.Fecha,
+            IdSala = src.IdSala,
+            IdCine = src.IdCine,
+            IdPelícula = src.IdPelícula,
+            Capacidad = src.Capacidad,
+            BoletosVendidos = src.BoletosVendidos,
+            Ingresos = src.Ingresos,
+            BoletosUsados = src.BoletosUsados,
+            BoletosCancelados = src.BoletosCancelados,
+            ValorAcreditado = src.ValorAcreditado,
+            FechaActualizacion = SYSDATETIME()
+        WHEN NOT MATCHED BY TARGET THEN INSERT (
+            IdFunción, Fecha, IdSala, IdCine, IdPelícula, Capacidad, BoletosVendidos,
+            Ingresos, BoletosUsados, BoletosCancelados, ValorAcreditado, FechaActualizacion
+        ) VALUES (
+            src.IdFunción, src.Fecha, src.IdSala, src.IdCine, src.IdPelícula, src.Capacidad,
+            src.BoletosVendidos, src.Ingresos, src.BoletosUsados, src.BoletosCancelados,
+            src.ValorAcreditado, SYSDATETIME()
+        ){borrar_huerfanas};
+    """
+
+    @staticmethod
+    def acumular(deltas: Dict[int, Dict[str, float]], funcion_id: int, **valores):
+        """
+        Suma incrementos a los de una función (vendidos, ingresos, usados,
+        cancelados, acreditado) para aplicarlos después con aplicar_deltas
+        """
+        delta = deltas.setdefault(int(funcion_id), {})
+        for campo, valor in valores.items():
+            if campo not in ResumenController.CAMPOS_DELTA:
+                raise ValueError(f"Campo de resumen desconocido: {campo}")
+            delta[campo] = delta.get(campo, 0) + float(valor)
+
+    @staticmethod
+    def aplicar_deltas(session, deltas: Dict[int, Dict[str, float]]):
+        """
+        Aplica los incrementos acumulados dentro de la transacción del llamador
+        (no hace commit). Conviene invocarlo como último paso antes del commit,
+        para retener el bloqueo de la fila resumen el menor tiempo posible.
+
+        Las filas se actualizan en orden de IdFunción para que dos transacciones
+        que tocan las mismas funciones no se bloqueen en orden inverso. Si una
+        función todavía no tiene fila, se calcula completa con recalcular_funciones.
+
+        Args:
+            session: Sesión de la unidad de trabajo en curso
+            deltas: IdFunción -> incrementos (ver acumular)
+        """
+        sin_fila = []
+        for funcion_id in sorted(deltas):
+            params = {campo: 0 for campo in ResumenController.CAMPOS_DELTA}
+            params.update(deltas[funcion_id])
+            params['funcion_id'] = funcion_id
+            resultado = session.execute(text(ResumenController.SQL_DELTA), params)
+            if resultado.rowcount == 0:
+                sin_fila.append(funcion_id)
+
+        if sin_fila:
+            ResumenController.recalcular_funciones(session, sin_fila)
+
+    @staticmethod
+    def recalcular_funciones(session, funcion_ids: Iterable[int]):
+        """
+        Recalcula las filas resumen de las funciones indicadas dentro de la
+        transacción del llamador (no hace commit). Los errores se propagan para
+        que la operación de origen se deshaga junto con el resumen. Lee todos los
+        boletos de cada función: se usa en ediciones administrativas y al crear
+        funciones, no en la compra.
+
+        Args:
+            session: Sesión de la unidad de trabajo en curso
+            funcion_ids: IDs de las funciones afectadas
+        """
+        ids = sorted({int(i) for i in funcion_ids if i is not None})
+        if not ids:
+            return
+
+        # Los objetos añadidos con el ORM deben estar en la base antes del MERGE
+        session.flush()
+
+        query = text(ResumenController.SQL_MERGE.format(
+            filtro="f.Id IN :funcion_ids",
+            borrar_huerfanas=""
+        )).bindparams(bindparam('funcion_ids', expanding=True))
+        session.execute(query, {'funcion_ids': ids})
+
+    @staticmethod
+    def actualizar_capacidad(session, sala_ids: Iterable[int]):
+        """
+        Actualiza la capacidad (asientos activos) en las filas de las funciones de
+        las salas indicadas, tras crear, editar o desactivar asientos. No hace commit.
+
+        Args:
+            session: Sesión de la unidad de trabajo en curso
+            sala_ids: IDs de las salas cuyos asientos cambiaron
+        """
+        ids = sorted({int(i) for i in sala_ids if i is not None})
+        if not ids:
+            return
+
+        session.flush()
+        query = text("""
+            UPDATE r SET
+                Capacidad = (
+                    SELECT COUNT(*) FROM Asientos a
+                    WHERE a.IdSala = r.IdSala AND a.Activo = 1
+                ),
+                FechaActualizacion = SYSDATETIME()
+            FROM ResumenFunciones r
+            WHERE r.IdSala IN :sala_ids
+        """).bindparams(bindparam('sala_ids', expanding=True))
+        session.execute(query, {'sala_ids': ids})
+
+    @staticmethod
+    def recalcular_por_boletos(session, boleto_ids: Iterable[int]):
+        """
+        Recalcula el resumen de las funciones a las que pertenecen los boletos indicados
+
+        Args:
+            session: Sesión de la unidad de trabajo en curso
+            boleto_ids: IDs de boletos cancelados, usados o editados
+        """
+        ids = sorted({int(i) for i in boleto_ids if i is not None})
+        if not ids:
+            return
+
+        query = text(
+            "SELECT DISTINCT IdFunción FROM Boletos WHERE Id IN :boleto_ids"
+        ).bindparams(bindparam('boleto_ids', expanding=True))
+        funcion_ids = [row[0] for row in session.execute(query, {'boleto_ids': ids})]
+        ResumenController.recalcular_funciones(session, funcion_ids)
+
+    @staticmethod
+    def reconstruir(desde: Optional[date] = None, hasta: Optional[date] = None):
+        """
+        Reconstruye la tabla resumen completa o solo un rango de fechas de función.
+        Sin rango también elimina las filas de funciones que ya no existen.
+
+        Args:
+            desde: Primera fecha de función a recalcular (opcional)
+            hasta: Última fecha de función a recalcular (opcional)
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        session = db.get_session()
+        try:
+            condiciones = []
+            params = {}
+            if desde:
+                condiciones.append("f.FechaHora >= :desde")
+                params['desde'] = desde
+            if hasta:
+                condiciones.append("f.FechaHora < DATEADD(day, 1, CAST(:hasta AS DATE))")
+                params['hasta'] = hasta
+
+            completa = not condiciones
+            query = text(ResumenController.SQL_MERGE.format(
+                filtro=" AND ".join(condiciones) if condiciones else "1=1",
+                borrar_huerfanas="\n        WHEN NOT MATCHED BY SOURCE THEN DELETE" if completa else ""
+            ))
+
+            resultado = session.execute(query, params)
+            session.commit()
+
+            return True, f"Resumen reconstruido: {resultado.rowcount} filas afectadas"
+
+        except Exception as e:
+            session.rollback()
+            print(f"Error al reconstruir el resumen de funciones: {e}")
+            traceback.print_exc()
+            return False, f"Error al reconstruir el resumen: {str(e)}"
+        finally:
+            session.close()
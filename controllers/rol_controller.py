@@ -1,5 +1,6 @@
 # controllers/rol_controller.py
 from database import db
+from catalogos import catalogos
 from models import RolUsuario, Usuario
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
@@ -59,6 +60,7 @@ class RolController:
                 else:
                     existente.Activo = True
                     session.commit()
+                    catalogos.invalidar('RolUsuario')
                     return True, 'Rol reactivado exitosamente', existente
             
             nuevo_rol = RolUsuario(
@@ -68,6 +70,7 @@ class RolController:
             
             session.add(nuevo_rol)
             session.commit()
+            catalogos.invalidar('RolUsuario')
             return True, 'Rol creado exitosamente', nuevo_rol
             
         except IntegrityError:
@@ -108,6 +111,7 @@ class RolController:
                 rol.Activo = data['Activo'] == 'on' if isinstance(data['Activo'], str) else bool(data['Activo'])
             
             session.commit()
+            catalogos.invalidar('RolUsuario')
             return True, 'Rol actualizado exitosamente', rol
             
         except Exception as e:
@@ -135,6 +139,7 @@ class RolController:
             
             rol.Activo = False
             session.commit()
+            catalogos.invalidar('RolUsuario')
             
             return True, 'Rol eliminado exitosamente'
             
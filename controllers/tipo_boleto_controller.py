@@ -1,5 +1,6 @@
 # controllers/tipo_boleto_controller.py
 from database import db
+from catalogos import catalogos
 from models import TipoBoleto, Boleto
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
@@ -59,6 +60,7 @@ class TipoBoletoController:
                 else:
                     existente.Activo = True
                     session.commit()
+                    catalogos.invalidar('TipoBoleto')
                     return True, 'Tipo de boleto reactivado exitosamente', existente
             
             nuevo_tipo = TipoBoleto(
@@ -68,6 +70,7 @@ class TipoBoletoController:
             
             session.add(nuevo_tipo)
             session.commit()
+            catalogos.invalidar('TipoBoleto')
             return True, 'Tipo de boleto creado exitosamente', nuevo_tipo
             
         except IntegrityError:
@@ -108,6 +111,7 @@ class TipoBoletoController:
                 tipo.Activo = data['Activo'] == 'on' if isinstance(data['Activo'], str) else bool(data['Activo'])
             
             session.commit()
+            catalogos.invalidar('TipoBoleto')
             return True, 'Tipo de boleto actualizado exitosamente', tipo
             
         except Exception as e:
@@ -135,6 +139,7 @@ class TipoBoletoController:
             
             tipo.Activo = False
             session.commit()
+            catalogos.invalidar('TipoBoleto')
             
             return True, 'Tipo de boleto eliminado exitosamente'
             
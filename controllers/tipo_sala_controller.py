@@ -1,5 +1,6 @@
 # controllers/tipo_sala_controller.py
 from database import db
+from catalogos import catalogos
 from models import TipoSala, Sala
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
@@ -63,6 +64,7 @@ class TipoSalaController:
                 else:
                     existente.Activo = True
                     session.commit()
+                    catalogos.invalidar('TipoSala')
                     return True, 'Tipo de sala reactivado exitosamente', existente
             
             nuevo_tipo = TipoSala(
@@ -74,6 +76,7 @@ class TipoSalaController:
             
             session.add(nuevo_tipo)
             session.commit()
+            catalogos.invalidar('TipoSala')
             return True, 'Tipo de sala creado exitosamente', nuevo_tipo
             
         except IntegrityError:
@@ -120,6 +123,7 @@ class TipoSalaController:
                 tipo.Activo = data['Activo'] == 'on' if isinstance(data['Activo'], str) else bool(data['Activo'])
             
             session.commit()
+            catalogos.invalidar('TipoSala')
             return True, 'Tipo de sala actualizado exitosamente', tipo
             
         except Exception as e:
@@ -148,6 +152,7 @@ class TipoSalaController:
             
             tipo.Activo = False
             session.commit()
+            catalogos.invalidar('TipoSala')
             
             return True, 'Tipo de sala eliminado exitosamente'
             
@@ -1,5 +1,7 @@
 # controllers/usuario_admin_controller.py
 from database import db
+from cache import invalidar_usuario, invalidar_totales
+from paginacion import paginar, resultado_vacio, clave_filtros
 from models import Usuario, RolUsuario
 from sqlalchemy.orm import joinedload
 from sqlalchemy.exc import IntegrityError
@@ -11,12 +13,11 @@ class UsuarioAdminController:
     """Controlador para operaciones CRUD de Usuarios (Administrador)"""
 
     @staticmethod
-    def obtener_todos_paginados(pagina=1, por_pagina=25, filtros=None):
-        """Obtiene usuarios con paginación"""
+    def obtener_todos_paginados(pagina=1, por_pagina=25, filtros=None, cursor=None):
+        """Obtiene usuarios con paginación (por cursor si se indica uno)"""
         session = db.get_session()
         try:
-            query = session.query(Usuario).\
-                options(joinedload(Usuario.rol))
+            query = session.query(Usuario)
             
             # Aplicar filtros si existen
             if filtros:
@@ -30,22 +31,18 @@ class UsuarioAdminController:
                     query = query.filter(Usuario.IdRol == filtros['rol_id'])
             
             # Ordenar por nombre
-            query = query.order_by(Usuario.Nombre, Usuario.Apellidos)
-            
-            # Paginación
-            usuarios = query.offset((pagina - 1) * por_pagina).limit(por_pagina).all()
-            total = query.count()
-            
-            return {
-                'usuarios': usuarios,
-                'total': total,
-                'pagina': pagina,
-                'por_pagina': por_pagina,
-                'paginas': (total + por_pagina - 1) // por_pagina
-            }
+            resultado = paginar(
+                query,
+                [(Usuario.Nombre, False), (Usuario.Apellidos, False), (Usuario.Id, False)],
+                pagina, por_pagina, cursor,
+                opciones=(joinedload(Usuario.rol),),
+                clave_total=clave_filtros('usuarios', filtros)
+            )
+            resultado['usuarios'] = resultado.pop('items')
+            return resultado
         except Exception as e:
             flash(f'Error al obtener usuarios: {str(e)}', 'danger')
-            return {'usuarios': [], 'total': 0, 'pagina': 1, 'por_pagina': por_pagina, 'paginas': 0}
+            return resultado_vacio('usuarios', por_pagina=por_pagina)
         finally:
             session.close()
     
@@ -137,6 +134,7 @@ class UsuarioAdminController:
             
             session.add(nuevo_usuario)
             session.commit()
+            invalidar_totales()
             return True, 'Usuario creado exitosamente', nuevo_usuario
             
         except IntegrityError:
@@ -224,6 +222,8 @@ class UsuarioAdminController:
                 usuario.guardar_contrasena(data['Contrasena'])
             
             session.commit()
+            invalidar_totales()
+            invalidar_usuario(id)
             return True, 'Usuario actualizado exitosamente', usuario
             
         except Exception as e:
@@ -255,6 +255,8 @@ class UsuarioAdminController:
             # Marcamos como inactivo eliminando la contraseña (para que no pueda iniciar sesión)
             usuario.ContrasenaHash = ''
             session.commit()
+            invalidar_totales()
+            invalidar_usuario(id)
             
             return True, 'Usuario desactivado exitosamente'
             
@@ -4,6 +4,8 @@
 import re
 from datetime import datetime
 from models import Usuario, RolUsuario, db
+from cache import invalidar_usuario
+from contrasenas import servicio_contrasenas, ServicioOcupado
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 from flask import flash
@@ -108,6 +110,11 @@ class UsuarioController:
             flash(f"¡Usuario {data['nombre']} registrado exitosamente! Ahora puedes iniciar sesión.", 'success')
             return True, "Usuario creado exitosamente", nuevo_usuario
             
+        except ServicioOcupado as e:
+            session.rollback()
+            flash(str(e), 'warning')
+            return False, str(e), None
+            
         except IntegrityError as e:
             session.rollback()
             if "UNIQUE" in str(e).upper() and "CORREOELECTRÓNICO" in str(e).upper():
@@ -126,13 +133,14 @@ class UsuarioController:
                 session.close()
     
     @staticmethod
-    def iniciar_sesion(correo, contrasena):
+    def iniciar_sesion(correo, contrasena, ip=None):
         """
         Inicia sesión para un usuario
         
         Args:
             correo (str): Correo electrónico del usuario
             contrasena (str): Contraseña del usuario
+            ip (str, opcional): Dirección del cliente, para limitar intentos simultáneos
         
         Returns:
             tuple: (success: bool, message: str, usuario: Usuario or None)
@@ -146,29 +154,32 @@ class UsuarioController:
         
         session = db.get_session()
         try:
-            # Buscar usuario por correo con la relación rol cargada
-            usuario = session.query(Usuario).options(
-                joinedload(Usuario.rol)
-            ).filter_by(CorreoElectronico=correo.lower()).first()
-            
-            if not usuario:
-                return False, "Correo o contraseña incorrectos", None
-            
-            # Verificar contraseña
-            if not usuario.validar_contrasena(contrasena):
-                return False, "Correo o contraseña incorrectos", None
+            with servicio_contrasenas.limitar(ip=ip, cuenta=correo.lower()):
+                # Buscar usuario por correo con la relación rol cargada
+                usuario = session.query(Usuario).options(
+                    joinedload(Usuario.rol)
+                ).filter_by(CorreoElectronico=correo.lower()).first()
+                
+                if not usuario:
+                    return False, "Correo o contraseña incorrectos", None
+                
+                # Verificar contraseña (en el pool de procesos de bcrypt)
+                if not usuario.validar_contrasena(contrasena):
+                    return False, "Correo o contraseña incorrectos", None
             
             # Expungir el objeto de la sesión para evitar problemas
             session.expunge(usuario)
             
             return True, f"¡Bienvenido {usuario.Nombre}!", usuario
             
+        except ServicioOcupado as e:
+            return False, str(e), None
         except Exception as e:
             print(f"Error al iniciar sesión: {e}")
             return False, f"Error inesperado: {str(e)}", None
         finally:
             session.close()
-
+    
     @staticmethod
     def _validar_contrasena(contrasena):
         """
@@ -317,6 +328,7 @@ class UsuarioController:
             
             # Guardar cambios
             session.commit()
+            invalidar_usuario(usuario_id)
             
             # Crear un diccionario con los datos actualizados para retornar
             usuario_dict = {
@@ -376,9 +388,13 @@ class UsuarioController:
             
             # Guardar cambios
             session.commit()
+            invalidar_usuario(usuario_id)
             
             return True, "Contraseña actualizada exitosamente"
             
+        except ServicioOcupado as e:
+            session.rollback()
+            return False, str(e)
         except Exception as e:
             session.rollback()
             return False, f"Error al actualizar contraseña: {str(e)}"
@@ -417,6 +433,7 @@ class UsuarioController:
                 usuario.Telefono = data['telefono']
             
             session.commit()
+            invalidar_usuario(usuario_id)
             
             # Refrescar y desasociar el objeto
             session.refresh(usuario)
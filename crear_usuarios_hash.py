@@ -1,69 +1,312 @@
-from pathlib import Path
+# crear_usuarios_hash.py
+# Importación masiva de usuarios: hash de contraseñas en paralelo e inserción por lotes
+#
+# Uso:
+#   python crear_usuarios_hash.py                                # usuarios semilla -> crear_usuarios_hash.sql
+#   python crear_usuarios_hash.py --csv socios.csv               # CSV -> crear_usuarios_hash.sql
+#   python crear_usuarios_hash.py --csv socios.csv --destino bd  # CSV -> tabla Usuarios
+#   python crear_usuarios_hash.py --csv socios.csv --reanudar    # continúa una generación interrumpida
+#
+# Columnas del CSV (encabezado obligatorio):
+#   correo, nombre, apellidos, telefono, fecha_nacimiento (YYYY-MM-DD),
+#   contrasena (opcional), id_rol (opcional, por defecto 3 = Cliente)
+#
+# Si una fila no trae contrasena se genera una aleatoria (secrets.token_urlsafe) y
+# se anota con el correo en el archivo de --credenciales (permisos 600) para
+# enviársela al socio; ese archivo debe borrarse después de distribuirlo. Solo los
+# usuarios semilla usan como contraseña la parte del correo antes de @.
+#
+# Es reanudable: con --destino bd se omiten los correos que ya existen en la tabla;
+# con --destino sql cada lote se inserta con NOT EXISTS (el script se puede ejecutar
+# más de una vez) y --reanudar continúa desde el último lote escrito.
+
+import argparse
+import csv
+import os
+import secrets
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
-from flask_bcrypt import Bcrypt
-
-bcrypt = Bcrypt()
-
-# 1. Definir los usuarios especiales
-usuarios = [
-    {
-        "id_rol": 1,
-        "nombre": "Admin",
-        "apellidos": "CineFlow",
-        "correo": "admin@cineflow.com",
-        "telefono": "809-555-0001",
-        "fecha_nacimiento": date(1985, 1, 1),
-    },
-    {
-        "id_rol": 2,
-        "nombre": "Encargado",
-        "apellidos": "Entrada",
-        "correo": "encargado_entrada@cineflow.com",
-        "telefono": "809-555-0002",
-        "fecha_nacimiento": date(1990, 2, 2),
-    }
-]
-
-# 2. Generar los 50 clientes adicionales
-for i in range(1, 51):
-    correo_base = f"usuario_{i}"
-    usuarios.append({
-        "id_rol": 3,
-        "nombre": f"Cliente{i}",
-        "apellidos": "Apellido",
-        "correo": f"{correo_base}@example.com",
-        "telefono": f"809-000-{i:04d}",
-        "fecha_nacimiento": date(1995, 1, 1),
-    })
-
-# --- CAMBIO AQUÍ: Definir archivo en la raíz ---
-out_file = Path("crear_usuarios_hash.sql")
-
-lines = []
-lines.append("-- Inserts generados para la tabla Usuarios")
-lines.append(
-    "INSERT INTO Usuarios (IdRol, Nombre, Apellidos, CorreoElectrónico, Teléfono, ContraseñaHash, FechaNacimiento) VALUES"
-)
-
-# 3. Procesar y hashear
-for i, u in enumerate(usuarios):
-    # Contraseña = parte antes del @
-    contrasena_plana = u["correo"].split("@")[0]
-    pw_hash = bcrypt.generate_password_hash(contrasena_plana).decode("utf-8")
-    
-    nombre = u["nombre"].replace("'", "''")
-    apellidos = u["apellidos"].replace("'", "''")
-    correo = u["correo"].replace("'", "''")
-    telefono = (u["telefono"] or "").replace("'", "''")
-    fecha = f"'{u['fecha_nacimiento'].isoformat()}'" if u.get("fecha_nacimiento") else "NULL"
-    
-    # Coma para todos menos el último, que lleva punto y coma
-    terminador = ";" if i == len(usuarios) - 1 else ","
-    
-    lines.append(
-        f"({u['id_rol']}, '{nombre}', '{apellidos}', '{correo}', '{telefono}', '{pw_hash}', {fecha}){terminador}"
+from pathlib import Path
+
+from config import Config
+
+# SQL Server admite como máximo 1000 filas en una cláusula VALUES
+MAX_FILAS_LOTE = 1000
+ID_ROL_CLIENTE = 3
+
+
+def usuarios_semilla():
+    """Usuarios de prueba: administrador, encargado de entrada y 50 clientes"""
+    usuarios = [
+        {
+            "id_rol": 1,
+            "nombre": "Admin",
+            "apellidos": "CineFlow",
+            "correo": "admin@cineflow.com",
+            "telefono": "809-555-0001",
+            "fecha_nacimiento": date(1985, 1, 1),
+        },
+        {
+            "id_rol": 2,
+            "nombre": "Encargado",
+            "apellidos": "Entrada",
+            "correo": "encargado_entrada@cineflow.com",
+            "telefono": "809-555-0002",
+            "fecha_nacimiento": date(1990, 2, 2),
+        }
+    ]
+
+    for i in range(1, 51):
+        usuarios.append({
+            "id_rol": ID_ROL_CLIENTE,
+            "nombre": f"Cliente{i}",
+            "apellidos": "Apellido",
+            "correo": f"usuario_{i}@example.com",
+            "telefono": f"809-000-{i:04d}",
+            "fecha_nacimiento": date(1995, 1, 1),
+        })
+
+    for usuario in usuarios:
+        usuario["contrasena"] = usuario["correo"].split("@")[0]
+    return usuarios
+
+
+def leer_csv(ruta: Path, errores: list):
+    """
+    Genera los usuarios válidos del CSV; las filas inválidas y los correos
+    repetidos (se conserva la primera aparición) se anotan en errores
+
+    Yields:
+        dict: Usuario normalizado
+    """
+    vistos = {}
+    with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+        for numero, fila in enumerate(csv.DictReader(archivo), start=2):
+            correo = (fila.get("correo") or "").strip().lower()
+            nombre = (fila.get("nombre") or "").strip()
+            apellidos = (fila.get("apellidos") or "").strip()
+            if "@" not in correo or not nombre or not apellidos:
+                errores.append(f"Línea {numero}: correo, nombre y apellidos son obligatorios")
+                continue
+            if correo in vistos:
+                errores.append(f"Línea {numero}: correo {correo} repetido (ya aparece en la línea {vistos[correo]})")
+                continue
+
+            try:
+                fecha = (fila.get("fecha_nacimiento") or "").strip()
+                fecha_nacimiento = date.fromisoformat(fecha) if fecha else None
+                id_rol = int(fila.get("id_rol") or ID_ROL_CLIENTE)
+            except ValueError as e:
+                errores.append(f"Línea {numero}: {e}")
+                continue
+
+            vistos[correo] = numero
+            contrasena = (fila.get("contrasena") or "").strip()
+            yield {
+                "id_rol": id_rol,
+                "nombre": nombre,
+                "apellidos": apellidos,
+                "correo": correo,
+                "telefono": (fila.get("telefono") or "").strip() or None,
+                "fecha_nacimiento": fecha_nacimiento,
+                "contrasena": contrasena or secrets.token_urlsafe(12),
+                "contrasena_generada": not contrasena,
+            }
+
+
+def lotes(usuarios, tamano: int):
+    """Agrupa los usuarios en listas de hasta `tamano` elementos"""
+    lote = []
+    for usuario in usuarios:
+        lote.append(usuario)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def registrar_credenciales(ruta: Path, usuarios: list):
+    """Añade al archivo de credenciales las contraseñas generadas para los usuarios del lote"""
+    generados = [u for u in usuarios if u.get("contrasena_generada")]
+    if not generados:
+        return
+
+    nuevo = not ruta.exists() or ruta.stat().st_size == 0
+    descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+    with open(descriptor, "a", newline="", encoding="utf-8") as archivo:
+        escritor = csv.writer(archivo)
+        if nuevo:
+            escritor.writerow(["correo", "contrasena"])
+        escritor.writerows((u["correo"], u["contrasena"]) for u in generados)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+
+
+def _hashear(argumentos):
+    contrasena, costo = argumentos
+    from flask_bcrypt import generate_password_hash
+    return generate_password_hash(contrasena, costo).decode("utf-8")
+
+
+def hashear_lote(pool: ProcessPoolExecutor, lote: list, costo: int, workers: int):
+    """Calcula en paralelo el hash de cada usuario del lote (clave 'hash')"""
+    trozo = max(1, len(lote) // (workers * 4))
+    hashes = pool.map(_hashear, [(u["contrasena"], costo) for u in lote], chunksize=trozo)
+    for usuario, pw_hash in zip(lote, hashes):
+        usuario["hash"] = pw_hash
+
+
+def _texto_sql(valor):
+    if valor is None:
+        return "NULL"
+    if isinstance(valor, int):
+        return str(valor)
+    texto = str(valor).replace("'", "''")
+    return f"N'{texto}'"
+
+
+def sentencia_lote(lote: list) -> str:
+    """INSERT idempotente de un lote (omite los correos que ya existen)"""
+    valores = ",\n".join(
+        "(" + ", ".join([
+            _texto_sql(u["id_rol"]),
+            _texto_sql(u["nombre"]),
+            _texto_sql(u["apellidos"]),
+            _texto_sql(u["correo"]),
+            _texto_sql(u["telefono"]),
+            _texto_sql(u["hash"]),
+            _texto_sql(u["fecha_nacimiento"].isoformat() if u["fecha_nacimiento"] else None),
+        ]) + ")"
+        for u in lote
+    )
+    return (
+        "INSERT INTO Usuarios (IdRol, Nombre, Apellidos, CorreoElectrónico, Teléfono, ContraseñaHash, FechaNacimiento)\n"
+        "SELECT v.IdRol, v.Nombre, v.Apellidos, v.Correo, v.Telefono, v.Hash, v.FechaNacimiento\n"
+        f"FROM (VALUES\n{valores}\n) AS v(IdRol, Nombre, Apellidos, Correo, Telefono, Hash, FechaNacimiento)\n"
+        "WHERE NOT EXISTS (SELECT 1 FROM Usuarios u WHERE u.CorreoElectrónico = v.Correo);\nGO\n"
     )
 
-# 4. Escribir el archivo
-out_file.write_text("\n".join(lines), encoding="utf-8")
-print(f"Éxito: Se ha creado el archivo '{out_file.name}' en la raíz.")
\ No newline at end of file
+
+def importar_a_archivo(usuarios, salida: Path, credenciales: Path, tamano_lote: int, costo: int,
+                       workers: int, reanudar: bool):
+    """
+    Escribe el script SQL lote a lote; el progreso se guarda junto al archivo.
+    Sin --reanudar se empieza de cero, también el archivo de credenciales: las
+    contraseñas generadas en una ejecución anterior no corresponden al script nuevo.
+    """
+    progreso = salida.with_name(salida.name + ".progreso")
+    escritos = 0
+    if reanudar and progreso.exists() and salida.exists():
+        escritos = int(progreso.read_text().strip() or 0)
+        print(f"Reanudando después de {escritos} usuarios ya escritos")
+    else:
+        salida.write_text("-- Inserts generados para la tabla Usuarios\n", encoding="utf-8")
+        credenciales.unlink(missing_ok=True)
+
+    procesados = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(salida, "a", encoding="utf-8") as archivo:
+        for lote in lotes(usuarios, tamano_lote):
+            if procesados + len(lote) <= escritos:
+                procesados += len(lote)
+                continue
+
+            # Si al reanudar se usa otro --lote, el primer lote puede estar escrito en parte
+            pendientes = lote[max(escritos - procesados, 0):]
+            hashear_lote(pool, pendientes, costo, workers)
+            archivo.write(sentencia_lote(pendientes))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+            registrar_credenciales(credenciales, pendientes)
+
+            procesados += len(lote)
+            progreso.write_text(str(procesados))
+            print(f"{procesados} usuarios escritos")
+
+    progreso.unlink(missing_ok=True)
+    return procesados
+
+
+def importar_a_bd(usuarios, credenciales: Path, tamano_lote: int, costo: int, workers: int):
+    """Inserta directamente en la tabla Usuarios, un commit por lote"""
+    from sqlalchemy import bindparam, insert, text
+    from database import db
+    from models import Usuario
+
+    consulta_existentes = text(
+        "SELECT CorreoElectrónico FROM Usuarios WHERE CorreoElectrónico IN :correos"
+    ).bindparams(bindparam('correos', expanding=True))
+
+    insertados = 0
+    omitidos = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for lote in lotes(usuarios, tamano_lote):
+            session = db.get_session()
+            try:
+                existentes = {
+                    fila[0].lower()
+                    for fila in session.execute(consulta_existentes, {'correos': [u["correo"] for u in lote]})
+                }
+                pendientes = [u for u in lote if u["correo"] not in existentes]
+                omitidos += len(lote) - len(pendientes)
+                if not pendientes:
+                    continue
+
+                # Solo se calcula el hash de los usuarios que realmente se insertan
+                hashear_lote(pool, pendientes, costo, workers)
+                session.execute(insert(Usuario), [
+                    {
+                        'IdRol': u["id_rol"],
+                        'Nombre': u["nombre"],
+                        'Apellidos': u["apellidos"],
+                        'CorreoElectronico': u["correo"],
+                        'Telefono': u["telefono"],
+                        'ContrasenaHash': u["hash"],
+                        'FechaNacimiento': u["fecha_nacimiento"],
+                    }
+                    for u in pendientes
+                ])
+                session.commit()
+                registrar_credenciales(credenciales, pendientes)
+                insertados += len(pendientes)
+                print(f"{insertados} usuarios insertados ({omitidos} ya existían)")
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+    return insertados, omitidos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación masiva de usuarios con contraseñas bcrypt")
+    parser.add_argument('--csv', type=Path, help="Archivo CSV de usuarios (sin él se usan los usuarios semilla)")
+    parser.add_argument('--destino', choices=['sql', 'bd'], default='sql',
+                        help="'sql' genera un script; 'bd' inserta en la base de datos")
+    parser.add_argument('--salida', type=Path, default=Path("crear_usuarios_hash.sql"),
+                        help="Script SQL a generar (destino sql)")
+    parser.add_argument('--credenciales', type=Path, default=Path("credenciales_generadas.csv"),
+                        help="CSV con las contraseñas generadas para filas sin contrasena")
+    parser.add_argument('--lote', type=int, default=MAX_FILAS_LOTE, help="Usuarios por lote (máximo 1000)")
+    parser.add_argument('--costo', type=int, default=Config.BCRYPT_COSTO, help="Factor de costo de bcrypt")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Procesos para el hash")
+    parser.add_argument('--reanudar', action='store_true', help="Continuar un script SQL interrumpido")
+    args = parser.parse_args()
+
+    tamano_lote = max(1, min(args.lote, MAX_FILAS_LOTE))
+    workers = max(1, args.workers)
+    errores = []
+    usuarios = leer_csv(args.csv, errores) if args.csv else iter(usuarios_semilla())
+
+    if args.destino == 'bd':
+        insertados, omitidos = importar_a_bd(usuarios, args.credenciales, tamano_lote, args.costo, workers)
+        print(f"Éxito: {insertados} usuarios insertados, {omitidos} ya existían.")
+    else:
+        total = importar_a_archivo(usuarios, args.salida, args.credenciales, tamano_lote, args.costo, workers, args.reanudar)
+        print(f"Éxito: Se ha creado el archivo '{args.salida.name}' con {total} usuarios.")
+
+    for error in errores:
+        print(f"[OMITIDO] {error}", file=sys.stderr)
+    sys.exit(1 if errores else 0)
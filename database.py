@@ -1,23 +1,116 @@
 # database.py
 # Configuración de SQLAlchemy para el Sistema de Biblioteca
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import declarative_base, sessionmaker
-from config import Config
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError, DisconnectionError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from flask import g, has_app_context
+from sqlalchemy.pool import QueuePool
+from config import config
+import os
+import threading
+import time
 import urllib
 
 # Crear la base declarativa para los modelos
 Base = declarative_base()
 
+
+class QueuePoolMedido(QueuePool):
+    """
+    QueuePool que mide cuánto esperan las peticiones por una conexión.
+    Cada proceso (worker) tiene su propio pool y, por lo tanto, sus propias cifras.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_medicion = threading.Lock()
+        self.obtenciones = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.agotamientos = 0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._lock_medicion:
+                self.agotamientos += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_medicion:
+                self.obtenciones += 1
+                self.espera_total += espera
+                self.espera_maxima = max(self.espera_maxima, espera)
+
+
+def _verificar_si_inactiva(engine, segundos: int):
+    """
+    Pre-ping solo para conexiones que llevan más de `segundos` sin usarse,
+    en lugar de un SELECT 1 en cada checkout (pool_pre_ping)
+    """
+    @event.listens_for(engine, 'checkin')
+    def _marcar_uso(dbapi_connection, connection_record):
+        connection_record.info['ultimo_uso'] = time.monotonic()
+
+    @event.listens_for(engine, 'checkout')
+    def _ping(dbapi_connection, connection_record, connection_proxy):
+        ultimo_uso = connection_record.info.get('ultimo_uso')
+        if ultimo_uso is None or time.monotonic() - ultimo_uso < segundos:
+            return
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        except Exception:
+            # El pool descarta esta conexión y abre otra
+            raise DisconnectionError("Conexión inactiva no disponible")
+
+
+class SesionPeticion(Session):
+    """
+    Sesión compartida por todos los controladores durante una petición web.
+
+    Los controladores siguen el patrón get_session() ... close(): aquí close()
+    solo desasocia los objetos cuando el último usuario anidado la libera (igual
+    que antes, quedan cargados pero separados de la sesión) y conserva la
+    transacción y la conexión para el resto de la petición. El cierre real lo
+    hace Database.cerrar_sesion_peticion al terminar el contexto de Flask.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.usos = 0
+
+    def close(self):
+        self.usos = max(self.usos - 1, 0)
+        if self.usos == 0:
+            self.expunge_all()
+
+    def cerrar(self):
+        """Cierre real: devuelve la conexión al pool"""
+        self.usos = 0
+        super().close()
+
+
 class Database:
     """Clase para manejar la conexión con SQLAlchemy"""
 
-    def __init__(self):
+    def __init__(self, configuracion=None):
         """
         Inicializa la conexión a la base de datos
+
+        Args:
+            configuracion: Clase o instancia de configuración (por defecto config.config,
+                DevelopmentConfig o ProductionConfig según CINEFLOW_MODO)
         """
-        # Obtener la URL de conexión desde Config
-        connection_url = Config.get_sqlalchemy_url()
+        configuracion = configuracion or config
+
+        # Obtener la URL de conexión desde la configuración
+        connection_url = configuracion.get_sqlalchemy_url()
 
         # Crear el engine
         # echo=True muestra las consultas SQL en consola (útil para debug)
@@ -25,9 +118,15 @@ class Database:
         self.engine = create_engine(
             connection_url,
             echo=False,  # Cambiar a True para ver las consultas SQL
-            pool_pre_ping=True,  # Verifica la conexión antes de usarla
-            pool_recycle=3600,  # Recicla conexiones cada hora
+            poolclass=QueuePoolMedido,
+            pool_size=configuracion.POOL_TAMANO,
+            max_overflow=configuracion.POOL_DESBORDE,
+            pool_timeout=configuracion.POOL_TIEMPO_ESPERA,
+            pool_recycle=configuracion.POOL_RECICLAJE,
+            pool_pre_ping=configuracion.POOL_PRE_PING == 'siempre',
         )
+        if configuracion.POOL_PRE_PING == 'inactividad':
+            _verificar_si_inactiva(self.engine, configuracion.POOL_PING_INACTIVIDAD)
 
         # Crear session factory
         self.SessionLocal = sessionmaker(
@@ -36,15 +135,157 @@ class Database:
             bind=self.engine
         )
 
+        # Sesión por petición (activa tras init_app). expire_on_commit=False: el commit de
+        # un controlador no debe forzar recargas de los objetos que otro ya devolvió
+        self.SesionPeticionLocal = sessionmaker(
+            class_=SesionPeticion,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False,
+            bind=self.engine
+        )
+        self._sesion_por_peticion = False
+
+        # Cualquier fork (workers de gunicorn, multiprocessing con 'fork') parte de un pool vacío
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reiniciar_en_proceso_hijo)
+
+    def reiniciar_en_proceso_hijo(self):
+        """
+        Descarta las conexiones heredadas tras un fork (workers de gunicorn).
+        No las cierra: siguen perteneciendo al proceso padre; el hijo abre las suyas.
+        """
+        self.engine.dispose(close=False)
+
+    def estadisticas_pool(self) -> dict:
+        """
+        Estado del pool de conexiones de este proceso
+
+        Returns:
+            dict: Tamaño, conexiones en uso/libres, desborde y tiempos de espera (ms)
+        """
+        pool = self.engine.pool
+        estadisticas = {
+            'pid': os.getpid(),
+            'tamano': pool.size(),
+            'desborde_maximo': pool._max_overflow,
+            'en_uso': pool.checkedout(),
+            'libres': pool.checkedin(),
+            'desborde': max(pool.overflow(), 0),
+        }
+        if isinstance(pool, QueuePoolMedido):
+            with pool._lock_medicion:
+                obtenciones = pool.obtenciones
+                estadisticas.update({
+                    'obtenciones': obtenciones,
+                    'espera_promedio_ms': round(pool.espera_total / obtenciones * 1000, 3) if obtenciones else 0.0,
+                    'espera_maxima_ms': round(pool.espera_maxima * 1000, 3),
+                    'agotamientos': pool.agotamientos,
+                })
+        return estadisticas
+
+    def init_app(self, app):
+        """
+        Activa la sesión por petición: dentro de un contexto de la aplicación,
+        get_session() devuelve siempre la misma sesión (una conexión del pool y
+        una transacción por petición) y se cierra al terminar el contexto.
+        """
+        self._sesion_por_peticion = True
+        app.teardown_appcontext(self.cerrar_sesion_peticion)
+
     def get_session(self):
         """
-        Retorna una nueva sesión de base de datos
+        Retorna la sesión de la petición en curso o, fuera de una petición
+        (scripts, procesos de exportación), una nueva sesión de base de datos
 
         Returns:
             Session: Objeto de sesión de SQLAlchemy
         """
+        if self._sesion_por_peticion and has_app_context():
+            if 'sesion_bd' not in g:
+                g.sesion_bd = self.SesionPeticionLocal()
+            elif not g.sesion_bd.is_active:
+                # Un controlador anterior falló sin hacer rollback: no arrastrar el error
+                g.sesion_bd.rollback()
+            g.sesion_bd.usos += 1
+            return g.sesion_bd
         return self.SessionLocal()
 
+    def cerrar_sesion_peticion(self, error=None):
+        """
+        Descarta lo que haya quedado sin confirmar y devuelve la conexión al pool.
+        Los controladores confirman explícitamente sus escrituras con commit().
+        """
+        sesion = g.pop('sesion_bd', None)
+        if sesion is None:
+            return
+        try:
+            sesion.rollback()
+        finally:
+            sesion.cerrar()
+
+    def _liberar_conexion_peticion(self):
+        """
+        Termina la transacción de la sesión de la petición si solo ha leído, para
+        que su conexión vuelva al pool. Los objetos que conserve se recargan al
+        usarlos. Si tiene cambios sin enviar no se toca.
+        """
+        if not (self._sesion_por_peticion and has_app_context()):
+            return
+        sesion = g.get('sesion_bd')
+        if sesion is None or not sesion.in_transaction():
+            return
+        if sesion.new or sesion.dirty or sesion.deleted:
+            return
+        sesion.rollback()
+
+    def ejecutar_transaccion(self, operacion, isolation_level=None, reintentos=0):
+        """
+        Ejecuta operacion(session) en una única transacción (un commit) con su propia
+        sesión. Si SQL Server elige la transacción como víctima de un deadlock
+        (error 1205) se repite desde el principio hasta `reintentos` veces.
+
+        Dentro de una petición, antes de empezar se devuelve al pool la conexión de
+        la sesión de la petición (ver _liberar_conexion_peticion), así que la
+        transacción ocupa una sola conexión. Solo si la petición tiene cambios
+        sin enviar en su sesión se usan dos a la vez.
+
+        Args:
+            operacion: Función que recibe la sesión y devuelve el resultado
+            isolation_level: Nivel de aislamiento para la conexión (ej. 'READ COMMITTED')
+            reintentos: Número máximo de reintentos ante deadlock
+
+        Returns:
+            El valor devuelto por operacion
+        """
+        self._liberar_conexion_peticion()
+        intento = 0
+        while True:
+            # Sesión propia (no la de la petición): el rollback de un reintento
+            # no debe afectar a lo que ya leyó o escribió la petición
+            session = self.SessionLocal()
+            try:
+                if isolation_level:
+                    session.connection(execution_options={'isolation_level': isolation_level})
+
+                resultado = operacion(session)
+                session.commit()
+                return resultado
+
+            except DBAPIError as e:
+                session.rollback()
+                if es_deadlock(e) and intento < reintentos:
+                    intento += 1
+                    print(f"Deadlock detectado, reintento {intento} de {reintentos}")
+                    time.sleep(0.05 * intento)
+                    continue
+                raise
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
     def create_tables(self):
         """
         Crea todas las tablas definidas en los modelos
@@ -78,6 +319,13 @@ class Database:
 
 
 
+def es_deadlock(error) -> bool:
+    """Indica si un error de base de datos es un deadlock de SQL Server (1205)"""
+    original = getattr(error, 'orig', error)
+    args = getattr(original, 'args', ())
+    return bool(args) and str(args[0]) == '1205'
+
+
 # Context manager para sesiones
 class SessionContext:
     """
@@ -120,9 +368,9 @@ if __name__ == "__main__":
     print("CONFIGURACIÓN DE SQLALCHEMY")
     print("=" * 80)
 
-    print(f"\nServidor: {Config.SERVER}")
-    print(f"Base de datos: {Config.DATABASE}")
-    print(f"TDS_VERSION: {Config.TDS_VERSION}")
+    print(f"\nServidor: {config.SERVER}")
+    print(f"Base de datos: {config.DATABASE}")
+    print(f"TDS_VERSION: {config.TDS_VERSION}")
 
     # Probar la conexión
     print("\n" + "=" * 80)
@@ -141,6 +389,7 @@ if __name__ == "__main__":
         print(f"URL: {db.engine.url}")
         print(f"Driver: {db.engine.driver}")
         print(f"Pool size: {db.engine.pool.size()}")
+        print(f"Pool: {db.estadisticas_pool()}")
 
     else:
         print(f"\n[ERROR] {message}")
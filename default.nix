@@ -8,10 +8,13 @@ let
       flask
       flask-login
       flask-bcrypt
+      gunicorn
       sqlalchemy
       pymssql
       pandas
       openpyxl
+      lxml
+      pyarrow
       reportlab;
   };
 
@@ -5,4 +5,13 @@ set -e
 /usr/sbin/sshd
 
 # Arrancar la app (proceso principal)
-exec nix-shell --run "python app.py"
+# CINEFLOW_MODO=desarrollo usa el servidor de Flask con el depurador (solo local);
+# por defecto se sirve con gunicorn (ver gunicorn.conf.py). exec deja a gunicorn
+# como proceso principal para que reciba SIGTERM (parada) y SIGHUP (recicla los
+# workers; el código de la aplicación solo se recarga reiniciando).
+export CINEFLOW_MODO="${CINEFLOW_MODO:-produccion}"
+if [ "$CINEFLOW_MODO" = "desarrollo" ]; then
+    exec nix-shell --run "python app.py"
+else
+    exec nix-shell --run "exec gunicorn -c gunicorn.conf.py wsgi:app"
+fi
@@ -0,0 +1,49 @@
+# gunicorn.conf.py
+# Configuración del servidor WSGI de producción
+#
+# Uso:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# kill -HUP <pid del proceso maestro> relee este archivo y recicla los workers sin
+# cortar peticiones en curso, pero NO recarga el código de la aplicación: con
+# preload_app el código se importó una sola vez en el maestro y los workers nuevos
+# lo heredan. Para desplegar cambios de código hay que reiniciar el servidor
+# completo (por ejemplo, reiniciar el contenedor).
+
+from config import ProductionConfig
+
+bind = ProductionConfig.SERVIDOR_BIND
+
+# Procesos pre-fork con hilos: cada worker atiende varias peticiones que
+# esperan a SQL Server sin bloquear al resto
+worker_class = 'gthread'
+workers = ProductionConfig.SERVIDOR_WORKERS
+threads = ProductionConfig.SERVIDOR_THREADS
+
+timeout = ProductionConfig.SERVIDOR_TIMEOUT
+graceful_timeout = ProductionConfig.SERVIDOR_GRACEFUL_TIMEOUT
+keepalive = ProductionConfig.SERVIDOR_KEEPALIVE
+
+max_requests = ProductionConfig.SERVIDOR_MAX_REQUESTS
+max_requests_jitter = ProductionConfig.SERVIDOR_MAX_REQUESTS_JITTER
+
+# La aplicación (modelos, plantillas, controladores) se importa una vez en el
+# maestro y los workers la heredan; el motor de base de datos se reinicia en
+# cada worker en post_fork
+preload_app = True
+
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+proc_name = 'cineflow'
+
+
+def post_fork(server, worker):
+    """Cada worker abre su propio pool de conexiones"""
+    from database import db
+    db.reiniciar_en_proceso_hijo()
+    estadisticas = db.estadisticas_pool()
+    server.log.info(
+        f"Worker {worker.pid}: pool de conexiones inicializado "
+        f"(tamaño {estadisticas['tamano']}, desborde máximo {estadisticas['desborde_maximo']})"
+    )
@@ -0,0 +1,196 @@
+# mapa_asientos.py
+# Estado de los asientos de cada función como bitset sobre el índice de asientos de la sala
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from cache import CacheTTL, cache_indices_salas
+from config import Config
+from database import db
+from models import Asiento, Boleto, BoletoCancelado, Funcion
+
+
+@dataclass(frozen=True, eq=False)
+class IndiceSala:
+    """
+    Disposición estática de una sala: el asiento de la posición i es ids[i] / codigos[i].
+    El bit i de `activos` indica si ese asiento está activo.
+    """
+    sala_id: int
+    ids: Tuple[int, ...]
+    codigos: Tuple[str, ...]
+    activos: int
+    posiciones: Dict[int, int] = field(repr=False)
+    posiciones_codigo: Dict[str, int] = field(repr=False)
+
+    @classmethod
+    def desde_filas(cls, sala_id: int, filas) -> "IndiceSala":
+        """Construye el índice a partir de filas (Id, CodigoAsiento, Activo) ordenadas"""
+        ids = tuple(f[0] for f in filas)
+        codigos = tuple(f[1] for f in filas)
+        activos = 0
+        for posicion, fila in enumerate(filas):
+            if fila[2]:
+                activos |= 1 << posicion
+        return cls(
+            sala_id=sala_id,
+            ids=ids,
+            codigos=codigos,
+            activos=activos,
+            posiciones={asiento_id: i for i, asiento_id in enumerate(ids)},
+            posiciones_codigo={codigo: i for i, codigo in enumerate(codigos)}
+        )
+
+    def mascara(self, asientos_ids: Iterable[int]) -> int:
+        """Bitset de los IDs de asiento indicados (se ignoran los que no son de la sala)"""
+        bits = 0
+        for asiento_id in asientos_ids:
+            posicion = self.posiciones.get(asiento_id)
+            if posicion is not None:
+                bits |= 1 << posicion
+        return bits
+
+    def mascara_codigos(self, codigos: Iterable[str]) -> int:
+        """Bitset de los códigos de asiento indicados"""
+        bits = 0
+        for codigo in codigos:
+            posicion = self.posiciones_codigo.get(codigo)
+            if posicion is not None:
+                bits |= 1 << posicion
+        return bits
+
+
+@dataclass(frozen=True, eq=False)
+class EstadoFuncion:
+    """Asientos vendidos (boleto no cancelado) de una función: bit i = indice.ids[i]"""
+    funcion_id: int
+    indice: IndiceSala
+    vendidos: int
+
+    def disponibles_bits(self, retenidos: int = 0) -> int:
+        return self.indice.activos & ~self.vendidos & ~retenidos
+
+    def contar_disponibles(self, retenidos: int = 0) -> int:
+        """Asientos activos que no están vendidos ni retenidos"""
+        return self.disponibles_bits(retenidos).bit_count()
+
+    def asientos(self, retenidos: int = 0) -> List[dict]:
+        """Lista de asientos con su disponibilidad, en el orden del índice de la sala"""
+        disponibles = self.disponibles_bits(retenidos)
+        return [
+            {
+                'id': asiento_id,
+                'codigo_asiento': codigo,
+                'disponible': bool(disponibles >> posicion & 1)
+            }
+            for posicion, (asiento_id, codigo) in enumerate(zip(self.indice.ids, self.indice.codigos))
+        ]
+
+
+class MapaAsientos:
+    """
+    Bitsets de asientos vendidos por función, en memoria del proceso.
+
+    Las compras y cancelaciones hechas en este proceso actualizan el bitset
+    después del commit; los cambios administrativos lo descartan. Lo vendido en
+    otro worker se ve al vencer el TTL: el mapa solo sirve para mostrar y contar
+    asientos, la compra sigue validando contra la base de datos y la
+    restricción UNIQUE(IdFunción, IdAsiento).
+    """
+
+    def __init__(self, ttl_segundos: int, max_funciones: int):
+        """
+        Args:
+            ttl_segundos: Vigencia del estado de cada función
+            max_funciones: Funciones con estado en memoria antes de desalojar por LRU
+        """
+        self._estados = CacheTTL(ttl_segundos, max_funciones)
+        self._lock = threading.Lock()
+        # Se incrementa con cada cambio: una carga que se cruzó con un cambio no se guarda
+        self._generacion = 0
+
+    def _indice_sala(self, session, sala_id: int) -> IndiceSala:
+        encontrado, indice = cache_indices_salas.obtener(sala_id)
+        if encontrado:
+            return indice
+
+        filas = session.execute(
+            select(Asiento.Id, Asiento.CodigoAsiento, Asiento.Activo)
+            .where(Asiento.IdSala == sala_id)
+            .order_by(Asiento.Id)
+        ).all()
+        indice = IndiceSala.desde_filas(sala_id, filas)
+        cache_indices_salas.guardar(sala_id, indice)
+        return indice
+
+    def _cargar(self, funcion_id: int) -> Optional[EstadoFuncion]:
+        session = db.get_session()
+        try:
+            sala_id = session.execute(
+                select(Funcion.IdSala).where(Funcion.Id == funcion_id)
+            ).scalar()
+            if sala_id is None:
+                return None
+
+            indice = self._indice_sala(session, sala_id)
+            vendidos = session.execute(
+                select(Boleto.IdAsiento)
+                .outerjoin(BoletoCancelado, BoletoCancelado.IdBoleto == Boleto.Id)
+                .where(Boleto.IdFuncion == funcion_id, BoletoCancelado.Id.is_(None))
+            ).scalars()
+            return EstadoFuncion(funcion_id, indice, indice.mascara(vendidos))
+        finally:
+            session.close()
+
+    def obtener(self, funcion_id: int) -> Optional[EstadoFuncion]:
+        """
+        Estado de la función (None si no existe). Se calcula con dos consultas
+        de columnas la primera vez y después se sirve desde memoria.
+        """
+        encontrado, estado = self._estados.obtener(funcion_id)
+        if encontrado:
+            encontrado_indice, indice = cache_indices_salas.obtener(estado.indice.sala_id)
+            # Si se editaron los asientos de la sala, las posiciones del bitset ya no valen
+            if encontrado_indice and indice is estado.indice:
+                return estado
+
+        with self._lock:
+            generacion = self._generacion
+        estado = self._cargar(funcion_id)
+        if estado is not None:
+            with self._lock:
+                if generacion == self._generacion:
+                    self._estados.guardar(funcion_id, estado)
+        return estado
+
+    def _modificar(self, funcion_id: int, cambiar):
+        with self._lock:
+            self._generacion += 1
+            encontrado, estado = self._estados.obtener(funcion_id)
+            if encontrado:
+                vendidos = cambiar(estado)
+                self._estados.guardar(funcion_id, EstadoFuncion(funcion_id, estado.indice, vendidos))
+
+    def marcar_vendidos(self, funcion_id: int, codigos: Iterable[str]):
+        """Marca como vendidos los asientos de una compra confirmada"""
+        codigos = list(codigos)
+        self._modificar(funcion_id, lambda e: e.vendidos | e.indice.mascara_codigos(codigos))
+
+    def liberar(self, funcion_id: int, asientos_ids: Iterable[int]):
+        """Vuelve a dejar libres los asientos de boletos cancelados"""
+        asientos_ids = list(asientos_ids)
+        self._modificar(funcion_id, lambda e: e.vendidos & ~e.indice.mascara(asientos_ids))
+
+    def invalidar(self, funciones_ids: Iterable[int]):
+        """Descarta el estado de las funciones (se recalcula en la siguiente consulta)"""
+        with self._lock:
+            self._generacion += 1
+            for funcion_id in funciones_ids:
+                self._estados.invalidar(int(funcion_id))
+
+
+# Instancia compartida por el proceso
+mapa_asientos = MapaAsientos(Config.MAPA_ASIENTOS_TTL, Config.MAPA_ASIENTOS_MAX_FUNCIONES)
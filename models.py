@@ -2,6 +2,9 @@
 from database import db
 from datetime import date, datetime
 from typing import List, Optional
+from dataclasses import dataclass
+from cache import cache_usuarios
+from contrasenas import servicio_contrasenas
 
 from sqlalchemy import (
     String, Integer, Boolean, Date, DateTime,
@@ -243,14 +246,20 @@ class Usuario(Base, UserMixin):
 
     @property
     def rol_nombre(self):
-        """Propiedad para obtener el nombre del rol del usuario"""
-        return self.rol.Rol if self.rol else None
+        """Propiedad para obtener el nombre del rol del usuario (desde el registro de catálogos)"""
+        from catalogos import catalogos
+        try:
+            return catalogos.nombre_por_id('RolUsuario', self.IdRol)
+        except Exception as e:
+            print(f"Error al consultar el registro de roles: {e}")
+            return self.rol.Rol if self.rol else None
 
     def guardar_contrasena(self, contrasena):
-        self.ContrasenaHash = bcrypt.generate_password_hash(contrasena).decode()
+        # bcrypt se calcula en el pool de procesos (puede lanzar ServicioOcupado)
+        self.ContrasenaHash = servicio_contrasenas.generar_hash(contrasena)
 
     def validar_contrasena(self, contrasena):
-        return bcrypt.check_password_hash(self.ContrasenaHash, contrasena)
+        return servicio_contrasenas.verificar(self.ContrasenaHash, contrasena)
 
     rol: Mapped["RolUsuario"] = relationship(back_populates="usuarios")
     boletos: Mapped[List["Boleto"]] = relationship(back_populates="usuario")
@@ -307,6 +316,41 @@ class BoletoUsado(Base):
     FechaUso: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
 
 
+class ReservaAsiento(Base):
+    """Retención temporal de un asiento entre la selección y el pago"""
+    __tablename__ = "ReservasAsiento"
+
+    Id: Mapped[int] = mapped_column(primary_key=True)
+    IdFuncion: Mapped[int] = mapped_column(
+        "IdFunción", ForeignKey("Funciones.Id"), nullable=False
+    )
+    IdAsiento: Mapped[int] = mapped_column(ForeignKey("Asientos.Id"), nullable=False)
+    IdUsuario: Mapped[int] = mapped_column(ForeignKey("Usuarios.Id"), nullable=False)
+    FechaExpiracion: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class ResumenFuncion(Base):
+    """Métricas precalculadas por función para el dashboard"""
+    __tablename__ = "ResumenFunciones"
+
+    IdFuncion: Mapped[int] = mapped_column(
+        "IdFunción", ForeignKey("Funciones.Id"), primary_key=True
+    )
+    Fecha: Mapped[date] = mapped_column(Date, nullable=False)
+    IdSala: Mapped[int] = mapped_column(ForeignKey("Salas.Id"), nullable=False)
+    IdCine: Mapped[int] = mapped_column(ForeignKey("Cines.Id"), nullable=False)
+    IdPelicula: Mapped[int] = mapped_column(
+        "IdPelícula", ForeignKey("Películas.Id"), nullable=False
+    )
+    Capacidad: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    BoletosVendidos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    Ingresos: Mapped[float] = mapped_column(Numeric(14, 4), nullable=False, default=0)
+    BoletosUsados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    BoletosCancelados: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    ValorAcreditado: Mapped[float] = mapped_column(Numeric(14, 4), nullable=False, default=0)
+    FechaActualizacion: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
 class VistaPeliculasPopulares(Base):
     __tablename__ = "vw_PelículasPopulares"
 
@@ -323,19 +367,65 @@ class VistaPeliculasPopulares(Base):
     def __repr__(self):
         return f"<VistaPeliculasPopulares Id={self.Id} Titulo={self.Titulo} TotalBoletos={self.TotalBoletos}>"
 
+@dataclass(frozen=True, eq=False)
+class UsuarioSesion(UserMixin):
+    """
+    Copia inmutable del usuario autenticado que Flask-Login expone como current_user.
+    Se guarda en caché entre peticiones, por lo que no lleva relaciones ni el hash
+    de la contraseña.
+    """
+    Id: int
+    IdRol: int
+    Nombre: str
+    Apellidos: str
+    CorreoElectronico: str
+    Telefono: Optional[str]
+    FechaNacimiento: Optional[date]
+    rol_nombre: Optional[str]
+
+    @classmethod
+    def desde_usuario(cls, usuario: "Usuario") -> "UsuarioSesion":
+        return cls(
+            Id=usuario.Id,
+            IdRol=usuario.IdRol,
+            Nombre=usuario.Nombre,
+            Apellidos=usuario.Apellidos,
+            CorreoElectronico=usuario.CorreoElectronico,
+            Telefono=usuario.Telefono,
+            FechaNacimiento=usuario.FechaNacimiento,
+            rol_nombre=usuario.rol_nombre
+        )
+
+    def get_id(self):
+        """Retorna el ID del usuario como string (requerido por Flask-Login)"""
+        return str(self.Id)
+
+
 @login_manager.user_loader
 def load_user(user_id):
+    """Resuelve current_user desde la caché de identidades (sin consultar la BD si está vigente)"""
+    try:
+        usuario_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    encontrado, snapshot = cache_usuarios.obtener(usuario_id)
+    if encontrado:
+        return snapshot
+
     # Usamos la sesión de tu clase Database
     session = db.get_session()
     try:
-        # Buscamos al usuario por su ID (clave primaria) y cargamos la relación rol
-        from sqlalchemy.orm import joinedload
-        usuario = session.query(Usuario).options(
-            joinedload(Usuario.rol)
-        ).filter_by(Id=int(user_id)).first()
-        return usuario
+        # Buscamos al usuario por su ID (clave primaria); el rol sale del registro de catálogos
+        usuario = session.query(Usuario).filter_by(Id=usuario_id).first()
+        if usuario is None:
+            return None
+
+        snapshot = UsuarioSesion.desde_usuario(usuario)
+        cache_usuarios.guardar(usuario_id, snapshot)
+        return snapshot
     except Exception as e:
         print(f"Error al cargar usuario: {e}")
         return None
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
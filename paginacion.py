@@ -0,0 +1,257 @@
+# paginacion.py
+# Paginación por cursor (keyset) para los listados administrativos
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_, func, text
+from cache import cache_totales
+from config import Config
+
+
+# Filas del índice clúster (o del heap) según el catálogo; no recorre la tabla
+SQL_FILAS_TABLA = """
+    SELECT SUM(p.row_count)
+    FROM sys.dm_db_partition_stats p
+    WHERE p.object_id = OBJECT_ID(:tabla) AND p.index_id IN (0, 1)
+"""
+
+
+def _codificar_valor(valor):
+    if isinstance(valor, datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    return valor
+
+
+def _decodificar_valor(valor):
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.fromisoformat(valor['dt'])
+        if 'd' in valor:
+            return date.fromisoformat(valor['d'])
+        raise ValueError("Valor de cursor no reconocido")
+    return valor
+
+
+def codificar_cursor(pagina: int, valores: list, direccion: str) -> str:
+    """
+    Token opaco con la posición de una fila límite
+
+    Args:
+        pagina: Número de la página a la que lleva el cursor
+        valores: Valores de las columnas de orden de la fila límite
+        direccion: 'sig' (filas posteriores) o 'ant' (filas anteriores)
+    """
+    contenido = json.dumps(
+        {'p': pagina, 'v': [_codificar_valor(v) for v in valores], 'dir': direccion},
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(contenido.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: str, num_columnas: int):
+    """
+    Decodifica un cursor generado por codificar_cursor
+
+    Returns:
+        tuple or None: (pagina, valores, direccion) o None si el token no es válido
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        valores = [_decodificar_valor(v) for v in datos['v']]
+        pagina = int(datos['p'])
+        direccion = datos['dir']
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        return None
+
+    if len(valores) != num_columnas or direccion not in ('sig', 'ant') or pagina < 1:
+        return None
+    return pagina, valores, direccion
+
+
+def _orden_sql(orden, hacia_atras: bool):
+    """ORDER BY del listado; hacia atrás se invierte cada columna"""
+    return [
+        columna.desc() if descendente != hacia_atras else columna.asc()
+        for columna, descendente in orden
+    ]
+
+
+def _condicion_seek(orden, valores, hacia_atras: bool):
+    """
+    Filas posteriores (o anteriores) a la fila límite según el orden compuesto.
+    Se expande (a, b, c) > (x, y, z) porque SQL Server no admite comparar tuplas:
+    a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+    """
+    alternativas = []
+    for i, (columna, descendente) in enumerate(orden):
+        mayor = descendente == hacia_atras
+        comparacion = columna > valores[i] if mayor else columna < valores[i]
+        iguales = [orden[j][0] == valores[j] for j in range(i)]
+        alternativas.append(and_(*iguales, comparacion))
+    return or_(*alternativas)
+
+
+def _contar(query, columna_unica, clave_total, tabla_aproximada):
+    """
+    Total de registros del listado
+
+    Returns:
+        tuple: (total: int, aproximado: bool)
+    """
+    def calcular():
+        if tabla_aproximada and Config.PAGINACION_TOTAL_APROXIMADO:
+            filas = query.session.execute(text(SQL_FILAS_TABLA), {'tabla': tabla_aproximada}).scalar()
+            if filas is not None:
+                return int(filas), True
+        total = query.order_by(None).with_entities(func.count(columna_unica)).scalar()
+        return total or 0, False
+
+    if clave_total is None:
+        return calcular()
+    return cache_totales.obtener_o_calcular(clave_total, calcular)
+
+
+def cargar_por_ids(query, columna_id, ids, opciones=()):
+    """
+    Carga las entidades de la consulta con los IDs indicados, en ese orden
+
+    Args:
+        query: Consulta ORM cuya entidad principal se va a cargar
+        columna_id: Columna de clave primaria de la entidad
+        ids: IDs en el orden deseado
+        opciones: Opciones de carga de relaciones
+
+    Returns:
+        list: Entidades en el mismo orden que ids
+    """
+    if not ids:
+        return []
+
+    entidad = query.column_descriptions[0]['entity']
+    entidades = query.session.query(entidad).\
+        options(*opciones).\
+        filter(columna_id.in_(ids)).\
+        all()
+
+    por_id = {getattr(e, columna_id.key): e for e in entidades}
+    return [por_id[i] for i in ids if i in por_id]
+
+
+def paginar(query, orden, pagina=1, por_pagina=25, cursor=None, opciones=(),
+            clave_total=None, tabla_aproximada=None):
+    """
+    Obtiene una página de un listado.
+
+    Con un cursor válido la página se busca a partir de la fila límite (keyset),
+    por lo que el costo no crece con la profundidad; sin cursor se usa OFFSET,
+    lo que mantiene los enlaces por número de página. El total se cuenta sobre la
+    consulta filtrada sin cargas anticipadas y puede memorizarse por filtros.
+
+    La página se obtiene en dos fases: primero se pagina solo sobre las columnas
+    de orden y la clave primaria, y luego se cargan esas filas con sus relaciones
+    (ver cargar_por_ids). Así OFFSET/LIMIT nunca se aplica sobre el producto de
+    un joinedload de colecciones.
+
+    Args:
+        query: Consulta ORM con los filtros aplicados, sin order_by ni joinedload
+        orden: Lista de (columna, descendente); la última debe ser única (Id)
+            y ninguna puede contener NULL
+        pagina: Número de página (solo se usa si no hay cursor)
+        por_pagina: Registros por página
+        cursor: Token cursor_siguiente / cursor_anterior de una página previa
+        opciones: Opciones de carga para las filas de la página (selectinload
+            para colecciones, joinedload para relaciones muchos a uno)
+        clave_total: Clave hashable para memorizar el total (None = contar siempre)
+        tabla_aproximada: Tabla cuyo conteo de catálogo sirve como total cuando
+            el listado no tiene filtros (requiere PAGINACION_TOTAL_APROXIMADO)
+
+    Returns:
+        dict: items, total, pagina, por_pagina, paginas, tiene_anterior,
+            tiene_siguiente, cursor_anterior, cursor_siguiente, total_aproximado
+    """
+    pagina = max(1, pagina or 1)
+    por_pagina = max(1, por_pagina or 25)
+
+    total, aproximado = _contar(query, orden[-1][0], clave_total, tabla_aproximada)
+
+    posicion = decodificar_cursor(cursor, len(orden)) if cursor else None
+    hacia_atras = False
+
+    # Fase 1: solo las columnas de orden (la última es la clave), sin cargas anticipadas
+    consulta = query.with_entities(*[columna for columna, _ in orden])
+    if posicion:
+        pagina, valores, direccion = posicion
+        hacia_atras = direccion == 'ant'
+        consulta = consulta.filter(_condicion_seek(orden, valores, hacia_atras))
+    consulta = consulta.order_by(*_orden_sql(orden, hacia_atras))
+    if not posicion:
+        consulta = consulta.offset((pagina - 1) * por_pagina)
+
+    # Una fila extra indica si hay más registros en la dirección recorrida
+    claves = [tuple(fila) for fila in consulta.limit(por_pagina + 1).all()]
+    hay_mas = len(claves) > por_pagina
+    claves = claves[:por_pagina]
+
+    if hacia_atras:
+        claves.reverse()
+        if not hay_mas:
+            pagina = 1
+        tiene_anterior = hay_mas
+        tiene_siguiente = True
+    else:
+        tiene_anterior = pagina > 1
+        tiene_siguiente = hay_mas
+
+    # Fase 2: hidratar la página completa con sus relaciones
+    filas = cargar_por_ids(query, orden[-1][0], [clave[-1] for clave in claves], opciones)
+
+    cursor_siguiente = None
+    cursor_anterior = None
+    if claves and tiene_siguiente:
+        cursor_siguiente = codificar_cursor(pagina + 1, list(claves[-1]), 'sig')
+    if claves and tiene_anterior:
+        cursor_anterior = codificar_cursor(pagina - 1, list(claves[0]), 'ant')
+
+    # El total puede estar memorizado o ser aproximado: nunca menos páginas que las recorridas
+    paginas = (total + por_pagina - 1) // por_pagina
+    if claves:
+        paginas = max(paginas, pagina + (1 if tiene_siguiente else 0))
+
+    return {
+        'items': filas,
+        'total': total,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'paginas': paginas,
+        'tiene_anterior': tiene_anterior,
+        'tiene_siguiente': tiene_siguiente,
+        'cursor_anterior': cursor_anterior,
+        'cursor_siguiente': cursor_siguiente,
+        'total_aproximado': aproximado
+    }
+
+
+def resultado_vacio(clave: str, pagina=1, por_pagina=25) -> dict:
+    """Resultado de paginación sin registros (para los casos de error)"""
+    return {
+        clave: [],
+        'total': 0,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'paginas': 0,
+        'tiene_anterior': False,
+        'tiene_siguiente': False,
+        'cursor_anterior': None,
+        'cursor_siguiente': None,
+        'total_aproximado': False
+    }
+
+
+def clave_filtros(listado: str, filtros) -> tuple:
+    """Clave de caché del total de un listado con sus filtros"""
+    return (listado, tuple(sorted((filtros or {}).items(), key=lambda item: item[0])))
@@ -0,0 +1,31 @@
+# reconstruir_resumen.py
+# Reconstruye la tabla ResumenFunciones que alimenta el dashboard administrativo
+#
+# Uso:
+#   python reconstruir_resumen.py                          # tabla completa
+#   python reconstruir_resumen.py --desde 2025-01-01       # solo funciones desde esa fecha
+#   python reconstruir_resumen.py --desde 2025-01-01 --hasta 2025-01-31
+
+import argparse
+import sys
+from datetime import datetime
+
+from controllers.resumen_controller import ResumenController
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Fecha inválida: {valor} (formato YYYY-MM-DD)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye el resumen de funciones del dashboard")
+    parser.add_argument('--desde', type=_fecha, help="Primera fecha de función (YYYY-MM-DD)")
+    parser.add_argument('--hasta', type=_fecha, help="Última fecha de función (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    success, message = ResumenController.reconstruir(args.desde, args.hasta)
+    print(message)
+    sys.exit(0 if success else 1)
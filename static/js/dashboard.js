@@ -702,16 +702,69 @@ $(document).ready(function() {
         window.location.href = `/admin/dashboard/export/excel?${formData}`;
     }
     
+    // Generar un reporte en segundo plano y descargarlo al terminar
+    function exportarEnSegundoPlano(formato) {
+        const formData = $('#filtros-form').serialize();
+        
+        Swal.fire({
+            title: 'Preparando reporte',
+            text: 'El reporte se está generando, puedes seguir usando el dashboard.',
+            allowOutsideClick: false,
+            didOpen: () => Swal.showLoading()
+        });
+        
+        $.ajax({
+            url: `/admin/dashboard/export/${formato}/trabajo?${formData}`,
+            method: 'POST',
+            success: function(trabajo) {
+                consultarTrabajo(trabajo);
+            },
+            error: function(xhr) {
+                const mensaje = (xhr.responseJSON && xhr.responseJSON.error) || 'No se pudo solicitar el reporte.';
+                mostrarMensajeError(mensaje);
+            }
+        });
+    }
+    
+    // Consultar el estado de un trabajo hasta que termine
+    function consultarTrabajo(trabajo) {
+        $.getJSON(trabajo.url_estado)
+            .done(function(estado) {
+                if (estado.estado === 'completado') {
+                    Swal.close();
+                    window.location.href = trabajo.url_descarga;
+                } else if (estado.estado === 'error') {
+                    mostrarMensajeError('Error al generar el reporte: ' + (estado.mensaje || ''));
+                } else {
+                    setTimeout(() => consultarTrabajo(trabajo), 2000);
+                }
+            })
+            .fail(function() {
+                // El estado puede no estar escrito todavía; se reintenta
+                setTimeout(() => consultarTrabajo(trabajo), 2000);
+            });
+    }
+    
     // Exportar a Excel
     function exportarExcel() {
+        exportarEnSegundoPlano('excel');
+    }
+    
+    // Exportar datos detallados a CSV comprimido
+    function exportarCSV() {
         const formData = $('#filtros-form').serialize();
-        window.location.href = `/admin/dashboard/export/excel?${formData}`;
+        window.location.href = `/admin/dashboard/export/csv?${formData}&gzip=1`;
+    }
+    
+    // Exportar datos detallados a Parquet
+    function exportarParquet() {
+        const formData = $('#filtros-form').serialize();
+        window.location.href = `/admin/dashboard/export/parquet?${formData}`;
     }
     
     // Exportar a PDF
     function exportarPDF() {
-        const formData = $('#filtros-form').serialize();
-        window.location.href = `/admin/dashboard/export/pdf?${formData}`;
+        exportarEnSegundoPlano('pdf');
     }
     
     // Limpiar todos los filtros
@@ -766,6 +819,8 @@ $(document).ready(function() {
     });
     
     $('#export-excel-btn').on('click', exportarExcel);
+    $('#export-csv-btn').on('click', exportarCSV);
+    $('#export-parquet-btn').on('click', exportarParquet);
     $('#export-pdf-btn').on('click', exportarPDF);
     
     $(window).on('resize', redimensionarGraficas);
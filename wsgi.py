@@ -0,0 +1,7 @@
+# wsgi.py
+# Punto de entrada WSGI para el servidor de producción (gunicorn -c gunicorn.conf.py wsgi:app)
+# Para desarrollo local sigue disponible: python app.py
+
+from app import app
+
+application = app